@@ -0,0 +1,62 @@
+"""Running mean/variance state (Welford) kept on SeasonPlayer and Player.
+
+State is a ``(count, mean, m2)`` triple so a game can be added or removed, and two seasons merged, without
+rereading the games they came from.
+"""
+import math
+
+EMPTY = (0, 0.0, 0.0)
+
+
+def push(state, value):
+    count, mean, m2 = state
+    count += 1
+    delta = value - mean
+    mean += delta / count
+    m2 += delta * (value - mean)
+
+    return count, mean, m2
+
+
+def pop(state, value):
+    # Exact inverse of push
+    count, mean, m2 = state
+
+    if count <= 1:
+        return EMPTY
+
+    new_mean = (count * mean - value) / (count - 1)
+    m2 -= (value - new_mean) * (value - mean)
+
+    return count - 1, new_mean, max(m2, 0.0)
+
+
+def merge(a, b):
+    # Chan et al. parallel combination of two states
+    if a[0] == 0:
+        return b
+
+    if b[0] == 0:
+        return a
+
+    count = a[0] + b[0]
+    delta = b[1] - a[1]
+    mean = a[1] + delta * b[0] / count
+    m2 = a[2] + b[2] + delta * delta * a[0] * b[0] / count
+
+    return count, mean, m2
+
+
+def from_values(values):
+    state = EMPTY
+    for value in values:
+        state = push(state, value)
+
+    return state
+
+
+def stdev(state):
+    # Sample standard deviation, matching statistics.stdev
+    count, mean, m2 = state
+
+    return math.sqrt(m2 / (count - 1))
@@ -0,0 +1,70 @@
+"""Frozen end-of-season summaries behind the lifetime stats.
+
+Once the next season starts, a season is closed and every one of its ``season_players`` rows is copied into
+``season_archives``: the totals, the averages the lifetime takes over seasons, and the MLTV sum and JLTV
+variance state. The lifetime roll-up merges a player's archives with the live row of the current season, so
+closing a season reads one narrow row per season and never goes back to old games or season rows.
+
+A closed season is only refrozen when its own rows change (a deleted game, a replay or a maintenance repair).
+
+Functions take a DB-API (sqlite3) connection and never commit.
+"""
+from collections import namedtuple
+
+COLUMNS = ('played', 'total_wins', 'total_kills', 'total_rounds', 'A_ADR', 'MLTV', 'sum_mltv', 'jltv_mean',
+           'jltv_m2')
+
+CLOSED = 'season_id < (SELECT MAX(season_id) FROM seasons)'
+SEASON_FILTER = '(:season_id IS NULL OR {table}.season_id = :season_id)'
+
+
+class Summary(namedtuple('Summary', ('season_id', 'player_id') + COLUMNS)):
+    __slots__ = ()
+
+    # Same shape as SeasonPlayer.jltv_state, so refresh_lifetime takes either
+    @property
+    def jltv_state(self):
+        return self.played, self.jltv_mean, self.jltv_m2
+
+
+def freeze(connection, season_id=None):
+    """Bring the archives of one closed season, or all of them, in line with season_players.
+
+    Archives of the current season (which is not closed) are dropped. Returns how many rows were added, changed
+    or removed.
+    """
+    params = {'season_id': season_id}
+    columns = ', '.join(f'"{column}"' for column in COLUMNS)
+    archived = ', '.join(f'season_archives."{column}"' for column in COLUMNS)
+    live = ', '.join(f'season_players."{column}"' for column in COLUMNS)
+
+    rows = connection.execute(
+        f'DELETE FROM season_archives WHERE {SEASON_FILTER.format(table="season_archives")} '
+        f'AND (NOT {CLOSED} OR NOT EXISTS (SELECT 1 FROM season_players '
+        'WHERE season_players.season_id = season_archives.season_id '
+        'AND season_players.player_id = season_archives.player_id))', params).rowcount
+
+    rows += connection.execute(
+        f'INSERT OR REPLACE INTO season_archives (season_id, player_id, {columns}) '
+        f'SELECT season_id, player_id, {columns} FROM season_players '
+        f'WHERE {SEASON_FILTER.format(table="season_players")} AND {CLOSED} '
+        'AND NOT EXISTS (SELECT 1 FROM season_archives WHERE season_archives.season_id = season_players.season_id '
+        f'AND season_archives.player_id = season_players.player_id AND ({archived}) IS ({live}))', params).rowcount
+
+    return rows
+
+
+def summaries(connection, player_ids, without=None):
+    """``{player_id: [Summary, ...]}`` oldest season first, leaving out season ``without``."""
+    seasons = {player_id: [] for player_id in player_ids}
+    columns = ', '.join(f'"{column}"' for column in COLUMNS)
+    marks = ', '.join('?' * len(seasons))
+
+    rows = connection.execute(
+        f'SELECT season_id, player_id, {columns} FROM season_archives WHERE player_id IN ({marks}) '
+        'AND season_id IS NOT ? ORDER BY player_id, season_id', (*seasons, without))
+
+    for row in rows:
+        seasons[row[1]].append(Summary(*row))
+
+    return seasons
@@ -0,0 +1,254 @@
+"""Online snapshots of the app database, and restoring one.
+
+Snapshots are taken with SQLite's backup API a few pages at a time, pausing between steps, so game entry and
+page views carry on while one runs (a write in the middle just makes the backup pick up the changed pages).
+Each snapshot is ``<name>.db`` next to a ``<name>.json`` manifest holding its SHA-256, size and the season and
+game count it contains. add_game takes one automatically just before a season rolls over.
+
+A restore checks the snapshot against its manifest, takes a ``before-restore-...`` snapshot of the current
+database, then swaps a copy into place with a single rename. Stop the app first.
+
+    python backups.py [--db instance/JLTV.db] [--dir instance/backups] snapshot [name]
+    python backups.py [--db instance/JLTV.db] [--dir instance/backups] list
+    python backups.py [--db instance/JLTV.db] [--dir instance/backups] verify [name ...]
+    python backups.py [--db instance/JLTV.db] [--dir instance/backups] restore <name>
+"""
+from collections import namedtuple
+from contextlib import closing
+from datetime import datetime, timezone
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+
+# Pages copied per step and the pause between steps; other connections get the database in between
+PAGES_PER_STEP = 64
+STEP_PAUSE = 0.005
+
+# Restarts (from writes elsewhere) a stepped copy takes before finishing in one step
+MAX_RESTARTS = 3
+
+NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._ -]{0,99}$')
+
+Snapshot = namedtuple('Snapshot', 'name created bytes sha256 seasons games')
+
+
+class InvalidSnapshot(ValueError):
+    pass
+
+
+def default_name():
+    return datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')
+
+
+def paths(directory, name):
+    if not NAME.match(name) or name.endswith('.part'):
+        raise InvalidSnapshot(f'{name!r} is not a valid snapshot name')
+
+    return os.path.join(directory, f'{name}.db'), os.path.join(directory, f'{name}.json')
+
+
+def checksum(path):
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+class Restarted(Exception):
+    pass
+
+
+def copy(source_path, target_path, pages=PAGES_PER_STEP, pause=STEP_PAUSE):
+    """Stepped online backup; the source is only read-locked while a step runs.
+
+    A commit from another connection makes SQLite start the copy again, so under a steady stream of writes a
+    stepped copy might never finish. After ``MAX_RESTARTS`` steps that got no further, the rest is copied in a
+    single step.
+    """
+    seen = {'remaining': None, 'restarts': 0}
+
+    def progress(status, remaining, total):
+        if seen['remaining'] is not None and remaining >= seen['remaining']:
+            seen['restarts'] += 1
+
+            if seen['restarts'] > MAX_RESTARTS:
+                raise Restarted
+
+        seen['remaining'] = remaining
+
+        if remaining:
+            time.sleep(pause)
+
+    source = sqlite3.connect(source_path, timeout=30)
+    target = sqlite3.connect(target_path)
+
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress)
+
+        except Restarted:
+            source.backup(target)
+
+    finally:
+        target.close()
+        source.close()
+
+
+def contents(path):
+    # (latest season, games) of a snapshot, after checking it reads back cleanly
+    with closing(sqlite3.connect(f'file:{path}?mode=ro', uri=True)) as connection:
+        problems = connection.execute('PRAGMA quick_check').fetchall()
+
+        if problems != [('ok',)]:
+            raise InvalidSnapshot(f'{path} failed quick_check: {problems[:3]}')
+
+        return connection.execute('SELECT (SELECT MAX(season_id) FROM seasons), '
+                                  '(SELECT COUNT(*) FROM games)').fetchone()
+
+
+def snapshot(source_path, directory, name=None, pages=PAGES_PER_STEP, pause=STEP_PAUSE):
+    """Back ``source_path`` up as snapshot ``name`` in ``directory`` and return its Snapshot."""
+    name = name or default_name()
+    path, manifest_path = paths(directory, name)
+
+    if os.path.exists(path):
+        raise InvalidSnapshot(f'Snapshot {name!r} already exists')
+
+    os.makedirs(directory, exist_ok=True)
+
+    # Written under a temporary name, so a snapshot that exists is always complete
+    partial = path + '.part'
+    if os.path.exists(partial):
+        os.remove(partial)
+
+    copy(source_path, partial, pages, pause)
+    seasons, games = contents(partial)
+
+    info = Snapshot(name, datetime.now(timezone.utc).isoformat(timespec='seconds'), os.path.getsize(partial),
+                    checksum(partial), seasons, games)
+
+    os.replace(partial, path)
+    with open(manifest_path, 'w', encoding='utf-8') as file:
+        json.dump(info._asdict(), file, indent=2)
+
+    return info
+
+
+def rollover_name(directory, season_id):
+    # One per completed season; a season finished twice (after a delete) gets the time added
+    name = f'season-{season_id}-complete'
+
+    if os.path.exists(paths(directory, name)[1]):
+        name = f'{name}-{default_name()}'
+
+    return name
+
+
+def snapshots(directory):
+    """Every snapshot with a manifest in ``directory``, oldest first."""
+    found = []
+
+    if not os.path.isdir(directory):
+        return found
+
+    for entry in os.listdir(directory):
+        if entry.endswith('.json'):
+            with open(os.path.join(directory, entry), encoding='utf-8') as file:
+                found.append(Snapshot(**json.load(file)))
+
+    return sorted(found, key=lambda info: (info.created, info.name))
+
+
+def verify(directory, name):
+    """The snapshot's Snapshot if its file matches the manifest, else InvalidSnapshot."""
+    path, manifest_path = paths(directory, name)
+
+    if not os.path.exists(manifest_path) or not os.path.exists(path):
+        raise InvalidSnapshot(f'Snapshot {name!r} not found in {directory}')
+
+    with open(manifest_path, encoding='utf-8') as file:
+        info = Snapshot(**json.load(file))
+
+    if os.path.getsize(path) != info.bytes or checksum(path) != info.sha256:
+        raise InvalidSnapshot(f'Snapshot {name!r} does not match its checksum')
+
+    return info
+
+
+def restore(directory, name, target_path):
+    """Swap snapshot ``name`` in as ``target_path``; returns the name of the snapshot taken of what it replaced."""
+    info = verify(directory, name)
+    path, _ = paths(directory, name)
+
+    staged = target_path + '.restoring'
+    with open(path, 'rb') as source, open(staged, 'wb') as target:
+        for block in iter(lambda: source.read(1 << 20), b''):
+            target.write(block)
+
+        target.flush()
+        os.fsync(target.fileno())
+
+    if checksum(staged) != info.sha256:
+        os.remove(staged)
+        raise InvalidSnapshot(f'Copy of {name!r} does not match its checksum')
+
+    saved = None
+    if os.path.exists(target_path):
+        saved = f'before-restore-{default_name()}'
+        snapshot(target_path, directory, saved)
+
+        # Fold any WAL back in so no stale sidecar outlives the swap
+        with closing(sqlite3.connect(target_path)) as connection:
+            connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(target_path + suffix):
+                os.remove(target_path + suffix)
+
+    os.replace(staged, target_path)
+
+    return saved
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='instance/JLTV.db')
+    parser.add_argument('--dir', default=os.path.join('instance', 'backups'))
+    parser.add_argument('command', choices=('snapshot', 'list', 'verify', 'restore'))
+    parser.add_argument('names', nargs='*')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'snapshot':
+            started = time.perf_counter()
+            info = snapshot(args.db, args.dir, args.names[0] if args.names else None)
+            print(f'{info.name}: {info.bytes} bytes, season {info.seasons}, {info.games} games, '
+                  f'sha256 {info.sha256[:12]} in {time.perf_counter() - started:.2f}s')
+
+        elif args.command == 'list':
+            for info in snapshots(args.dir):
+                print(f'{info.name:40} {info.created}  {info.bytes:>10}  season {info.seasons}, {info.games} games')
+
+        elif args.command == 'verify':
+            for name in args.names or [info.name for info in snapshots(args.dir)]:
+                verify(args.dir, name)
+                print(f'{name}: ok')
+
+        else:
+            if len(args.names) != 1:
+                parser.error('restore takes one snapshot name')
+
+            saved = restore(args.dir, args.names[0], args.db)
+            print(f'Restored {args.names[0]} to {args.db}' + (f'; the previous database is {saved}' if saved else ''))
+
+    except InvalidSnapshot as e:
+        sys.exit(str(e))
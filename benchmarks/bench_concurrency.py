@@ -0,0 +1,186 @@
+"""Page views served while a long season recompute holds the write lock, with and without SQLITE_CONCURRENT.
+
+    python -m benchmarks.bench_concurrency [--players 40] [--seasons 20] [--readers 4] [--writers 1]
+                                           [--out report.json]
+
+Each mode runs in its own process against a fresh synthetic database (``benchmarks.synthetic``). A writer thread
+replays every season in one transaction, the way a maintenance repair or a full replay does, while reader threads
+keep requesting the leaderboard pages and the season API through the Flask test client, and writer threads make
+small read-then-write transactions like the write routes do. Rendered-page caching is switched off so every
+request reads the database.
+
+Reported per mode: the recompute's wall time, how many reads finished while it ran, their median / p95 / max
+latency and how many failed (a "database is locked" error or a 5xx), then the same for the small writes.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PATHS = ['/', '/lifetime-rankings', '/api/season', '/api/lifetime']
+
+MODES = {'default': '0', 'concurrent': '1'}
+
+
+def recompute_everything(main):
+    # Zeroing the stored JLTVs first makes the replay rewrite every row, as after a rating formula change
+    with main.app.app_context():
+        season_ids = main.db.session.execute(main.db.select(main.Season.season_id)).scalars().all()
+
+        for season_id in season_ids:
+            main.db.session.execute(main.update(main.PlayerGameStats)
+                                    .where(main.PlayerGameStats.season_id == season_id).values(JLTV=0))
+            main.recompute_season(season_id)
+
+        main.db.session.commit()
+
+
+def read_loop(main, done, results):
+    client = main.app.test_client()
+    index = 0
+
+    while not done.is_set():
+        path = PATHS[index % len(PATHS)]
+        index += 1
+        start = time.perf_counter()
+
+        try:
+            failed = client.get(path).status_code >= 500
+
+        except Exception as e:
+            failed = True
+            results['messages'].add(str(e).splitlines()[0][:120])
+
+        elapsed = time.perf_counter() - start
+
+        if not done.is_set():
+            results['errors' if failed else 'times'].append(elapsed)
+
+
+def write_loop(main, done, results):
+    # Reads the version and then bumps it, which is the shape of every write route
+    with main.app.app_context():
+        while not done.is_set():
+            start = time.perf_counter()
+
+            try:
+                main.data_version()
+                main.bump_data_version()
+                main.db.session.commit()
+                failed = False
+
+            except Exception as e:
+                main.db.session.rollback()
+                failed = True
+                results['messages'].add(str(e).splitlines()[0][:120])
+
+            results['errors' if failed else 'times'].append(time.perf_counter() - start)
+            time.sleep(0.05)
+
+
+def summary(results, seconds):
+    times = sorted(results['times']) or [0.0]
+
+    return {'done': len(results['times']),
+            'per_s': round(len(results['times']) / seconds, 1),
+            'median_ms': round(statistics.median(times) * 1000, 1),
+            'p95_ms': round(times[max(int(len(times) * 0.95) - 1, 0)] * 1000, 1),
+            'max_ms': round(times[-1] * 1000, 1),
+            'errors': len(results['errors']),
+            'messages': sorted(results['messages'])}
+
+
+def run_mode(args):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'JLTV.db')
+
+    os.environ['DATA_URI'] = f'sqlite:///{path}'
+    os.environ['PAGE_CACHE_PATH'] = os.path.join(directory, 'page_cache.db')
+    os.environ['RECOMPUTE_JOBS_PATH'] = os.path.join(directory, 'jobs.db')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+    # Importing the app creates the schema in the scratch database
+    import main
+    from benchmarks.synthetic import populate
+
+    populate(path, players=args.players, seasons=args.seasons)
+
+    main.page_cache.enabled = False
+    main.app.logger.disabled = True
+
+    # Warm the template cache and SQLite's page cache
+    client = main.app.test_client()
+    for page in PATHS:
+        client.get(page)
+
+    reads = {'times': [], 'errors': [], 'messages': set()}
+    writes = {'times': [], 'errors': [], 'messages': set()}
+    done = threading.Event()
+    threads = ([threading.Thread(target=read_loop, args=(main, done, reads)) for _ in range(args.readers)]
+               + [threading.Thread(target=write_loop, args=(main, done, writes)) for _ in range(args.writers)])
+
+    for thread in threads:
+        thread.start()
+
+    time.sleep(0.2)
+    start = time.perf_counter()
+    recompute_everything(main)
+    recompute_seconds = time.perf_counter() - start
+
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    return {'recompute_s': round(recompute_seconds, 2), 'reads': summary(reads, recompute_seconds),
+            'writes': summary(writes, recompute_seconds)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--seasons', type=int, default=20)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=1)
+    parser.add_argument('--out', help='write the JSON report here')
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args)))
+        return
+
+    # main.py reads its configuration on import, so every mode gets a fresh interpreter
+    report = {'players': args.players, 'seasons': args.seasons, 'readers': args.readers, 'writers': args.writers,
+              'modes': {}}
+    for mode, flag in MODES.items():
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_concurrency', '--mode', mode, '--players', str(args.players),
+             '--seasons', str(args.seasons), '--readers', str(args.readers), '--writers', str(args.writers)],
+            env=dict(os.environ, SQLITE_CONCURRENT=flag), capture_output=True, text=True, check=True).stdout
+        report['modes'][mode] = json.loads(output.splitlines()[-1])
+
+    print(f'{args.seasons} seasons, {args.players} players, {args.readers} reader and {args.writers} writer threads\n')
+    print(f'{"mode":<12} {"recompute s":>12} {"":<7} {"done":>6} {"per s":>7} {"median ms":>10} {"p95 ms":>8} '
+          f'{"max ms":>8} {"errors":>7}')
+    for mode, result in report['modes'].items():
+        for kind in ('reads', 'writes'):
+            line = result[kind]
+            print(f'{mode if kind == "reads" else "":<12} {result["recompute_s"] if kind == "reads" else "":>12} '
+                  f'{kind:<7} {line["done"]:>6} {line["per_s"]:>7} {line["median_ms"]:>10} {line["p95_ms"]:>8} '
+                  f'{line["max_ms"]:>8} {line["errors"]:>7}')
+
+            for message in line['messages']:
+                print(f'    {message}')
+
+    if args.out:
+        with open(args.out, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
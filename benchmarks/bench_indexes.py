@@ -0,0 +1,90 @@
+"""Query plans and timings for the hot query shapes, without and with the secondary indexes.
+
+    python -m benchmarks.bench_indexes [--seasons 50] [--players 40] [--repeat 200]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+QUERIES = [
+    ('season games of a player',
+     'SELECT * FROM player_stats WHERE season_id = :season_id AND player_id = :player_id'),
+    ('stats of one game',
+     'SELECT * FROM player_stats WHERE game_id = :game_id'),
+    ('season roster lookup',
+     'SELECT * FROM season_players WHERE season_id = :season_id AND player_id = :player_id'),
+    ('seasons of a player',
+     'SELECT * FROM season_players WHERE player_id = :player_id'),
+    ('latest game',
+     'SELECT game_id FROM player_stats ORDER BY game_id DESC LIMIT 1'),
+    ('first game of the season',
+     'SELECT game_id FROM player_stats WHERE season_id = :season_id ORDER BY game_id LIMIT 1'),
+    ('games of a season',
+     'SELECT * FROM games WHERE season_id = :season_id'),
+]
+
+
+def measure(connection, params, repeat):
+    results = []
+
+    for label, sql in QUERIES:
+        plan = '; '.join(row[3] for row in connection.execute(f'EXPLAIN QUERY PLAN {sql}', params))
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            connection.execute(sql, params).fetchall()
+        elapsed = (time.perf_counter() - start) / repeat
+
+        results.append((label, plan, elapsed))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seasons', type=int, default=50)
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'JLTV.db')
+    os.environ['DATA_URI'] = f'sqlite:///{path}'
+
+    # Importing the app creates the schema in the scratch database
+    import main  # noqa: F401
+    import migrate
+    from benchmarks.synthetic import populate
+    from sqlalchemy import create_engine
+
+    populate(path, players=args.players, seasons=args.seasons)
+
+    connection = sqlite3.connect(path)
+    for name, _, _ in migrate.INDEXES:
+        connection.execute(f'DROP INDEX IF EXISTS {name}')
+    connection.commit()
+
+    stats = connection.execute('SELECT COUNT(*) FROM player_stats').fetchone()[0]
+    print(f'{args.seasons} seasons, {args.players} players, {stats} player_stats rows\n')
+
+    params = {'season_id': args.seasons // 2, 'player_id': args.players // 2, 'game_id': stats // 20}
+    before = measure(connection, params, args.repeat)
+    connection.close()
+
+    migrate.upgrade(create_engine(f'sqlite:///{path}'))
+
+    connection = sqlite3.connect(path)
+    connection.execute('ANALYZE')
+    after = measure(connection, params, args.repeat)
+    connection.close()
+
+    for (label, plan_before, time_before), (_, plan_after, time_after) in zip(before, after):
+        print(label)
+        print(f'  before {time_before * 1e6:9.1f} us  {plan_before}')
+        print(f'  after  {time_after * 1e6:9.1f} us  {plan_after}')
+        print(f'  speed-up x{time_before / time_after:.1f}\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""Wall time, query count and peak memory of every route against a synthetic history.
+
+    python -m benchmarks.bench_routes [--players 40] [--seasons 20] [--repeat 5] [--out report.json]
+                                      [--baseline old.json] [--threshold 1.5]
+
+The database is a temporary SQLite file filled by ``benchmarks.synthetic`` (N players x M seasons x 30 games),
+plus half of a season in progress entered through ``/add-game``. Each route is driven through the Flask test
+client; the background season replay that follows add/delete is timed as its own entry. Rendered-page caching
+is switched off so the pages are rendered on every request.
+
+With ``--baseline`` the run is compared against an earlier report and exits non-zero when a route got slower or
+heavier than ``--threshold`` times its baseline, or runs more queries than before.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import event
+
+
+def game_form(rng, player_ids):
+    lineup = rng.sample(player_ids, 10)
+    rounds = rng.randint(16, 30)
+    data = {'map_name': rng.choice(['Dust II', 'Mirage', 'Inferno', 'Nuke']), 'rounds': rounds}
+
+    for position, player_id in enumerate(lineup, 1):
+        data[f'player{position}'] = player_id
+        data[f'kills{position}'] = rng.randint(5, 30)
+        data[f'damage{position}'] = rng.randint(60, 110) * rounds
+
+        if position <= 5:
+            data[f'win{position}'] = 'y'
+
+    return data
+
+
+class Bench:
+    def __init__(self, main, client):
+        self.main = main
+        self.client = client
+        self.queries = 0
+        self.results = {}
+
+        with main.app.app_context():
+            engine = main.db.engine
+
+        # Counts the background replay's statements too, which the X-Query-Count header can't see
+        @event.listens_for(engine, 'before_cursor_execute')
+        def count(*args):
+            self.queries += 1
+
+    def measure(self, name, call, memory=False):
+        if memory is None:
+            return call()
+
+        self.queries = 0
+
+        if memory:
+            tracemalloc.start()
+
+        start = time.perf_counter()
+        response = call()
+        elapsed = time.perf_counter() - start
+
+        peak = 0
+        if memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        if response is not None and response.status_code >= 400:
+            raise RuntimeError(f'{name} returned {response.status_code}')
+
+        result = self.results.setdefault(name, {'times': [], 'queries': 0, 'peak_kb': 0})
+        result['queries'] = self.queries
+
+        if memory:
+            result['peak_kb'] = round(peak / 1024, 1)
+
+        else:
+            result['times'].append(elapsed)
+
+        return response
+
+    def replay(self):
+        # The add/delete routes queue the replay; run it now and time it separately
+        self.main.recompute_worker.drain()
+
+
+def run(args):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'JLTV.db')
+
+    os.environ['DATA_URI'] = f'sqlite:///{path}'
+    os.environ['PAGE_CACHE_PATH'] = os.path.join(directory, 'page_cache.db')
+    os.environ['RECOMPUTE_JOBS_PATH'] = os.path.join(directory, 'jobs.db')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+    # Importing the app creates the schema in the scratch database
+    import main
+    from benchmarks.synthetic import populate
+
+    populate(path, players=args.players, seasons=args.seasons)
+
+    with main.app.app_context():
+        main.db.session.add(main.User(id=1, username='admin', password=''))
+        main.db.session.commit()
+
+    main.app.config['WTF_CSRF_ENABLED'] = False
+    main.page_cache.enabled = False
+
+    client = main.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+
+    rng = random.Random(0)
+    player_ids = list(range(1, args.players + 1))
+    bench = Bench(main, client)
+
+    # Measure mid-season, which is where games are normally entered
+    for _ in range(15):
+        client.post('/add-game', data=game_form(rng, player_ids))
+        bench.replay()
+
+    def latest_game():
+        with main.app.app_context():
+            return main.db.session.query(main.db.func.max(main.Game.game_id)).scalar()
+
+    teams = {f'player{position}': player_id for position, player_id in enumerate(player_ids[:10], 1)}
+
+    # One untimed pass warms SQLite's page cache and the template cache, then the timed passes, then one pass
+    # under tracemalloc for peak memory
+    for memory in [None] + [False] * args.repeat + [True]:
+        bench.measure('add_game', lambda: client.post('/add-game', data=game_form(rng, player_ids)), memory)
+        bench.measure('add_game replay', bench.replay, memory)
+        bench.measure('adjust_jltv', lambda: client.get('/adjust-jltv'), memory)
+        bench.measure('adjust_jltv replay', bench.replay, memory)
+
+        game_id = latest_game()
+        bench.measure('delete_game', lambda: client.get(f'/delete-game/{game_id}'), memory)
+        bench.measure('delete_game replay', bench.replay, memory)
+
+        bench.measure('home', lambda: client.get('/'), memory)
+        bench.measure('lifetime_rankings', lambda: client.get('/lifetime-rankings'), memory)
+        bench.measure('games', lambda: client.get('/games'), memory)
+        bench.measure('create_teams', lambda: client.post('/create-teams', data=dict(teams, rating_source='season')),
+                      memory)
+
+    routes = {}
+    for name, result in bench.results.items():
+        routes[name] = {'wall_ms': round(statistics.median(result['times']) * 1000, 2),
+                        'min_ms': round(min(result['times']) * 1000, 2),
+                        'queries': result['queries'],
+                        'peak_kb': result['peak_kb']}
+
+    return {'players': args.players, 'seasons': args.seasons, 'repeat': args.repeat, 'routes': routes}
+
+
+def compare(report, baseline, threshold):
+    regressions = []
+
+    for name, result in report['routes'].items():
+        before = baseline['routes'].get(name)
+
+        if before is None:
+            continue
+
+        if result['wall_ms'] > before['wall_ms'] * threshold:
+            regressions.append(f'{name}: {before["wall_ms"]} ms -> {result["wall_ms"]} ms')
+
+        if result['queries'] > before['queries']:
+            regressions.append(f'{name}: {before["queries"]} -> {result["queries"]} queries')
+
+        if result['peak_kb'] > before['peak_kb'] * threshold:
+            regressions.append(f'{name}: {before["peak_kb"]} KB -> {result["peak_kb"]} KB peak')
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--seasons', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--out', help='write the JSON report here')
+    parser.add_argument('--baseline', help='earlier JSON report to compare against')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='allowed slowdown / memory growth factor against the baseline')
+    args = parser.parse_args()
+
+    report = run(args)
+
+    print(f'{args.seasons} seasons, {args.players} players, median of {args.repeat}\n')
+    print(f'{"route":<20} {"wall ms":>9} {"min ms":>9} {"queries":>8} {"peak KB":>9}')
+    for name, result in report['routes'].items():
+        print(f'{name:<20} {result["wall_ms"]:>9} {result["min_ms"]:>9} {result["queries"]:>8} '
+              f'{result["peak_kb"]:>9}')
+
+    if args.out:
+        with open(args.out, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.threshold)
+
+        if regressions:
+            print('\nRegressions:')
+            for regression in regressions:
+                print(f'  {regression}')
+
+            sys.exit(1)
+
+        print('\nNo regressions against', args.baseline)
+
+
+if __name__ == '__main__':
+    main()
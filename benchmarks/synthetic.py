@@ -0,0 +1,171 @@
+"""Deterministic synthetic JLTV history for benchmarks.
+
+``populate`` fills an empty database (schema created by main.py) with N players x M seasons x 30 games. Every
+season is replayed with the same engine the app uses, so the stored aggregates are consistent with the games.
+The empty first season main.py makes at start-up is replaced.
+"""
+import random
+import sqlite3
+
+import aggregates
+import archives
+import history
+import map_stats
+import pairs
+import ratings
+from recompute import StatRow, RosterRow, replay_season
+
+MAPS = ['Dust II', 'Mirage', 'Inferno', 'Train', 'Overpass', 'Cache', 'Ancient', 'Nuke', 'Anubis', 'Vertigo']
+
+
+def new_season_player(row_id, player_id, individual):
+    return {'id': row_id, 'player_id': player_id, 'played': 0, 'total_wins': 0, 'total_kills': 0,
+            'total_rounds': 0, 'AK': 0, 'KPR': 0, 'A_ADR': 0, 'winrate': 0, 'inconsistency': 0,
+            'team_balance': 0, 'JLTV': 0, 'individual': individual, 'MLTV': 0, 'sum_adr': 0, 'sum_jltv': 0,
+            'sum_mltv': 0, 'jltv_mean': 0, 'jltv_m2': 0}
+
+
+def play_game(rng, game_id, season_id, roster, skill, stat_id):
+    lineup = rng.sample(sorted(roster), 10)
+    rounds = rng.randint(16, 30)
+    stats = []
+
+    for position, player_id in enumerate(lineup):
+        win = 1 if position < 5 else 0
+        kills = max(1, int(rng.gauss(skill[player_id] * rounds, 4)))
+        damage = kills * rng.uniform(70, 110) + rng.randint(0, 400)
+        adr = int(round(damage / rounds, 0))
+        kpr = round(kills / rounds, 2)
+        mltv = ratings.game_mltv(kpr, win)
+
+        stats.append({'id': stat_id + position, 'kills': kills, 'KPR': kpr, 'ADR': adr, 'win': win, 'JLTV': 0.0,
+                      'MLTV': mltv, 'player_id': player_id, 'game_id': game_id, 'season_id': season_id})
+
+        # Same running updates as add_game
+        player = roster[player_id]
+        player['played'] += 1
+        player['total_wins'] += win
+        player['total_kills'] += kills
+        player['total_rounds'] += rounds
+        player['sum_adr'] += adr
+        player['sum_mltv'] += mltv
+        player['KPR'] = round(player['total_kills'] / player['total_rounds'], 3)
+        player['A_ADR'] = round(player['sum_adr'] / player['played'], 0)
+        player['winrate'] = round((player['total_wins'] / player['played']) * 100, 0)
+        player['AK'] = round(player['total_kills'] / player['played'], 2)
+        player['individual'] = ratings.individual(player['KPR'], player['A_ADR'])
+
+    return {'game_id': game_id, 'map_name': rng.choice(MAPS), 'rounds': rounds, 'season_id': season_id}, stats
+
+
+def roll_up(lifetime, season_rows):
+    # Lifetime rollup from every season row of one player, as adjust_jltv does at 30 games
+    played = [row for row in season_rows if row['played'] > 0]
+    lifetime['played'] = sum(row['played'] for row in played)
+    lifetime['total_wins'] = sum(row['total_wins'] for row in played)
+    lifetime['total_kills'] = sum(row['total_kills'] for row in played)
+    lifetime['total_rounds'] = sum(row['total_rounds'] for row in played)
+
+    if not played:
+        return
+
+    state = aggregates.EMPTY
+    for row in played:
+        state = aggregates.merge(state, (row['played'], row['jltv_mean'], row['jltv_m2']))
+
+    lifetime['AK'] = round(lifetime['total_kills'] / lifetime['played'], 2)
+    lifetime['KPR'] = round(lifetime['total_kills'] / lifetime['total_rounds'], 3)
+    lifetime['A_ADR'] = round(sum(row['A_ADR'] for row in season_rows) / len(season_rows), 0)
+    lifetime['winrate'] = round((lifetime['total_wins'] / lifetime['played']) * 100, 0)
+    lifetime['individual'] = ratings.individual(lifetime['KPR'], lifetime['A_ADR'])
+    lifetime['MLTV'] = round(sum(row['MLTV'] for row in season_rows) / len(season_rows), 1)
+
+    if lifetime['MLTV']:
+        lifetime['team_balance'] = ratings.team_balance(lifetime['KPR'], lifetime['winrate'], lifetime['A_ADR'],
+                                                        lifetime['MLTV'])
+
+    lifetime['sum_mltv'] = sum(row['sum_mltv'] for row in played)
+    lifetime['jltv_count'], lifetime['jltv_mean'], lifetime['jltv_m2'] = state
+
+    if state[0] >= 2:
+        lifetime['inconsistency'] = round(aggregates.stdev(state), 1)
+
+    lifetime['JLTV'] = ratings.overall_jltv(lifetime['MLTV'], lifetime['sum_mltv'])
+
+
+def insert(connection, table, rows):
+    if rows:
+        columns = list(rows[0])
+        quoted = ', '.join(f'"{column}"' for column in columns)
+        placeholders = ', '.join(f':{column}' for column in columns)
+        connection.executemany(f'INSERT INTO {table} ({quoted}) VALUES ({placeholders})', rows)
+
+
+def populate(path, players=40, seasons=50, games_per_season=30, seed=0):
+    rng = random.Random(seed)
+    connection = sqlite3.connect(path)
+
+    # Importing main seeds an empty season 1; the synthetic seasons are numbered from 1
+    connection.execute('DELETE FROM seasons WHERE games_played = 0 AND NOT EXISTS (SELECT 1 FROM games)')
+
+    skill = {player_id: rng.uniform(0.45, 1.05) for player_id in range(1, players + 1)}
+    lifetime = {player_id: {'player_id': player_id, 'name': f'Player {player_id}', 'played': 0, 'total_wins': 0,
+                            'total_kills': 0, 'total_rounds': 0, 'AK': 0, 'KPR': 0, 'A_ADR': 0, 'winrate': 0,
+                            'inconsistency': 0, 'team_balance': 0, 'JLTV': 0, 'individual': 20.0, 'MLTV': 0,
+                            'sum_mltv': 0, 'jltv_count': 0, 'jltv_mean': 0, 'jltv_m2': 0}
+                for player_id in skill}
+
+    seasons_played = {player_id: [] for player_id in skill}
+    individual = {player_id: 20.0 for player_id in skill}
+    season_row_id = stat_id = game_id = 1
+
+    for season_id in range(1, seasons + 1):
+        roster = {}
+        for player_id in skill:
+            roster[player_id] = new_season_player(season_row_id, player_id, individual[player_id])
+            season_row_id += 1
+
+        games, stats = [], []
+        for _ in range(games_per_season):
+            game, game_stats = play_game(rng, game_id, season_id, roster, skill, stat_id)
+            games.append(game)
+            stats.extend(game_stats)
+            game_id += 1
+            stat_id += 10
+
+        # Final replay of the season, exactly as the app runs it after the last game
+        stat_updates, roster_updates = replay_season(
+            [StatRow(*(stat[field] for field in StatRow._fields)) for stat in stats],
+            [RosterRow(*(player[field] for field in RosterRow._fields)) for player in roster.values()])
+
+        by_id = {stat['id']: stat for stat in stats}
+        for update in stat_updates:
+            by_id[update['id']].update(update)
+
+        by_row = {player['id']: player for player in roster.values()}
+        for update in roster_updates:
+            by_row[update['id']].update(update)
+
+        for player_id, player in roster.items():
+            player['name'] = f'Player {player_id}'
+            player['season_id'] = season_id
+            individual[player_id] = player['individual']
+            seasons_played[player_id].append(player)
+
+            if games_per_season == 30 and player['played'] > 0:
+                roll_up(lifetime[player_id], seasons_played[player_id])
+
+        player_count = sum(1 for player in roster.values() if player['played'] > 0)
+        connection.execute('INSERT INTO seasons (season_id, games_played, player_count, rolled_up) '
+                           'VALUES (?, ?, ?, ?)', (season_id, games_per_season, player_count, games_per_season == 30))
+        insert(connection, 'games', games)
+        insert(connection, 'player_stats', stats)
+        insert(connection, 'season_players', list(roster.values()))
+
+    insert(connection, 'players', list(lifetime.values()))
+    pairs.rebuild(connection)
+    map_stats.rebuild(connection)
+    history.rebuild(connection)
+    archives.freeze(connection)
+    connection.commit()
+    connection.close()
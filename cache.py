@@ -0,0 +1,73 @@
+"""Rendered-page cache shared by every gunicorn worker.
+
+Pages are stored in a small SQLite file next to the app database, keyed on the page, the viewer variant and
+the data version that the write routes bump. A new version makes every older entry unreachable; entries are
+also evicted oldest first once the cache holds more than ``PAGE_CACHE_SIZE`` pages. A hit only reads the file,
+so cached page views never queue behind each other for its write lock.
+"""
+from contextlib import closing
+import os
+import sqlite3
+import time
+
+
+class PageCache:
+    def __init__(self, app=None):
+        self.path = None
+        self.max_entries = 32
+        self.enabled = True
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.path = app.config.get('PAGE_CACHE_PATH') or os.path.join(app.instance_path, 'page_cache.db')
+        self.max_entries = int(app.config.get('PAGE_CACHE_SIZE', 32))
+        self.enabled = bool(app.config.get('PAGE_CACHE_ENABLED', True))
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with closing(self._connect()) as connection, connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+
+            # A cache file from before eviction went by insertion time is just started again
+            columns = {row[1] for row in connection.execute('PRAGMA table_info(pages)')}
+            if 'last_used' in columns:
+                connection.execute('DROP TABLE pages')
+
+            connection.execute('CREATE TABLE IF NOT EXISTS pages ('
+                               'key TEXT NOT NULL, version INTEGER NOT NULL, body TEXT NOT NULL, '
+                               'stored_at REAL NOT NULL, PRIMARY KEY (key, version))')
+
+        app.extensions['page_cache'] = self
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key, version):
+        if not self.enabled:
+            return None
+
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute('SELECT body FROM pages WHERE key = ? AND version = ?',
+                                     (key, version)).fetchone()
+
+        return row[0] if row is not None else None
+
+    def set(self, key, version, body):
+        if not self.enabled:
+            return
+
+        with closing(self._connect()) as connection, connection:
+            connection.execute('INSERT OR REPLACE INTO pages (key, version, body, stored_at) VALUES (?, ?, ?, ?)',
+                               (key, version, body, time.time()))
+
+            # Older versions can never be served again
+            connection.execute('DELETE FROM pages WHERE version < ?', (version,))
+
+            connection.execute('DELETE FROM pages WHERE rowid NOT IN '
+                               '(SELECT rowid FROM pages ORDER BY stored_at DESC LIMIT ?)', (self.max_entries,))
+
+    def clear(self):
+        with closing(self._connect()) as connection, connection:
+            connection.execute('DELETE FROM pages')
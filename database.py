@@ -0,0 +1,118 @@
+"""SQLite set up for several gunicorn workers sharing one database file.
+
+With ``SQLITE_CONCURRENT`` on, the database runs in WAL mode and every process gets two engines on it:
+
+- a writer with a single pooled connection whose transactions all start with ``BEGIN IMMEDIATE``, so writes
+  within a process queue for that connection and writes across processes queue on SQLite's write lock (for up
+  to ``SQLITE_BUSY_TIMEOUT`` seconds) instead of failing with "database is locked" half way through;
+- a pool of ``SQLITE_READ_POOL`` query-only connections. Views decorated with ``read_only`` read through it, so
+  page views carry on against the last committed data while a write or a season recompute holds the lock.
+
+Flushes and INSERT/UPDATE/DELETE statements always go to the writer, even from a read-only view.
+
+With it off (the default) the app keeps the one default engine and nothing here changes its behaviour.
+"""
+from functools import wraps
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+READ_BIND = 'read'
+
+# Applied to every connection; journal_mode sticks to the file, the rest are per connection
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('temp_store', 'MEMORY'),
+    ('cache_size', -16000),
+    ('mmap_size', 256 * 1024 * 1024),
+)
+
+
+class RoutingSession(Session):
+    """Session that sends the reads of a read-only view to the read bind."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and self.info.get('read_only') and not self._flushing
+                and not getattr(clause, 'is_dml', False)):
+            engine = self._db.engines.get(READ_BIND)
+
+            if engine is not None:
+                return engine
+
+        return super().get_bind(mapper, clause, bind, **kwargs)
+
+
+def is_file_sqlite(uri):
+    url = make_url(uri)
+
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+class ConcurrentSQLite:
+    def __init__(self, app=None, db=None):
+        self.db = None
+        self.enabled = False
+
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        """Set up the engines on ``app`` and then initialise ``db`` (a SQLAlchemy created without an app)."""
+        self.db = db
+        self.enabled = (bool(app.config.get('SQLITE_CONCURRENT', False))
+                        and is_file_sqlite(app.config['SQLALCHEMY_DATABASE_URI']))
+
+        if self.enabled:
+            uri = app.config['SQLALCHEMY_DATABASE_URI']
+            busy_timeout = float(app.config.get('SQLITE_BUSY_TIMEOUT', 30))
+            readers = int(app.config.get('SQLITE_READ_POOL', 8))
+
+            options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+            options.update(pool_size=1, max_overflow=0, pool_timeout=busy_timeout,
+                           connect_args={'timeout': busy_timeout, 'check_same_thread': False})
+
+            app.config.setdefault('SQLALCHEMY_BINDS', {})[READ_BIND] = {
+                'url': uri, 'pool_size': readers, 'max_overflow': 0, 'pool_timeout': busy_timeout,
+                'connect_args': {'timeout': busy_timeout, 'check_same_thread': False}}
+
+        db.init_app(app)
+        app.extensions['concurrent_sqlite'] = self
+
+        if not self.enabled:
+            return
+
+        with app.app_context():
+            engines = db.engines
+
+        self._listen(engines[None], 'BEGIN IMMEDIATE')
+        self._listen(engines[READ_BIND], 'BEGIN', query_only=True)
+
+    @staticmethod
+    def _listen(engine, begin, query_only=False):
+        @event.listens_for(engine, 'connect')
+        def connect(connection, record):
+            # pysqlite's own transaction handling would defer BEGIN until the first write
+            connection.isolation_level = None
+
+            for name, value in PRAGMAS:
+                connection.execute(f'PRAGMA {name}={value}')
+
+            if query_only:
+                connection.execute('PRAGMA query_only=ON')
+
+        @event.listens_for(engine, 'begin')
+        def begin_transaction(connection):
+            connection.exec_driver_sql(begin)
+
+    def read_only(self, view):
+        """Route the view's reads through the read pool (a no-op unless ``SQLITE_CONCURRENT`` is on)."""
+        @wraps(view)
+        def decorated(*args, **kwargs):
+            if self.enabled:
+                self.db.session.info['read_only'] = True
+
+            return view(*args, **kwargs)
+
+        return decorated
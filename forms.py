@@ -1,11 +1,15 @@
 from flask_wtf import FlaskForm
-from wtforms import BooleanField, SubmitField, SelectField, IntegerField, StringField, FloatField, PasswordField
+from wtforms import BooleanField, SubmitField, SelectField, IntegerField, StringField, FloatField, PasswordField, \
+    SelectMultipleField
 from wtforms.validators import DataRequired
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 
 MAP_NAME = [('Dust II', 'Dust II'), ('Mirage', 'Mirage'), ('Inferno', 'Inferno'), ('Train', 'Train'),
             ('Overpass', 'Overpass'), ('Cache', 'Cache'), ('Ancient', 'Ancient'), ('Nuke', 'Nuke'),
             ('Anubis', 'Anubis'), ('Vertigo', 'Vertigo')]
 
+RATING_SOURCE = [('lifetime', 'Lifetime JLTV'), ('season', 'Season JLTV')]
+
 
 # WTForm
 class StatsForm(FlaskForm):
@@ -83,6 +87,14 @@ class TeamsForm(FlaskForm):
     player8 = SelectField(u'Player 8', coerce=int)
     player9 = SelectField(u'Player 9', coerce=int)
     player10 = SelectField(u'Player 10', coerce=int)
+    rating_source = SelectField(u'Ratings', choices=RATING_SOURCE)
+
+    submit = SubmitField("Submit")
+
+
+class QueueForm(FlaskForm):
+    queue = SelectMultipleField(u'Queue', coerce=int, validators=[DataRequired()])
+    rating_source = SelectField(u'Ratings', choices=RATING_SOURCE)
 
     submit = SubmitField("Submit")
 
@@ -92,3 +104,9 @@ class LoginForm(FlaskForm):
     password = PasswordField('Password', validators=[DataRequired()])
 
     submit = SubmitField("Let Me In!")
+
+
+class ImportForm(FlaskForm):
+    games_file = FileField('Games (CSV or JSON)', validators=[FileRequired(), FileAllowed(['csv', 'json'])])
+
+    submit = SubmitField("Import")
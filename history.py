@@ -0,0 +1,130 @@
+"""Game-by-game rating history of every player's season, one packed row per player-season.
+
+``rating_history.points`` is an ``array('i')`` of four ints per game the player played, oldest first: the
+game_id, then the season JLTV, MLTV and Individual after that game, each times ``SCALE`` (the values are stored
+to at most two decimals, so the ints are exact). A point is what the season row would hold if the season ended
+after that game, using the season's current game JLTVs, so the last point always matches ``SeasonPlayer``.
+
+The recompute calls ``update_season`` once it has written the replayed JLTVs; only the blobs that changed are
+written. Reading a player's history is a single row (or one primary-key range for every season).
+
+Functions take a DB-API (sqlite3) connection and never commit.
+"""
+from array import array
+from collections import namedtuple
+import sys
+
+import ratings
+
+Point = namedtuple('Point', 'game_id JLTV MLTV individual')
+
+SCALE = 100
+FIELDS = len(Point._fields)
+
+# A season's games in the order the recompute rebuilds each player's aggregates
+SEASON_ROWS_SQL = (
+    'SELECT player_stats.player_id, player_stats.game_id, player_stats.kills, games.rounds, player_stats."ADR", '
+    'player_stats."JLTV", player_stats."MLTV" FROM player_stats JOIN games ON games.game_id = player_stats.game_id '
+    'WHERE player_stats.season_id = ? ORDER BY player_stats.id')
+
+
+def pack(points):
+    values = array('i')
+    for point in points:
+        values.extend((point.game_id, round(point.JLTV * SCALE), round(point.MLTV * SCALE),
+                       round(point.individual * SCALE)))
+
+    # Stored little-endian whatever the machine
+    if sys.byteorder == 'big':
+        values.byteswap()
+
+    return values.tobytes()
+
+
+def unpack(blob):
+    values = array('i')
+    values.frombytes(blob)
+
+    if sys.byteorder == 'big':
+        values.byteswap()
+
+    return [Point(values[i], values[i + 1] / SCALE, values[i + 2] / SCALE, values[i + 3] / SCALE)
+            for i in range(0, len(values), FIELDS)]
+
+
+def season_points(rows):
+    """Each player's Points from a season's ``SEASON_ROWS_SQL`` rows, rounded the way the season rows are."""
+    totals = {}
+    points = {}
+
+    for player_id, game_id, kills, rounds, adr, jltv, mltv in rows:
+        # played, kills, rounds, ADR, JLTV and MLTV so far
+        total = totals.setdefault(player_id, [0, 0, 0, 0, 0, 0])
+        for index, value in enumerate((1, kills, rounds, adr, jltv, mltv)):
+            total[index] += value
+
+        played, total_kills, total_rounds, sum_adr, sum_jltv, sum_mltv = total
+
+        season_mltv = round(sum_jltv / played, 1)
+        individual = ratings.individual(round(total_kills / total_rounds, 3), round(sum_adr / played, 0))
+
+        points.setdefault(player_id, []).append(
+            Point(game_id, ratings.overall_jltv(season_mltv, sum_mltv), season_mltv, individual))
+
+    return points
+
+
+def update_season(connection, season_id):
+    """Rewrite the season's blobs that no longer match its games; returns how many rows were written or removed."""
+    blobs = {player_id: pack(points)
+             for player_id, points in season_points(connection.execute(SEASON_ROWS_SQL, (season_id,))).items()}
+    stored = dict(connection.execute('SELECT player_id, points FROM rating_history WHERE season_id = ?',
+                                     (season_id,)))
+
+    changed = [(player_id, season_id, blob) for player_id, blob in blobs.items() if stored.get(player_id) != blob]
+    removed = [(player_id, season_id) for player_id in stored if player_id not in blobs]
+
+    connection.executemany('INSERT OR REPLACE INTO rating_history (player_id, season_id, points) VALUES (?, ?, ?)',
+                           changed)
+    connection.executemany('DELETE FROM rating_history WHERE player_id = ? AND season_id = ?', removed)
+
+    return len(changed) + len(removed)
+
+
+def rebuild(connection, season_id=None):
+    """``update_season`` for one season or every season with games or stored history."""
+    if season_id is not None:
+        return update_season(connection, season_id)
+
+    seasons = [row[0] for row in connection.execute('SELECT DISTINCT season_id FROM player_stats UNION '
+                                                    'SELECT DISTINCT season_id FROM rating_history')]
+
+    return sum(update_season(connection, season) for season in seasons)
+
+
+def season_history(connection, player_id, season_id):
+    row = connection.execute('SELECT points FROM rating_history WHERE player_id = ? AND season_id = ?',
+                             (player_id, season_id)).fetchone()
+
+    return unpack(row[0]) if row else []
+
+
+def player_history(connection, player_id):
+    """``{season_id: [Point, ...]}`` for every season the player has games in."""
+    rows = connection.execute('SELECT season_id, points FROM rating_history WHERE player_id = ? ORDER BY season_id',
+                              (player_id,))
+
+    return {season_id: unpack(blob) for season_id, blob in rows}
+
+
+def sparkline(values, width=240, height=40):
+    # SVG polyline points, highest value at the top; a single value is drawn as a flat line
+    if not values:
+        return ''
+
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    step = width / max(len(values) - 1, 1)
+
+    return ' '.join(f'{index * step:.1f},{height - (value - low) / span * height:.1f}'
+                    for index, value in enumerate(values if len(values) > 1 else values * 2))
@@ -0,0 +1,209 @@
+"""Parsing and validation for bulk game imports.
+
+Two formats are accepted. CSV has one row per player line, with the rows of a game next to each other::
+
+    game,map_name,rounds,player,kills,damage,win
+    1,Mirage,24,Shaz,21,2310,1
+    ...
+
+JSON is a list of games (or ``{"games": [...]}``)::
+
+    [{"map_name": "Mirage", "rounds": 24, "players": [{"player": "Shaz", "kills": 21, "damage": 2310, "win": true},
+                                                       ...]}]
+
+``player`` is a player name (case-insensitive) or id, ``damage`` is the total for the game as on the add game
+form, and ``win`` accepts 1/0, y/n, yes/no, true/false or w/l. As on the form, kills and damage must be at least
+1, and the kills must come to a KPR of at least 0.01: a losing game's MLTV divides by it. Every game is checked
+before anything is written.
+"""
+from collections import namedtuple
+import csv
+import io
+import json
+
+GameRecord = namedtuple('GameRecord', 'map_name rounds lines')
+Line = namedtuple('Line', 'player_id kills damage win')
+
+CSV_COLUMNS = ('game', 'map_name', 'rounds', 'player', 'kills', 'damage', 'win')
+
+WIN_VALUES = {'1': True, 'y': True, 'yes': True, 'true': True, 'w': True,
+              '0': False, 'n': False, 'no': False, 'false': False, 'l': False, '': False}
+
+LINES_PER_GAME = 10
+WINNERS_PER_GAME = 5
+
+
+class InvalidImport(ValueError):
+    """Raised with every problem found in the file, one per line of the message."""
+
+    def __init__(self, errors):
+        super().__init__('\n'.join(errors))
+        self.errors = errors
+
+
+def read_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [column for column in CSV_COLUMNS if column not in (reader.fieldnames or [])]
+
+    if missing:
+        raise InvalidImport([f'CSV is missing the column(s): {", ".join(missing)}'])
+
+    games = []
+    key = None
+    for row in reader:
+        if not games or row['game'] != key:
+            key = row['game']
+            games.append({'map_name': row['map_name'], 'rounds': row['rounds'], 'players': []})
+
+        elif (row['map_name'], row['rounds']) != (games[-1]['map_name'], games[-1]['rounds']):
+            games[-1]['conflict'] = True
+
+        games[-1]['players'].append({'player': row['player'], 'kills': row['kills'], 'damage': row['damage'],
+                                     'win': row['win']})
+
+    return games
+
+
+def read_json(text):
+    try:
+        data = json.loads(text)
+
+    except ValueError as e:
+        raise InvalidImport([f'Invalid JSON: {e}'])
+
+    if isinstance(data, dict):
+        data = data.get('games')
+
+    if not isinstance(data, list):
+        raise InvalidImport(['JSON must be a list of games or {"games": [...]}'])
+
+    return data
+
+
+def read(filename, text):
+    if filename.lower().endswith('.json'):
+        return read_json(text)
+
+    return read_csv(text)
+
+
+def whole_number(value):
+    # Ints, whole floats and their string forms; bools and fractions are rejected
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError
+
+    if isinstance(value, (int, float)):
+        return int(value)
+
+    return int(str(value).strip())
+
+
+def find_player(value, by_name):
+    # Names win over ids for strings, so a player called "47" is found by name
+    if isinstance(value, str):
+        player_id = by_name.get(value.strip().lower())
+
+        if player_id is not None:
+            return player_id
+
+    try:
+        return whole_number(value)
+
+    except (TypeError, ValueError):
+        return None
+
+
+def validate(games, players):
+    """Turn parsed games into GameRecords, or raise InvalidImport listing every problem.
+
+    ``players`` maps player ids to names.
+    """
+    by_name = {name.strip().lower(): player_id for player_id, name in players.items()}
+    records = []
+    errors = []
+
+    for number, game in enumerate(games, 1):
+        problems = []
+
+        if not isinstance(game, dict):
+            errors.append(f'Game {number}: expected an object')
+            continue
+
+        if game.get('conflict'):
+            problems.append('rows disagree on the map or rounds')
+
+        map_name = str(game.get('map_name') or '').strip()
+        if not map_name or len(map_name) > 50:
+            problems.append('map_name must be 1-50 characters')
+
+        try:
+            rounds = whole_number(game.get('rounds'))
+            if rounds <= 0:
+                raise ValueError
+
+        except (TypeError, ValueError):
+            problems.append(f'rounds must be a positive whole number, got {game.get("rounds")!r}')
+            rounds = None
+
+        entries = game.get('players')
+        if not isinstance(entries, list):
+            entries = []
+
+        lines = []
+        for position, entry in enumerate(entries, 1):
+            if not isinstance(entry, dict):
+                problems.append(f'player line {position} must be an object')
+                continue
+
+            player = entry.get('player')
+            player_id = find_player(player, by_name)
+
+            if player_id not in players:
+                problems.append(f'unknown player {player!r}')
+
+            try:
+                kills = whole_number(entry.get('kills'))
+                damage = whole_number(entry.get('damage'))
+
+                if kills <= 0 or damage <= 0:
+                    raise ValueError
+
+            except (TypeError, ValueError):
+                problems.append(f'{player!r} needs whole kills and damage of at least 1')
+                continue
+
+            if rounds and round(kills / rounds, 2) == 0:
+                problems.append(f'{player!r} has {kills} kill(s) in {rounds} rounds, a KPR that rounds to 0')
+                continue
+
+            win = entry.get('win')
+            win = WIN_VALUES.get(str(win).strip().lower()) if not isinstance(win, bool) else win
+
+            if win is None:
+                problems.append(f'{player!r} has an unrecognised win value {entry.get("win")!r}')
+                continue
+
+            lines.append(Line(player_id, kills, damage, win))
+
+        if len(entries) != LINES_PER_GAME:
+            problems.append(f'needs {LINES_PER_GAME} player lines, got {len(entries)}')
+
+        elif len({line.player_id for line in lines}) != len(lines):
+            problems.append('a player is listed twice')
+
+        if sum(line.win for line in lines) != WINNERS_PER_GAME and len(lines) == LINES_PER_GAME:
+            problems.append(f'needs {WINNERS_PER_GAME} winners, got {sum(line.win for line in lines)}')
+
+        if problems:
+            errors.extend(f'Game {number}: {problem}' for problem in problems)
+
+        else:
+            records.append(GameRecord(map_name, rounds, lines))
+
+    if not games:
+        errors.append('The file has no games')
+
+    if errors:
+        raise InvalidImport(errors)
+
+    return records
@@ -0,0 +1,209 @@
+"""NumPy rating kernel: the formulas of ``ratings`` over arrays of the whole game history.
+
+``load_history`` reads every PlayerGameStats row once and precomputes what each player knew before each game
+(their season KPR, average ADR and win rate so far, or the previous season's for their first game). None of that
+depends on the formula constants, so ``evaluate`` can score any ``Constants`` with a handful of array operations,
+which is what lets ``sweep.py`` try thousands of combinations in seconds.
+
+The constant-dependent formulas round with NumPy, which can differ from Python's ``round`` on exact ties.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+import ratings
+
+Constants = namedtuple('Constants', 'kpr_scale rating_exponent winrate_offset winrate_exponent neutral_winrate '
+                                    'adr_scale adr_exponent game_scale individual_scale jltv_base mltv_factor '
+                                    'mltv_win_divisor mltv_loss_kills mltv_loss_divisor')
+
+DEFAULTS = Constants(ratings.KPR_SCALE, ratings.RATING_EXPONENT, ratings.WINRATE_OFFSET, ratings.WINRATE_EXPONENT,
+                     ratings.NEUTRAL_WINRATE, ratings.ADR_SCALE, ratings.ADR_EXPONENT, ratings.GAME_SCALE,
+                     ratings.INDIVIDUAL_SCALE, ratings.JLTV_BASE, ratings.MLTV_FACTOR, ratings.MLTV_WIN_DIVISOR,
+                     ratings.MLTV_LOSS_KILLS, ratings.MLTV_LOSS_DIVISOR)
+
+History = namedtuple('History', 'game_id season_id player_id win kills rounds adr kpr game_index games '
+                                'pre_kpr pre_adr pre_winrate pre_played group_order group_starts group_sizes')
+
+Score = namedtuple('Score', 'accuracy log_loss scale')
+
+
+def game_mltv(kpr, win, c=DEFAULTS):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(win, kpr * c.mltv_factor * c.mltv_factor / c.mltv_win_divisor,
+                        -(c.mltv_loss_kills * c.mltv_factor * c.mltv_factor / c.mltv_loss_divisor) / kpr)
+
+
+def game_jltv(kpr, winrate, adr, own_avg, opp_avg, c=DEFAULTS):
+    return np.round((((((kpr * c.kpr_scale) ** c.rating_exponent) *
+                       ((winrate + c.winrate_offset) ** c.winrate_exponent) *
+                       ((adr / c.adr_scale) ** c.adr_exponent)) ** c.rating_exponent) * c.game_scale) *
+                    (opp_avg / own_avg), 1)
+
+
+def individual(kpr, a_adr, c=DEFAULTS):
+    return np.round(((((kpr * c.kpr_scale) ** c.rating_exponent) *
+                      ((c.neutral_winrate + c.winrate_offset) ** c.winrate_exponent) *
+                      (a_adr / c.adr_scale) ** c.adr_exponent) ** c.rating_exponent) * c.individual_scale, 1)
+
+
+def team_balance(kpr, winrate, a_adr, mltv, c=DEFAULTS):
+    return np.round((((((((kpr * c.kpr_scale) ** c.rating_exponent) *
+                         ((winrate + c.winrate_offset) ** c.winrate_exponent) *
+                         ((a_adr / c.adr_scale) ** c.adr_exponent)) ** c.rating_exponent) * c.individual_scale)
+                      - mltv) / mltv) * 100, 0)
+
+
+def overall_jltv(mltv, sum_mltv, c=DEFAULTS):
+    return np.round(c.jltv_base + (mltv / 2) + sum_mltv, 2)
+
+
+def py_round(values, digits):
+    # Python's round, element-wise; used where the precomputed inputs must match the stored values exactly
+    return np.frompyfunc(round, 2, 1)(values, digits).astype(float)
+
+
+def exclusive_cumsum(values, starts, sizes):
+    # Running total before each element, restarting at every group
+    total = np.cumsum(values, dtype=float)
+    before = total - values
+
+    return before - np.repeat(before[starts], sizes)
+
+
+def load_history(connection):
+    """Read every game row through a sqlite3 connection and precompute the pre-game inputs."""
+    rows = np.array(connection.execute(
+        'SELECT player_stats.game_id, player_stats.season_id, player_stats.player_id, player_stats.win, '
+        'player_stats.kills, games.rounds, player_stats."ADR" '
+        'FROM player_stats JOIN games ON games.game_id = player_stats.game_id '
+        'ORDER BY player_stats.game_id, player_stats.id').fetchall(), dtype=float).reshape(-1, 7)
+
+    game_id, season_id, player_id, win, kills, rounds, adr = rows.T
+    win = win.astype(bool)
+    games, game_index = np.unique(game_id, return_inverse=True)
+
+    # Group every player's games within a season, oldest first; the sort is stable so game order is kept
+    order = np.lexsort((season_id, player_id))
+    key = np.stack([player_id[order], season_id[order]])
+    starts = np.flatnonzero(np.r_[True, np.any(key[:, 1:] != key[:, :-1], axis=0)])
+    sizes = np.diff(np.r_[starts, len(order)])
+
+    played = exclusive_cumsum(np.ones(len(order)), starts, sizes)
+    wins = exclusive_cumsum(win[order].astype(float), starts, sizes)
+    total_kills = exclusive_cumsum(kills[order], starts, sizes)
+    total_rounds = exclusive_cumsum(rounds[order], starts, sizes)
+    sum_adr = exclusive_cumsum(adr[order], starts, sizes)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pre_kpr = py_round(total_kills / total_rounds, 3)
+        pre_adr = py_round(sum_adr / played, 0)
+        pre_winrate = py_round((wins / played) * 100, 0)
+
+    # A player's first game of a season uses where their previous played season ended
+    end = starts + sizes - 1
+    final_kpr = py_round((total_kills[end] + kills[order][end]) / (total_rounds[end] + rounds[order][end]), 3)
+    final_adr = py_round((sum_adr[end] + adr[order][end]) / (played[end] + 1), 0)
+
+    same_player = np.r_[False, key[0, starts[1:]] == key[0, starts[:-1]]]
+    carried_kpr = np.where(same_player, np.r_[np.nan, final_kpr[:-1]], np.nan)
+    carried_adr = np.where(same_player, np.r_[np.nan, final_adr[:-1]], np.nan)
+
+    # Nothing to carry for a player's first season: use the league's overall figures
+    league_kpr = round(kills.sum() / rounds.sum(), 3) if len(kills) else 0.0
+    league_adr = round(adr.mean(), 0) if len(adr) else 0.0
+
+    first = np.zeros(len(order), dtype=bool)
+    first[starts] = True
+    pre_kpr[first] = np.nan_to_num(carried_kpr, nan=league_kpr)
+    pre_adr[first] = np.nan_to_num(carried_adr, nan=league_adr)
+    pre_winrate[first] = 0
+
+    # Back from group order to row order
+    unsorted = np.empty_like(order)
+    unsorted[order] = np.arange(len(order))
+
+    return History(game_id, season_id, player_id, win, kills, rounds, adr, py_round(kills / rounds, 2),
+                   game_index, games, pre_kpr[unsorted], pre_adr[unsorted], pre_winrate[unsorted],
+                   played[unsorted], order, starts, sizes)
+
+
+def team_averages(history, values):
+    # (winners' average, losers' average) per game, rounded as add_game does
+    sums = np.bincount(history.game_index * 2 + history.win, weights=values, minlength=2 * len(history.games))
+    sums = sums.reshape(-1, 2)
+
+    return np.round(sums[:, 1] / 5, 1), np.round(sums[:, 0] / 5, 1)
+
+
+def pregame_individual(history, c=DEFAULTS):
+    return individual(history.pre_kpr, history.pre_adr, c)
+
+
+def pregame_jltv(history, c=DEFAULTS):
+    """Each player's season JLTV going into each game, built from the game values add_game would have stored."""
+    winners, losers = team_averages(history, pregame_individual(history, c))
+    own = np.where(history.win, winners[history.game_index], losers[history.game_index])
+    opp = np.where(history.win, losers[history.game_index], winners[history.game_index])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        jltv = game_jltv(history.kpr, history.pre_winrate, history.adr, own, opp, c)
+
+    mltv = game_mltv(history.kpr, history.win, c)
+
+    order, starts, sizes = history.group_order, history.group_starts, history.group_sizes
+    played = history.pre_played[order]
+    sum_jltv = exclusive_cumsum(jltv[order], starts, sizes)
+    sum_mltv = exclusive_cumsum(mltv[order], starts, sizes)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rating = np.where(played > 0, overall_jltv(np.round(sum_jltv / played, 1), sum_mltv, c), 0.0)
+
+    values = np.empty_like(rating)
+    values[order] = rating
+
+    return values
+
+
+PREDICTORS = {
+    'individual': pregame_individual,
+    'jltv': pregame_jltv,
+}
+
+
+def fit_scale(differences):
+    """Fit p(winner) = 1 / (1 + exp(-k * d)) on the winners' rating edge ``d``; returns k and the mean log-loss.
+
+    k is kept at 0 or above: a negative fit means the ratings pick the loser, which counts as no information.
+    """
+    differences = differences[np.isfinite(differences)]
+
+    if not len(differences) or not differences.any():
+        return 0.0, float(np.log(2))
+
+    k = 0.0
+    for _ in range(25):
+        p = 1 / (1 + np.exp(-k * differences))
+        gradient = np.sum((1 - p) * differences)
+        curvature = np.sum(p * (1 - p) * differences * differences)
+
+        if curvature <= 0:
+            break
+
+        k += gradient / curvature
+
+    k = max(k, 0.0)
+    log_loss = float(np.mean(np.logaddexp(0, -k * differences)))
+
+    return float(k), log_loss
+
+
+def evaluate(history, c=DEFAULTS, predictor='individual'):
+    """How well the pre-game team averages of ``predictor`` pick the winner of every stored game."""
+    winners, losers = team_averages(history, PREDICTORS[predictor](history, c))
+    differences = winners - losers
+
+    accuracy = float(np.mean(differences > 0) + 0.5 * np.mean(differences == 0))
+    scale, log_loss = fit_scale(differences)
+
+    return Score(accuracy, log_loss, scale)
@@ -0,0 +1,38 @@
+"""Tiering and JSON shapes shared by the ranking pages and the ``/api`` endpoints."""
+
+# Minimum JLTV of each tier, best first; anything below the last one is C tier
+TIER_FLOORS = (('s', 25.0), ('a', 20.0), ('b', 15.0))
+
+# Players with fewer games than this are listed as unranked
+RANKED_AFTER = 7
+
+PLAYER_FIELDS = ('player_id', 'name', 'JLTV', 'played', 'total_wins', 'total_kills', 'total_rounds', 'AK', 'KPR',
+                 'A_ADR', 'winrate', 'inconsistency', 'team_balance', 'individual', 'MLTV')
+
+STAT_FIELDS = ('player_id', 'kills', 'KPR', 'ADR', 'win', 'JLTV', 'MLTV')
+
+
+def tiers(players):
+    """Split players (already sorted by JLTV) into s/a/b/c tiers and unranked; players without games are left out."""
+    tiered = {'s': [], 'a': [], 'b': [], 'c': [], 'unranked': []}
+
+    for player in players:
+        if player.played <= 0:
+            continue
+
+        if player.played < RANKED_AFTER:
+            tiered['unranked'].append(player)
+            continue
+
+        tier = next((name for name, floor in TIER_FLOORS if player.JLTV >= floor), 'c')
+        tiered[tier].append(player)
+
+    return tiered
+
+
+def player_json(player):
+    return {field: getattr(player, field) for field in PLAYER_FIELDS}
+
+
+def tiers_json(players):
+    return {tier: [player_json(player) for player in members] for tier, members in tiers(players).items()}
@@ -0,0 +1,250 @@
+"""Streaming readers for CS:GO match data, feeding the same ingest path as the add game form.
+
+Two sources are read one line at a time, so a log of any size runs in constant memory:
+
+* a server console log (``log on``, ``mp_logdetail 3``). Warm-up is dropped at ``Match_Start``; kills and
+  damage on the other team are counted per player and each ``Game Over`` yields a match, won by whichever side
+  has the higher ``Team ... scored`` total. Team kills, self-damage and bots are ignored.
+* a match dump with one JSON object per line: ``{"map": "de_mirage", "rounds": 28, "winner": "CT",
+  "players": [{"name": ..., "steam_id": ..., "kills": ..., "damage": ..., "team": "CT"}, ...]}``.
+
+Players are matched to ``Player`` rows through an aliases file (``alias,player`` rows, where the alias is a
+Steam name or SteamID and the player a name or id), then by Steam name against the player names.
+
+    python logparser.py <server.log | matches.ndjson> [--aliases aliases.csv] [--dry-run]
+"""
+from collections import namedtuple
+import csv
+import json
+import re
+
+Match = namedtuple('Match', 'map_name rounds winner players')
+MatchPlayer = namedtuple('MatchPlayer', 'name steam_id kills damage team')
+
+SIDES = {'CT': 'CT', 'TERRORIST': 'T', 'T': 'T'}
+
+# Log map names onto the names used by the add game form
+MAP_NAMES = {
+    'de_dust2': 'Dust II', 'de_mirage': 'Mirage', 'de_inferno': 'Inferno', 'de_train': 'Train',
+    'de_overpass': 'Overpass', 'de_cache': 'Cache', 'de_ancient': 'Ancient', 'de_nuke': 'Nuke',
+    'de_anubis': 'Anubis', 'de_vertigo': 'Vertigo',
+}
+
+PREFIX = r'^(?:L \d\d/\d\d/\d{4} - \d\d:\d\d:\d\d(?:\.\d+)?: )?'
+PLAYER = r'"(.*?)<(\d+)><([^>]*)><([^>]*)>"'
+
+MAP_LINE = re.compile(PREFIX + r'(?:Loading|Started) map "([^"]+)"')
+MATCH_START = re.compile(PREFIX + r'World triggered "Match_Start" on "([^"]+)"')
+KILLED = re.compile(PREFIX + PLAYER + r' \[[^\]]*\] killed ' + PLAYER)
+ATTACKED = re.compile(PREFIX + PLAYER + r' \[[^\]]*\] attacked ' + PLAYER +
+                      r' \[[^\]]*\] with "[^"]*" \(damage "(\d+)"')
+SWITCHED = re.compile(PREFIX + PLAYER + r' switched from team <([^>]*)> to <([^>]*)>')
+SCORED = re.compile(PREFIX + r'Team "(CT|TERRORIST)" scored "(\d+)"')
+GAME_OVER = re.compile(PREFIX + r'Game Over: \S+ \S+ (\S+) score (\d+):(\d+)')
+
+
+def map_name(name):
+    # "workshop/123/de_mirage" and "de_mirage" both become "Mirage"; unknown maps are kept as they are
+    name = name.rsplit('/', 1)[-1]
+    return MAP_NAMES.get(name.lower(), name)
+
+
+def is_bot(steam_id):
+    return steam_id == 'BOT' or not steam_id
+
+
+class LogState:
+    """Per-match counters; only the players of the match in progress are held."""
+
+    def __init__(self, map_name=None):
+        self.map_name = map_name
+        self.score = {'CT': 0, 'T': 0}
+        self.players = {}
+
+    def player(self, name, steam_id, team):
+        entry = self.players.setdefault(steam_id, {'name': name, 'kills': 0, 'damage': 0, 'team': None})
+        entry['name'] = name
+
+        if team in SIDES:
+            entry['team'] = SIDES[team]
+
+        return entry
+
+    def match(self):
+        ct, t = self.score['CT'], self.score['T']
+        winner = 'CT' if ct > t else 'T' if t > ct else None
+        players = [MatchPlayer(entry['name'], steam_id, entry['kills'], entry['damage'], entry['team'])
+                   for steam_id, entry in self.players.items() if entry['team'] is not None]
+
+        return Match(self.map_name, ct + t, winner, players)
+
+
+def parse_log(lines):
+    """Yield a Match for every completed game in a server log."""
+    state = LogState()
+    started = False
+
+    for line in lines:
+        line = line.rstrip('\r\n')
+
+        # A substring test first; most lines match none of the patterns
+        found = ATTACKED.match(line) if ' attacked ' in line else None
+        if found:
+            attacker, attacker_id, attacker_team = found.group(1), found.group(3), found.group(4)
+            victim_team = found.group(8)
+
+            if started and not is_bot(attacker_id) and SIDES.get(attacker_team, attacker_team) != \
+                    SIDES.get(victim_team, victim_team):
+                state.player(attacker, attacker_id, attacker_team)['damage'] += int(found.group(9))
+
+            continue
+
+        found = KILLED.match(line) if ' killed ' in line else None
+        if found:
+            attacker, attacker_id, attacker_team = found.group(1), found.group(3), found.group(4)
+            victim, victim_id, victim_team = found.group(5), found.group(7), found.group(8)
+
+            if started:
+                if not is_bot(victim_id):
+                    state.player(victim, victim_id, victim_team)
+
+                if not is_bot(attacker_id) and SIDES.get(attacker_team, attacker_team) != \
+                        SIDES.get(victim_team, victim_team):
+                    state.player(attacker, attacker_id, attacker_team)['kills'] += 1
+
+            continue
+
+        found = SWITCHED.match(line) if ' switched from team ' in line else None
+        if found:
+            name, steam_id, new_team = found.group(1), found.group(3), found.group(6)
+
+            if not is_bot(steam_id):
+                entry = state.player(name, steam_id, new_team)
+
+                # Spectators and leavers aren't part of the final lineup
+                if new_team not in SIDES:
+                    entry['team'] = None
+
+            continue
+
+        found = SCORED.match(line) if ' scored ' in line else None
+        if found:
+            if started:
+                state.score[SIDES[found.group(1)]] = int(found.group(2))
+
+            continue
+
+        found = MATCH_START.match(line) if 'Match_Start' in line else None
+        if found:
+            # Warm-up and any restart before this are thrown away, but everyone keeps their side
+            teams = {steam_id: entry for steam_id, entry in state.players.items() if entry['team']}
+            state = LogState(map_name(found.group(1)))
+            for steam_id, entry in teams.items():
+                state.players[steam_id] = dict(entry, kills=0, damage=0)
+
+            started = True
+            continue
+
+        found = GAME_OVER.match(line) if 'Game Over: ' in line else None
+        if found:
+            if started:
+                if not any(state.score.values()):
+                    state.score = {'CT': int(found.group(2)), 'T': int(found.group(3))}
+
+                state.map_name = state.map_name or map_name(found.group(1))
+                yield state.match()
+
+            state = LogState(state.map_name)
+            started = False
+            continue
+
+        found = MAP_LINE.match(line) if ' map "' in line else None
+        if found:
+            state = LogState(map_name(found.group(1)))
+            started = False
+
+
+def parse_dump(lines):
+    """Yield a Match for every JSON object in a one-match-per-line dump."""
+    for line in lines:
+        if not line.strip():
+            continue
+
+        data = json.loads(line)
+        players = [MatchPlayer(player.get('name'), str(player.get('steam_id') or ''), player.get('kills'),
+                               player.get('damage'), SIDES.get(str(player.get('team')).upper()))
+                   for player in data.get('players', [])]
+
+        yield Match(map_name(str(data.get('map') or data.get('map_name') or '')), data.get('rounds'),
+                    SIDES.get(str(data.get('winner')).upper()), players)
+
+
+def read_aliases(path):
+    with open(path, newline='', encoding='utf-8') as file:
+        return {alias.strip().lower(): player.strip() for alias, player in csv.reader(file) if alias.strip()}
+
+
+def to_game(match, players, aliases):
+    """The match in the shape ``importer.validate`` takes; unmatched names are reported by the validation.
+
+    ``players`` maps player ids to names.
+    """
+    by_name = {name.strip().lower(): player_id for player_id, name in players.items()}
+    lines = []
+
+    for player in match.players:
+        alias = aliases.get(player.steam_id.lower()) or aliases.get((player.name or '').strip().lower())
+        target = alias if alias is not None else player.name
+
+        lines.append({'player': by_name.get(str(target).strip().lower(), target), 'kills': player.kills,
+                      'damage': player.damage, 'win': match.winner is not None and player.team == match.winner})
+
+    return {'map_name': match.map_name, 'rounds': match.rounds, 'players': lines}
+
+
+def read_matches(path):
+    # Dumps start with "{"; anything else is treated as a server log
+    with open(path, encoding='utf-8', errors='replace') as file:
+        first = file.readline()
+        file.seek(0)
+
+        parse = parse_dump if first.lstrip().startswith('{') else parse_log
+        yield from parse(file)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import importer
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--aliases', help='CSV of alias,player rows')
+    parser.add_argument('--dry-run', action='store_true', help='parse and validate without writing anything')
+    args = parser.parse_args()
+
+    # The app reads DATA_URI like the web server does
+    import main
+
+    aliases = read_aliases(args.aliases) if args.aliases else {}
+
+    with main.app.app_context():
+        known = dict(main.db.session.execute(main.db.select(main.Player.player_id, main.Player.name)).all())
+
+        records = []
+        for number, match in enumerate(read_matches(args.path), 1):
+            try:
+                records += importer.validate([to_game(match, known, aliases)], known)
+                print(f'Match {number}: {match.map_name}, {match.rounds} rounds, {match.winner} won')
+
+            except importer.InvalidImport as e:
+                print(f'Match {number} skipped: ' + '; '.join(error.split(': ', 1)[-1] for error in e.errors))
+
+        if args.dry_run or not records:
+            print(f'{len(records)} match(es) would be imported')
+
+        else:
+            seasons = main.import_records(records)
+            main.db.session.commit()
+            main.import_snapshot(seasons)
+            print(f'Imported {len(records)} match(es) into season(s) {", ".join(map(str, seasons))}')
@@ -1,14 +1,39 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, abort
+from flask import Flask, render_template, request, redirect, url_for, flash, abort, jsonify
 from flask_bootstrap import Bootstrap
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import update
 from sqlalchemy.orm import relationship
-from forms import StatsForm, PlayerForm, TeamsForm, LoginForm
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from forms import StatsForm, PlayerForm, TeamsForm, QueueForm, LoginForm, ImportForm
 from werkzeug.security import check_password_hash
 from flask_login import UserMixin, login_user, LoginManager, login_required, current_user, logout_user
 from functools import wraps
+from datetime import datetime, timezone
 from dotenv import load_dotenv
-import statistics
+from recompute import StatRow, RosterRow, replay_season
+from teams import best_split
+from matchmaking import make_lobbies
+from cache import PageCache
+from database import ConcurrentSQLite, RoutingSession
+from metrics import RequestMetrics
+from worker import RecomputeWorker
+import aggregates
+import archives
+import backups
+import importer
+import history
+import maintenance
+import map_stats
+import kernel
+import leaderboard
+import migrate
+import pairs
+import prediction
+import ratings
 import os
+import sqlite3
+import time
 
 load_dotenv()
 
@@ -19,7 +44,30 @@ Bootstrap(app)
 # CONNECT TO DB
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATA_URI')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+
+# MULTI-WORKER SQLITE (WAL, one serialized writer and a read pool per process; off by default)
+app.config['SQLITE_CONCURRENT'] = os.getenv('SQLITE_CONCURRENT', '0') == '1'
+app.config['SQLITE_READ_POOL'] = int(os.getenv('SQLITE_READ_POOL', 8))
+app.config['SQLITE_BUSY_TIMEOUT'] = float(os.getenv('SQLITE_BUSY_TIMEOUT', 30))
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+sqlite_mode = ConcurrentSQLite(app, db)
+
+# RENDERED PAGE CACHE (defaults to instance/page_cache.db)
+app.config['PAGE_CACHE_PATH'] = os.getenv('PAGE_CACHE_PATH')
+app.config['PAGE_CACHE_SIZE'] = int(os.getenv('PAGE_CACHE_SIZE', 32))
+
+# REQUEST AND SQL METRICS (/_metrics, X-Query-Count and Server-Timing headers)
+app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', '1') == '1'
+app.config['METRICS_HEADER'] = os.getenv('METRICS_HEADER', '0') == '1'
+
+# DATABASE SNAPSHOTS (defaults to instance/backups), one taken automatically before each season rollover
+app.config['BACKUP_DIR'] = os.getenv('BACKUP_DIR')
+app.config['BACKUP_ON_ROLLOVER'] = os.getenv('BACKUP_ON_ROLLOVER', '1') == '1'
+
+# BACKGROUND RECOMPUTE JOBS (defaults to instance/jobs.db)
+app.config['RECOMPUTE_JOBS_PATH'] = os.getenv('RECOMPUTE_JOBS_PATH')
+app.config['RECOMPUTE_DELAY'] = float(os.getenv('RECOMPUTE_DELAY', 1.0))
 
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -38,6 +86,9 @@ class Season(db.Model):
     games_played = db.Column(db.Integer, nullable=False)
     player_count = db.Column(db.Integer, nullable=False)
 
+    # Set once the completed season has been added to the lifetime Player stats
+    rolled_up = db.Column(db.Boolean, nullable=False, default=False)
+
     # Establishing the relationship between Season and Game (one-to-many)
     games = relationship('Game', back_populates='season')
 
@@ -50,6 +101,10 @@ class Season(db.Model):
 
 class Game(db.Model):
     __tablename__ = 'games'
+    __table_args__ = (
+        db.Index('ix_games_season_id', 'season_id'),
+    )
+
     game_id = db.Column(db.Integer, primary_key=True)
     map_name = db.Column(db.String(50), nullable=False)
     rounds = db.Column(db.Integer, nullable=False)
@@ -63,6 +118,11 @@ class Game(db.Model):
 
 class SeasonPlayer(db.Model):
     __tablename__ = 'season_players'
+    __table_args__ = (
+        db.Index('ix_season_players_season_id_player_id', 'season_id', 'player_id'),
+        db.Index('ix_season_players_player_id', 'player_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     player_id = db.Column(db.Integer, nullable=False)
     name = db.Column(db.String(50), nullable=False)
@@ -84,9 +144,20 @@ class SeasonPlayer(db.Model):
     individual = db.Column(db.Float, nullable=False)
     MLTV = db.Column(db.Float, nullable=False)
 
+    # Running sums and JLTV variance state (count is played) so a game can be added or removed in O(1)
+    sum_adr = db.Column(db.Integer, nullable=False, default=0)
+    sum_jltv = db.Column(db.Float, nullable=False, default=0)
+    sum_mltv = db.Column(db.Float, nullable=False, default=0)
+    jltv_mean = db.Column(db.Float, nullable=False, default=0)
+    jltv_m2 = db.Column(db.Float, nullable=False, default=0)
+
     season_id = db.Column(db.Integer, db.ForeignKey('seasons.season_id'), nullable=False)
     season = relationship('Season', back_populates='season_player')
 
+    @property
+    def jltv_state(self):
+        return self.played, self.jltv_mean, self.jltv_m2
+
 
 class Player(db.Model):
     __tablename__ = 'players'
@@ -110,12 +181,102 @@ class Player(db.Model):
     individual = db.Column(db.Float, nullable=False)
     MLTV = db.Column(db.Float, nullable=False)
 
+    # Running MLTV sum and JLTV variance state over every game of the completed seasons
+    sum_mltv = db.Column(db.Float, nullable=False, default=0)
+    jltv_count = db.Column(db.Integer, nullable=False, default=0)
+    jltv_mean = db.Column(db.Float, nullable=False, default=0)
+    jltv_m2 = db.Column(db.Float, nullable=False, default=0)
+
     # Establishing the relationship between Player and PlayerGameStats (one-to-many)
     player_stats = relationship('PlayerGameStats', back_populates='player')
 
+    @property
+    def jltv_state(self):
+        return self.jltv_count, self.jltv_mean, self.jltv_m2
+
+    @jltv_state.setter
+    def jltv_state(self, state):
+        self.jltv_count, self.jltv_mean, self.jltv_m2 = state
+
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+
+    # Unix time of the last bump, served as Last-Modified by the API
+    updated_at = db.Column(db.Float, nullable=False, default=0)
+
+
+class PlayerPair(db.Model):
+    # Games together and against for each pair of players, lower id first; kept up to date by pairs.py
+    __tablename__ = 'player_pairs'
+    __table_args__ = (
+        db.Index('ix_player_pairs_partner_id', 'partner_id'),
+    )
+
+    player_id = db.Column(db.Integer, primary_key=True)
+    partner_id = db.Column(db.Integer, primary_key=True)
+    together = db.Column(db.Integer, nullable=False, default=0)
+    wins_together = db.Column(db.Integer, nullable=False, default=0)
+    against = db.Column(db.Integer, nullable=False, default=0)
+    wins_against = db.Column(db.Integer, nullable=False, default=0)
+
+
+class PlayerMap(db.Model):
+    # Per-map totals of each player's season; kept up to date by map_stats.py
+    __tablename__ = 'player_maps'
+    __table_args__ = (
+        db.Index('ix_player_maps_map_name_season_id', 'map_name', 'season_id'),
+    )
+
+    player_id = db.Column(db.Integer, primary_key=True)
+    season_id = db.Column(db.Integer, primary_key=True)
+    map_name = db.Column(db.String(50), primary_key=True)
+    games = db.Column(db.Integer, nullable=False, default=0)
+    wins = db.Column(db.Integer, nullable=False, default=0)
+    kills = db.Column(db.Integer, nullable=False, default=0)
+    rounds = db.Column(db.Integer, nullable=False, default=0)
+    adr_sum = db.Column(db.Integer, nullable=False, default=0)
+    jltv_sum = db.Column(db.Float, nullable=False, default=0)
+
+
+class RatingHistory(db.Model):
+    # Packed game-by-game JLTV, MLTV and Individual of a player's season; see history.py
+    __tablename__ = 'rating_history'
+
+    player_id = db.Column(db.Integer, primary_key=True)
+    season_id = db.Column(db.Integer, primary_key=True)
+    points = db.Column(db.LargeBinary, nullable=False)
+
+
+class SeasonArchive(db.Model):
+    # Frozen copy of a closed season's SeasonPlayer row, merged into the lifetime stats; see archives.py
+    __tablename__ = 'season_archives'
+    __table_args__ = (
+        db.Index('ix_season_archives_player_id', 'player_id'),
+    )
+
+    season_id = db.Column(db.Integer, primary_key=True)
+    player_id = db.Column(db.Integer, primary_key=True)
+    played = db.Column(db.Integer, nullable=False)
+    total_wins = db.Column(db.Integer, nullable=False)
+    total_kills = db.Column(db.Integer, nullable=False)
+    total_rounds = db.Column(db.Integer, nullable=False)
+    A_ADR = db.Column(db.Integer, nullable=False)
+    MLTV = db.Column(db.Float, nullable=False)
+    sum_mltv = db.Column(db.Float, nullable=False)
+    jltv_mean = db.Column(db.Float, nullable=False)
+    jltv_m2 = db.Column(db.Float, nullable=False)
+
 
 class PlayerGameStats(db.Model):
     __tablename__ = 'player_stats'
+    __table_args__ = (
+        db.Index('ix_player_stats_season_id_player_id', 'season_id', 'player_id'),
+        db.Index('ix_player_stats_game_id', 'game_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     kills = db.Column(db.Integer, nullable=False)
     KPR = db.Column(db.Float, nullable=False)
@@ -136,6 +297,20 @@ class PlayerGameStats(db.Model):
 
 with app.app_context():
     db.create_all()
+    migrate.upgrade(db.engine)
+
+    if db.session.get(DataVersion, 1) is None:
+        db.session.add(DataVersion(id=1, version=0, updated_at=time.time()))
+        db.session.commit()
+
+    # The 1st Season is made here rather than by the home page, which only reads
+    if Season.query.first() is None:
+        db.session.add(Season(games_played=0, player_count=0))
+        db.session.commit()
+
+metrics = RequestMetrics(app)
+page_cache = PageCache(app)
+recompute_worker = RecomputeWorker(app)
 
 
 def admin_only(f):
@@ -150,11 +325,143 @@ def admin_only(f):
     return decorated_function
 
 
+def recompute_season(season_id, game_ids=None):
+    # Flush pending ORM changes so the replay sees them; game_ids limits it to those games and their players
+    db.session.flush()
+
+    stats = [StatRow(*row) for row in db.session.execute(
+        db.select(PlayerGameStats.id, PlayerGameStats.game_id, PlayerGameStats.player_id, PlayerGameStats.win,
+                  PlayerGameStats.KPR, PlayerGameStats.ADR, PlayerGameStats.JLTV, PlayerGameStats.MLTV)
+        .filter_by(season_id=season_id))]
+
+    roster = [RosterRow(*row) for row in db.session.execute(
+        db.select(SeasonPlayer.id, SeasonPlayer.player_id, SeasonPlayer.played, SeasonPlayer.KPR,
+                  SeasonPlayer.A_ADR, SeasonPlayer.winrate, SeasonPlayer.individual, SeasonPlayer.inconsistency,
+                  SeasonPlayer.team_balance, SeasonPlayer.MLTV, SeasonPlayer.JLTV, SeasonPlayer.sum_jltv,
+                  SeasonPlayer.sum_mltv, SeasonPlayer.jltv_mean, SeasonPlayer.jltv_m2)
+        .filter_by(season_id=season_id))]
+
+    stat_updates, roster_updates = replay_season(stats, roster, game_ids)
+
+    # Write back only the rows that changed, one executemany per table
+    if stat_updates:
+        db.session.execute(update(PlayerGameStats), stat_updates)
+
+        # The map totals carry each game's JLTV too; move them by what the replay changed
+        map_names = dict(db.session.execute(
+            db.select(Game.game_id, Game.map_name).filter_by(season_id=season_id)).all())
+        by_id = {stat.id: stat for stat in stats}
+        map_stats.apply_jltv(db.session.connection().connection.driver_connection, season_id,
+                             [(by_id[row['id']].player_id, map_names[by_id[row['id']].game_id],
+                               by_id[row['id']].JLTV, row['JLTV']) for row in stat_updates])
+
+    if roster_updates:
+        db.session.execute(update(SeasonPlayer), roster_updates)
+
+    history.update_season(db.session.connection().connection.driver_connection, season_id)
+
+    # Objects already loaded in this session still hold the pre-replay values
+    for model, rows in ((PlayerGameStats, stat_updates), (SeasonPlayer, roster_updates)):
+        for row in rows:
+            loaded = db.session.identity_map.get(identity_key(model, row['id']))
+
+            if loaded is not None:
+                for field, value in row.items():
+                    set_committed_value(loaded, field, value)
+
+
+def bump_data_version():
+    # Invalidates every cached page once the surrounding transaction commits
+    db.session.execute(update(DataVersion).where(DataVersion.id == 1).values(version=DataVersion.version + 1,
+                                                                             updated_at=time.time()))
+
+
+def data_version():
+    return db.session.execute(db.select(DataVersion.version).where(DataVersion.id == 1)).scalar()
+
+
+def page_cache_key(page):
+    # Logged-in visitors get a different navigation bar, and the admin's has the import link as well
+    if not current_user.is_authenticated:
+        return f'{page}:guest'
+
+    return f'{page}:{"admin" if current_user.id == 1 else "user"}'
+
+
+def cache_page(key, version, page):
+    # While a replay is queued or running the ratings are half updated; a page rendered now isn't kept
+    if not recompute_worker.pending():
+        page_cache.set(key, version, page)
+
+
+def season_roster(season_id, player_ids=None):
+    # SeasonPlayer rows keyed by player_id, loaded with one query instead of one lookup per player
+    query = SeasonPlayer.query.filter_by(season_id=season_id)
+
+    if player_ids is not None:
+        query = query.filter(SeasonPlayer.player_id.in_(set(player_ids)))
+
+    return {player.player_id: player for player in query.all()}
+
+
+def lifetime_players(player_ids):
+    return {player.player_id: player for player in Player.query.filter(Player.player_id.in_(set(player_ids))).all()}
+
+
+def lifetime_seasons(player_ids, season_id, roster=None):
+    """Each player's seasons, oldest first, leaving out ``season_id`` or using its ``roster`` rows in its place.
+
+    Closed seasons come from their frozen archives; the current season is read live.
+    """
+    db.session.flush()
+    seasons = archives.summaries(db.session.connection().connection.driver_connection, player_ids, season_id)
+
+    latest = db.session.query(db.func.max(Season.season_id)).scalar()
+    live = [season_roster(latest, player_ids)] if latest != season_id else []
+    if roster is not None:
+        live.append(roster)
+
+    for rows in live:
+        for player_id, season_player in rows.items():
+            if player_id in seasons:
+                seasons[player_id].append(season_player)
+
+    for rows in seasons.values():
+        rows.sort(key=lambda row: row.season_id)
+
+    return seasons
+
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
 
+@app.route('/_metrics')
+@login_required
+@admin_only
+def metrics_endpoint():
+    if not metrics.enabled:
+        return abort(404)
+
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+@app.route('/maintenance')
+@login_required
+@admin_only
+def run_maintenance():
+    # Every repair over the whole history in one transaction; reports rows touched and time taken
+    results = maintenance.run(db.session.connection(), list(maintenance.OPERATIONS))
+
+    if any(result.rows for result in results):
+        bump_data_version()
+
+    db.session.commit()
+
+    return maintenance.report(results), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
+
 @app.route('/login', methods=["GET", "POST"])
 def login():
     form = LoginForm()
@@ -192,273 +499,485 @@ def logout():
     return redirect(url_for('home'))
 
 
-@app.route('/adjust-jltv')
-@login_required
-def adjust_jltv():
-    season_id = Season.query.order_by(Season.season_id.desc()).first().season_id
+def refresh_lifetime(overall_player, seasons):
+    # Lifetime averages and rating state from the player's season rows, once the counters are up to date
+    if overall_player.played <= 0 or not seasons:
+        overall_player.played = 0
+        overall_player.total_wins = 0
+        overall_player.total_kills = 0
+        overall_player.total_rounds = 0
+        overall_player.AK = 0
+        overall_player.KPR = 0
+        overall_player.A_ADR = 0
+        overall_player.winrate = 0
+        overall_player.individual = 0
+        overall_player.MLTV = 0
+        overall_player.team_balance = 0
+        overall_player.inconsistency = 0
+        overall_player.JLTV = 0
+        overall_player.sum_mltv = 0
+        overall_player.jltv_state = aggregates.EMPTY
 
-    first_game_of_szn = PlayerGameStats.query.filter_by(
-        season_id=season_id).order_by(
-        PlayerGameStats.game_id).first().game_id
+        return
 
-    latest_game = PlayerGameStats.query.order_by(PlayerGameStats.game_id.desc()).first().game_id
+    overall_adr = 0
+    overall_mltv = 0
+    sum_mltv = 0
+    jltv_state = aggregates.EMPTY
+    for players_season in seasons:
+        overall_adr += players_season.A_ADR
+        overall_mltv += players_season.MLTV
+        sum_mltv += players_season.sum_mltv
+        jltv_state = aggregates.merge(jltv_state, players_season.jltv_state)
 
-    for x in range(first_game_of_szn, latest_game + 1):
-        player_games = PlayerGameStats.query.filter_by(game_id=x).all()
-        current_season = Season.query.order_by(Season.season_id.desc()).first()
-        season_id = current_season.season_id
+    played_seasons = len(seasons)
 
-        team_1 = 0
-        team_2 = 0
+    overall_player.AK = round(overall_player.total_kills / overall_player.played, 2)
+    overall_player.KPR = round(overall_player.total_kills / overall_player.total_rounds, 3)
+    overall_player.A_ADR = round(overall_adr / played_seasons, 0)
+    overall_player.winrate = round((overall_player.total_wins / overall_player.played) * 100, 0)
+    overall_player.individual = ratings.individual(overall_player.KPR, overall_player.A_ADR)
+    overall_player.MLTV = round(overall_mltv / played_seasons, 1)
 
-        for player_game in player_games:
-            if player_game.win == 1:
-                team_1 += SeasonPlayer.query.filter_by(
-                    season_id=season_id).filter_by(
-                    player_id=player_game.player_id).first().individual
+    if overall_player.MLTV:
+        overall_player.team_balance = ratings.team_balance(overall_player.KPR, overall_player.winrate,
+                                                           overall_player.A_ADR, overall_player.MLTV)
 
-            else:
-                team_2 += SeasonPlayer.query.filter_by(
-                    season_id=season_id).filter_by(
-                    player_id=player_game.player_id).first().individual
+    # Lifetime state is the merge of every season's state, no game rows needed
+    overall_player.sum_mltv = sum_mltv
+    overall_player.jltv_state = jltv_state
 
-        team_1_avg = round(team_1 / 5, 1)
-        team_2_avg = round(team_2 / 5, 1)
+    if overall_player.jltv_count >= 2:
+        overall_player.inconsistency = round(aggregates.stdev(jltv_state), 1)
 
-        for player_game in player_games:
-            game = Game.query.filter_by(game_id=player_game.game_id).first()
-            rounds = game.rounds
+    overall_player.JLTV = ratings.overall_jltv(overall_player.MLTV, sum_mltv)
 
-            player = SeasonPlayer.query.filter_by(
-                season_id=season_id).filter_by(
-                player_id=player_game.player_id).first()
 
-            kpr = player_game.KPR
-            adr = player_game.ADR
+def roll_up_season(season):
+    # Add a completed season to the lifetime stats of everyone who played in it
+    roster = season_roster(season.season_id)
 
-            if player_game.win == 1:
-                jltv = round((((((kpr * 27) ** 0.8) *
-                                ((player.winrate + 7) ** 0.1877) *
-                                ((adr / 20) ** 0.1)) ** 0.8) * 1.39) * (team_2_avg / team_1_avg), 1)
+    player_ids = list(roster)
+    overall_players = lifetime_players(player_ids)
+    seasons = lifetime_seasons(player_ids, season.season_id, roster)
 
-            else:
-                jltv = round((((((kpr * 27) ** 0.8) *
-                                ((player.winrate + 7) ** 0.1877) *
-                                ((adr / 20) ** 0.1)) ** 0.8) * 1.39) * (team_1_avg / team_2_avg), 1)
+    for season_player in roster.values():
+        if season_player.played > 0:
+            overall_player = overall_players[season_player.player_id]
 
-            player_game.JLTV = jltv
+            overall_player.played += season_player.played
+            overall_player.total_wins += season_player.total_wins
+            overall_player.total_kills += season_player.total_kills
+            overall_player.total_rounds += season_player.total_rounds
 
-            all_player_games = PlayerGameStats.query.filter_by(
-                season_id=season_id).filter_by(
-                player_id=player_game.player_id).all()
+            refresh_lifetime(overall_player, seasons[season_player.player_id])
 
-            sum_jltv = 0
-            sum_mltv = 0
-            jltv_list = []
+    season.rolled_up = True
 
-            # Sum stats for all player's games
-            for a_player_game in all_player_games:
-                sum_jltv += a_player_game.JLTV
-                sum_mltv += a_player_game.MLTV
-                jltv_list.append(a_player_game.JLTV)
 
-            if player.played >= 2:
-                player.inconsistency = round(statistics.stdev(jltv_list), 1)
+def take_back_season(season, roster):
+    # Exact inverse of roll_up_season, using the season rows as they were when it was rolled up
+    player_ids = [player_id for player_id, season_player in roster.items() if season_player.played > 0]
+    overall_players = lifetime_players(player_ids)
+    seasons = lifetime_seasons(player_ids, season.season_id)
 
-            player.MLTV = round(sum_jltv / len(all_player_games), 1)
+    for player_id in player_ids:
+        season_player = roster[player_id]
+        overall_player = overall_players[player_id]
 
-            player.team_balance = round((((((((player.KPR * 27) ** 0.8) * ((player.winrate + 7) ** 0.1877) *
-                                             ((player.A_ADR / 20) ** 0.1)) ** 0.8) * 1.379)
-                                          - player.MLTV) / player.MLTV) * 100, 0)
+        overall_player.played -= season_player.played
+        overall_player.total_wins -= season_player.total_wins
+        overall_player.total_kills -= season_player.total_kills
+        overall_player.total_rounds -= season_player.total_rounds
 
-            player.JLTV = round(9.4 + (player.MLTV / 2) + sum_mltv, 2)
+        refresh_lifetime(overall_player, seasons[player_id])
 
-    current_season = Season.query.order_by(Season.season_id.desc()).first()
-    # Calculate overall player stats for all seasons when season has been completed
-    if current_season.games_played == 30:
-        season_players = SeasonPlayer.query.filter_by(season_id=current_season.season_id).all()
+    season.rolled_up = False
 
-        for season_player in season_players:
-            if season_player.played > 0:
-                overall_player = Player.query.filter_by(player_id=season_player.player_id).first()
 
-                overall_player.played += season_player.played
-                overall_player.total_wins += season_player.total_wins
-                overall_player.total_kills += season_player.total_kills
-                overall_player.total_rounds += season_player.total_rounds
+def refreeze_season(season_id):
+    # A closed season's archive follows its rows; the current season has none yet
+    db.session.flush()
+    archives.freeze(db.session.connection().connection.driver_connection, season_id)
+
+
+def settle_season(season_id, progress=lambda message: None):
+    # Replay the season's games and roll it up once complete; the caller commits
+    progress('Replaying season')
+    recompute_season(season_id)
+    refreeze_season(season_id)
 
-                all_players_season = SeasonPlayer.query.filter_by(player_id=season_player.player_id).all()
+    current_season = db.session.get(Season, season_id)
+    # Calculate overall player stats for all seasons when season has been completed
+    if current_season.games_played == 30 and not current_season.rolled_up:
+        progress('Rolling up lifetime stats')
+        roll_up_season(current_season)
 
-                overall_adr = 0
-                overall_mltv = 0
-                for players_season in all_players_season:
-                    overall_adr += players_season.A_ADR
-                    overall_mltv += players_season.MLTV
 
-                played_seasons = len(SeasonPlayer.query.filter_by(player_id=season_player.player_id).all())
+@recompute_worker.task
+def adjust_season(season_id, progress):
+    # Runs on the background worker, see the adjust_jltv route
+    settle_season(season_id, progress)
 
-                overall_player.AK = round(overall_player.total_kills / overall_player.played, 2)
-                overall_player.KPR = round(overall_player.total_kills / overall_player.total_rounds, 3)
-                overall_player.A_ADR = round(overall_adr / played_seasons, 0)
-                overall_player.winrate = round((overall_player.total_wins / overall_player.played) * 100, 0)
+    bump_data_version()
+    db.session.commit()
 
-                overall_player.individual = round(((((overall_player.KPR * 27) ** 0.8) * ((50 + 7) ** 0.1877) *
-                                                    (overall_player.A_ADR / 20) ** 0.1) ** 0.8) * 1.379, 1)
 
-                overall_player.MLTV = round(overall_mltv / played_seasons, 1)
+@app.route('/adjust-jltv')
+@login_required
+def adjust_jltv():
+    season_id = Season.query.order_by(Season.season_id.desc()).first().season_id
 
-                overall_player.team_balance = round((((((((overall_player.KPR * 27) ** 0.8) *
-                                                         ((overall_player.winrate + 7) ** 0.1877) *
-                                                         ((overall_player.A_ADR / 20) ** 0.1)) ** 0.8) * 1.379)
-                                                      - overall_player.MLTV) / overall_player.MLTV) * 100, 0)
+    # The replay runs in the background; back-to-back requests share one job
+    job_id = recompute_worker.enqueue(season_id)
 
-                player_stats = PlayerGameStats.query.filter_by(player_id=season_player.player_id).all()
+    return redirect(url_for('job_status', job_id=job_id))
 
-                sum_mltv = 0
-                jltv_list = []
-                for player_stat in player_stats:
-                    sum_mltv += player_stat.MLTV
-                    jltv_list.append(player_stat.JLTV)
 
-                if len(player_stats) >= 2:
-                    overall_player.inconsistency = round(statistics.stdev(jltv_list), 1)
+@app.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    job = recompute_worker.job(job_id)
 
-                overall_player.JLTV = round(9.4 + (overall_player.MLTV / 2) + sum_mltv, 2)
+    if job is None:
+        return abort(404)
 
-    db.session.commit()
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(job)
 
-    return redirect(url_for('home'))
+    return render_template('job.html', job=job)
 
 
 @app.route('/')
+@sqlite_mode.read_only
 def home():
+    version = data_version()
+    cached = page_cache.get(page_cache_key('home'), version)
+
+    if cached is not None:
+        return cached
+
     current_season = Season.query.order_by(Season.season_id.desc()).first()
 
-    if current_season is None:
-        new_season = Season(
-            games_played=0,
-            player_count=0
-        )
+    players = SeasonPlayer.query.filter_by(season_id=current_season.season_id).order_by(SeasonPlayer.JLTV.desc()).all()
 
-        db.session.add(new_season)
-        db.session.commit()
+    tiered = leaderboard.tiers(players)
 
-        current_season = Season.query.order_by(Season.season_id.desc()).first()
+    page = render_template('index.html', current_season=current_season, s_tier=tiered['s'], a_tier=tiered['a'],
+                           b_tier=tiered['b'], c_tier=tiered['c'], unranked=tiered['unranked'])
+    cache_page(page_cache_key('home'), version, page)
 
-    players = SeasonPlayer.query.filter_by(season_id=current_season.season_id).order_by(SeasonPlayer.JLTV.desc()).all()
+    return page
 
-    all_players = []
 
-    s_tier_players = []
-    a_tier_players = []
-    b_tier_players = []
-    c_tier_players = []
-    unranked = []
+@app.route('/lifetime-rankings')
+@sqlite_mode.read_only
+def lifetime_rankings():
+    version = data_version()
+    cached = page_cache.get(page_cache_key('lifetime'), version)
 
-    for player in players:
-        if player.played > 0:
-            if player.played < 7:
-                unranked.append(player)
+    if cached is not None:
+        return cached
 
-            else:
-                all_players.append(player)
+    players = Player.query.order_by(Player.JLTV.desc()).all()
+    no_of_games = len(Game.query.all())
 
-    for player in all_players:
-        if player.JLTV >= 25.0:
-            s_tier_players.append(player)
+    tiered = leaderboard.tiers(players)
 
-        elif player.JLTV >= 20.0:
-            a_tier_players.append(player)
+    page = render_template('lifetime-ranks.html', games=no_of_games, s_tier=tiered['s'], a_tier=tiered['a'],
+                           b_tier=tiered['b'], c_tier=tiered['c'], unranked=tiered['unranked'])
+    cache_page(page_cache_key('lifetime'), version, page)
 
-        elif player.JLTV >= 15.0:
-            b_tier_players.append(player)
+    return page
 
-        else:
-            c_tier_players.append(player)
 
-    return render_template('index.html', current_season=current_season, s_tier=s_tier_players, a_tier=a_tier_players,
-                           b_tier=b_tier_players, c_tier=c_tier_players, unranked=unranked)
+# Joins the winners' names in SQL; a control character can't appear in a player name
+WINNER_SEPARATOR = '\x1f'
 
 
-@app.route('/lifetime-rankings')
-def lifetime_rankings():
-    players = Player.query.order_by(Player.JLTV.desc()).all()
-    no_of_games = len(Game.query.all())
+@app.route('/games')
+@sqlite_mode.read_only
+def games():
+    # One season per page, newest first; ?season=<id> walks back through the history
+    season_id = request.args.get('season', type=int)
+    if season_id is None:
+        season_id = db.session.query(db.func.max(Season.season_id)).scalar()
+
+    # Stats rows in entry order so each game's winners are listed as they were entered
+    stats = (db.select(PlayerGameStats.id, PlayerGameStats.game_id, PlayerGameStats.win, PlayerGameStats.JLTV,
+                       Player.name)
+             .join(Player, Player.player_id == PlayerGameStats.player_id)
+             .where(PlayerGameStats.season_id == season_id)
+             .order_by(PlayerGameStats.id)
+             .subquery())
+
+    season_games = db.session.execute(
+        db.select(Game.game_id, Game.map_name, Game.rounds, db.func.sum(stats.c.JLTV),
+                  db.func.group_concat(db.case((stats.c.win == 1, stats.c.name)), WINNER_SEPARATOR))
+        .join(stats, stats.c.game_id == Game.game_id)
+        .where(Game.season_id == season_id)
+        .group_by(Game.game_id)
+        .order_by(Game.game_id.desc())
+    ).all()
 
-    all_players = []
+    all_info = {}
+    if season_id is not None:
+        all_info[season_id] = [[game_id, map_name, rounds, round(sum_jltv / 10, 1),
+                                winners.split(WINNER_SEPARATOR) if winners else []]
+                               for game_id, map_name, rounds, sum_jltv, winners in season_games]
 
-    s_tier_players = []
-    a_tier_players = []
-    b_tier_players = []
-    c_tier_players = []
-    unranked = []
+    older_season = db.session.query(db.func.max(Season.season_id)).filter(Season.season_id < season_id).scalar()
+    newer_season = db.session.query(db.func.min(Season.season_id)).filter(Season.season_id > season_id).scalar()
+    last_game_id = db.session.query(db.func.max(Game.game_id)).scalar()
 
-    for player in players:
-        if player.played > 0:
-            if player.played < 7:
-                unranked.append(player)
+    return render_template('games.html', all_games=all_info, latest_game=last_game_id,
+                           older_season=older_season, newer_season=newer_season)
 
-            else:
-                all_players.append(player)
 
-    for player in all_players:
-        if player.JLTV >= 25.0:
-            s_tier_players.append(player)
+def api_validators():
+    # One indexed lookup each; nothing here reads the ratings tables
+    version, updated_at, latest_game = db.session.execute(
+        db.select(DataVersion.version, DataVersion.updated_at,
+                  db.select(db.func.max(Game.game_id)).scalar_subquery())
+        .where(DataVersion.id == 1)).one()
 
-        elif player.JLTV >= 20.0:
-            a_tier_players.append(player)
+    return f'{latest_game or 0}-{version}', datetime.fromtimestamp(int(updated_at), timezone.utc)
 
-        elif player.JLTV >= 15.0:
-            b_tier_players.append(player)
 
-        else:
-            c_tier_players.append(player)
+def api_response(build):
+    """JSON from ``build()``, or 304 Not Modified if the client's ETag or Last-Modified is still current."""
+    etag, last_modified = api_validators()
 
-    return render_template('lifetime-ranks.html', games=no_of_games, s_tier=s_tier_players, a_tier=a_tier_players,
-                           b_tier=b_tier_players, c_tier=c_tier_players, unranked=unranked)
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
 
+    else:
+        not_modified = request.if_modified_since is not None and last_modified <= request.if_modified_since
 
-@app.route('/games')
-def games():
-    all_seasons = Season.query.order_by(Season.season_id.desc()).all()
+    if not_modified:
+        response = app.response_class(status=304)
+
+    else:
+        response = jsonify(build())
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+
+    return response
+
+
+@app.route('/api/season')
+@sqlite_mode.read_only
+def api_season():
+    def build():
+        season_id = request.args.get('season', type=int)
+        if season_id is None:
+            season_id = db.session.query(db.func.max(Season.season_id)).scalar()
+
+        season = db.session.get(Season, season_id) if season_id is not None else None
+        if season is None:
+            return abort(404)
+
+        players = SeasonPlayer.query.filter_by(season_id=season_id).order_by(SeasonPlayer.JLTV.desc()).all()
+
+        return {'season_id': season.season_id, 'games_played': season.games_played,
+                'player_count': season.player_count, 'tiers': leaderboard.tiers_json(players)}
+
+    return api_response(build)
+
+
+@app.route('/api/lifetime')
+@sqlite_mode.read_only
+def api_lifetime():
+    def build():
+        players = Player.query.order_by(Player.JLTV.desc()).all()
+
+        return {'games': db.session.query(db.func.count(Game.game_id)).scalar(),
+                'tiers': leaderboard.tiers_json(players)}
+
+    return api_response(build)
+
+
+@app.route('/api/players/<int:player_id>')
+@sqlite_mode.read_only
+def api_player(player_id):
+    def build():
+        player = db.session.get(Player, player_id)
+        if player is None:
+            return abort(404)
+
+        seasons = SeasonPlayer.query.filter_by(player_id=player_id).order_by(SeasonPlayer.season_id).all()
+
+        return dict(leaderboard.player_json(player),
+                    seasons=[dict(leaderboard.player_json(season), season_id=season.season_id)
+                             for season in seasons])
+
+    return api_response(build)
 
-    all_info = {}
-    for season in all_seasons:
-        # Create a list assigned to each season
-        all_info[season.season_id] = []
 
-        # Access season's games
-        season_games = Game.query.filter_by(season_id=season.season_id).order_by(Game.game_id.desc()).all()
+@app.route('/api/games')
+@sqlite_mode.read_only
+def api_games():
+    def build():
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        recent = Game.query.order_by(Game.game_id.desc()).limit(limit).all()
 
-        # Loop through all games
-        for game in season_games:
-            # Get all 10 Player Stats from current game
-            game_player_stats = game.player_stats
+        lines = {game.game_id: [] for game in recent}
+        for stat, name in db.session.execute(
+                db.select(PlayerGameStats, Player.name)
+                .join(Player, Player.player_id == PlayerGameStats.player_id)
+                .where(PlayerGameStats.game_id.in_(lines))
+                .order_by(PlayerGameStats.id)):
+            lines[stat.game_id].append(dict({field: getattr(stat, field) for field in leaderboard.STAT_FIELDS},
+                                            name=name))
 
-            sum_jltv = 0
-            winners = []
-            # Sum all JLTV from 10 player stats of current game
-            for game_player_stat in game_player_stats:
-                sum_jltv += game_player_stat.JLTV
+        return [{'game_id': game.game_id, 'season_id': game.season_id, 'map_name': game.map_name,
+                 'rounds': game.rounds, 'players': lines[game.game_id]} for game in recent]
 
-                if game_player_stat.win == 1:
-                    winners.append(game_player_stat.player.name)
+    return api_response(build)
 
-            # Calculate average jltv of current game
-            average_jltv = round(sum_jltv / 10, 1)
 
-            # Append game info to respective season
-            all_info[season.season_id].append([game.game_id, game.map_name, game.rounds, average_jltv, winners])
+# Rows in each list on the performance page, and the games a duo needs before it is ranked
+PERFORMANCE_ROWS = 5
+DUO_MIN_GAMES = 5
 
-    last_game_id = Game.query.order_by(Game.game_id.desc()).first().game_id
+# Games on a map before a player is ranked on it, on the maps page and as a best/worst map
+MAP_MIN_GAMES = 3
 
-    return render_template('games.html', all_games=all_info, latest_game=last_game_id)
+
+def pair_rows(partners, names, games, count):
+    # The partners with the highest ``count``, out of the games counted in the ``games`` field
+    ranked = sorted((partner for partner in partners if count(partner) > 0),
+                    key=lambda partner: (-count(partner), getattr(partner, games), names.get(partner.player_id, '')))
+
+    return [{'name': names.get(partner.player_id, '?'), 'games': getattr(partner, games), 'count': count(partner),
+             'rate': round(count(partner) / getattr(partner, games) * 100)} for partner in ranked[:PERFORMANCE_ROWS]]
 
 
 @app.route('/performance')
+@sqlite_mode.read_only
 def performance():
+    # Who each player wins and loses with and against, read from the player_pairs counts
+    player_id = request.args.get('player', type=int)
+
+    version = data_version()
+    cached = page_cache.get(page_cache_key(f'performance:{player_id}'), version)
+
+    if cached is not None:
+        return cached
+
+    names = dict(db.session.execute(db.select(Player.player_id, Player.name).order_by(Player.name)).all())
+    connection = db.session.connection().connection.driver_connection
+
+    lists = None
+    player_maps = []
+    trend = []
+    if player_id in names:
+        # Best map first, by average JLTV
+        player_maps = sorted((map_stats.summary(totals) for totals in map_stats.profile(connection, player_id)),
+                             key=lambda row: (-row['JLTV'], row['map_name']))
+
+        # JLTV after each of the player's games this season
+        season_id = db.session.query(db.func.max(Season.season_id)).scalar()
+        trend = [point.JLTV for point in history.season_history(connection, player_id, season_id)]
+
+        partners = pairs.partners(connection, player_id)
+
+        lists = {
+            'Wins with': pair_rows(partners, names, 'together', lambda partner: partner.wins_together),
+            'Loses with': pair_rows(partners, names, 'together',
+                                    lambda partner: partner.together - partner.wins_together),
+            'Beats': pair_rows(partners, names, 'against', lambda partner: partner.wins_against),
+            'Loses to': pair_rows(partners, names, 'against', lambda partner: partner.against - partner.wins_against),
+        }
+
+    duos = [{'names': f'{names.get(first, "?")} & {names.get(second, "?")}', 'games': games,
+             'wins': wins, 'rate': round(wins / games * 100)}
+            for first, second, games, wins in pairs.top_duos(connection, DUO_MIN_GAMES, 10)]
+
+    ranked_maps = [row for row in player_maps if row['games'] >= MAP_MIN_GAMES]
+
+    page = render_template('performance.html', players=names, player_id=player_id, lists=lists, duos=duos,
+                           duo_min_games=DUO_MIN_GAMES, maps=player_maps, map_min_games=MAP_MIN_GAMES,
+                           trend=trend, sparkline=history.sparkline(trend),
+                           best_map=ranked_maps[0] if ranked_maps else None,
+                           worst_map=ranked_maps[-1] if len(ranked_maps) > 1 else None)
+    cache_page(page_cache_key(f'performance:{player_id}'), version, page)
+
+    return page
+
+
+@app.route('/maps')
+@sqlite_mode.read_only
+def maps():
+    # Everyone who has played a map, over every season or one, read from the player_maps totals
+    map_name = request.args.get('map')
+    season_id = request.args.get('season', type=int)
+
+    version = data_version()
+    cached = page_cache.get(page_cache_key(f'maps:{map_name}:{season_id}'), version)
+
+    if cached is not None:
+        return cached
+
+    names = dict(db.session.execute(db.select(Player.player_id, Player.name)).all())
+    map_names = db.session.execute(
+        db.select(PlayerMap.map_name).distinct().order_by(PlayerMap.map_name)).scalars().all()
+    season_ids = db.session.execute(db.select(Season.season_id).order_by(Season.season_id.desc())).scalars().all()
+
+    rows = []
+    if map_name in map_names:
+        connection = db.session.connection().connection.driver_connection
+        rows = [dict(map_stats.summary(totals), name=names.get(player_id, '?'))
+                for player_id, totals in map_stats.leaderboard(connection, map_name, season_id)]
+
+    ranked = sorted((row for row in rows if row['games'] >= MAP_MIN_GAMES), key=lambda row: (-row['JLTV'], row['name']))
+    unranked = sorted((row for row in rows if row['games'] < MAP_MIN_GAMES), key=lambda row: row['name'])
 
-    return render_template('performance.html')
+    page = render_template('maps.html', map_names=map_names, map_name=map_name, season_ids=season_ids,
+                           season_id=season_id, ranked=ranked, unranked=unranked, map_min_games=MAP_MIN_GAMES)
+    cache_page(page_cache_key(f'maps:{map_name}:{season_id}'), version, page)
+
+    return page
+
+
+@app.route('/api/players/<int:player_id>/maps')
+@sqlite_mode.read_only
+def api_player_maps(player_id):
+    def build():
+        if db.session.get(Player, player_id) is None:
+            return abort(404)
+
+        season_id = request.args.get('season', type=int)
+        connection = db.session.connection().connection.driver_connection
+
+        return [map_stats.summary(totals) for totals in map_stats.profile(connection, player_id, season_id)]
+
+    return api_response(build)
+
+
+@app.route('/api/players/<int:player_id>/history')
+@sqlite_mode.read_only
+def api_player_history(player_id):
+    # Sparkline data: the player's season ratings after each of their games, one stored row per season
+    def build():
+        if db.session.get(Player, player_id) is None:
+            return abort(404)
+
+        season_id = request.args.get('season', type=int)
+        connection = db.session.connection().connection.driver_connection
+
+        if season_id is not None:
+            seasons = {season_id: history.season_history(connection, player_id, season_id)}
+
+        else:
+            seasons = history.player_history(connection, player_id)
+
+        return [{'season_id': season, 'points': [point._asdict() for point in points]}
+                for season, points in seasons.items()]
+
+    return api_response(build)
 
 
 @app.route('/delete-game/<int:game_id>')
@@ -468,265 +987,305 @@ def delete_game(game_id):
     # Get player IDs from game to be deleted
     players_game = PlayerGameStats.query.filter_by(game_id=game_id).all()
 
-    # Remove stats from these games from Player and SeasonPlayer table
+    game = Game.query.filter_by(game_id=game_id).first()
+    current_season = db.session.get(Season, game.season_id)
+
+    # A finished season stays as it was rolled up; only the latest season's games can go
+    if current_season.season_id != db.session.query(db.func.max(Season.season_id)).scalar():
+        flash(f'Error: Season {current_season.season_id} is finished, its games can no longer be deleted!', 'error')
+        return redirect(url_for('games', season=current_season.season_id))
+
+    # The games that share a player with this one are the only ones whose JLTV can change
+    affected_games = set(db.session.execute(
+        db.select(PlayerGameStats.game_id).distinct()
+        .where(PlayerGameStats.season_id == current_season.season_id,
+               PlayerGameStats.player_id.in_([player_stat.player_id for player_stat in players_game]),
+               PlayerGameStats.game_id != game_id)).scalars())
+
+    # Every SeasonPlayer of the game's season, keyed by player_id
+    roster = season_roster(current_season.season_id)
+
+    # A 30-game season is part of the lifetime stats; take it back out, the next game added rolls it up again
+    if current_season.rolled_up:
+        take_back_season(current_season, roster)
+
+    # Reverse this game's recorded contribution to each player's season row
     for player_stat in players_game:
-        overall_player = Player.query.filter_by(player_id=player_stat.player_id).first()
+        season_player = roster[player_stat.player_id]
 
-        season_player = SeasonPlayer.query.filter_by(
-            season_id=player_stat.season_id).filter_by(
-            player_id=player_stat.player_id
-        ).first()
+        _, season_player.jltv_mean, season_player.jltv_m2 = aggregates.pop(season_player.jltv_state, player_stat.JLTV)
+        season_player.sum_adr -= player_stat.ADR
+        season_player.sum_jltv -= player_stat.JLTV
+        season_player.sum_mltv -= player_stat.MLTV
 
-        overall_player.played -= 1
         season_player.played -= 1
 
         if player_stat.win == 1:
-            overall_player.total_wins -= 1
             season_player.total_wins -= 1
 
-        overall_player.total_kills -= player_stat.kills
         season_player.total_kills -= player_stat.kills
+        season_player.total_rounds -= game.rounds
 
-        overall_player.total_rounds -= player_stat.game.rounds
-        season_player.total_rounds -= player_stat.game.rounds
+    connection = db.session.connection().connection.driver_connection
+    pairs.apply(connection, [(player_stat.player_id, player_stat.win) for player_stat in players_game], sign=-1)
+    map_stats.apply(connection, current_season.season_id, game.map_name,
+                    [map_stats.MapLine(player_stat.player_id, player_stat.win, player_stat.kills, game.rounds,
+                                       player_stat.ADR, player_stat.JLTV) for player_stat in players_game], sign=-1)
 
     # Remove this games player stats from the PlayerGameStats table
     for player_stat in players_game:
         db.session.delete(player_stat)
 
     # Remove this game from the Games table
-    game = Game.query.filter_by(game_id=game_id).first()
     db.session.delete(game)
 
     # If this game is at the beginning of a season, delete this seasonplayers entries and season
-    current_season = Season.query.order_by(Season.season_id.desc()).first()
-
     if current_season.games_played == 1:
-        all_season_players = SeasonPlayer.query.filter_by(season_id=current_season.season_id).all()
-
-        for season_player in all_season_players:
+        for season_player in roster.values():
             db.session.delete(season_player)
 
         db.session.delete(current_season)
 
-    else:
-        current_season.games_played -= 1
-
-        for player_stat in players_game:
+        # Which makes the previous season the current one again
+        refreeze_season(current_season.season_id - 1)
 
-            season_player = SeasonPlayer.query.filter_by(
-                season_id=player_stat.season_id).filter_by(
-                player_id=player_stat.player_id
-            ).first()
+        bump_data_version()
+        db.session.commit()
 
-            if season_player.played > 0:
-                season_player.AK = round(season_player.total_kills / season_player.played, 2)
-                season_player.KPR = round(season_player.total_kills / season_player.total_rounds, 3)
+        # The previous season is complete and untouched, nothing to replay
+        return redirect(url_for('home'))
 
-                season_player.winrate = round((season_player.total_wins / season_player.played) * 100, 0)
+    current_season.games_played -= 1
 
-                all_player_games = PlayerGameStats.query.filter_by(
-                    season_id=player_stat.season_id).filter_by(
-                    player_id=player_stat.player_id
-                ).all()
+    for player_stat in players_game:
+        season_player = roster[player_stat.player_id]
 
-                sum_adr = 0
+        if season_player.played > 0:
+            season_player.AK = round(season_player.total_kills / season_player.played, 2)
+            season_player.KPR = round(season_player.total_kills / season_player.total_rounds, 3)
 
-                # Sum stats for all player's games
-                for player_game in all_player_games:
-                    sum_adr += player_game.ADR
+            season_player.winrate = round((season_player.total_wins / season_player.played) * 100, 0)
 
-                # Calculate average ADR for all games played in current season
-                season_player.A_ADR = round(sum_adr / len(all_player_games), 0)
+            # Calculate average ADR for all games played in current season
+            season_player.A_ADR = round(season_player.sum_adr / season_player.played, 0)
 
-                season_player.individual = round(((((season_player.KPR * 27) ** 0.8) * ((50 + 7) ** 0.1877) *
-                                                   (season_player.A_ADR / 20) ** 0.1) ** 0.8) * 1.379, 1)
+            season_player.individual = ratings.individual(season_player.KPR, season_player.A_ADR)
 
-            else:
-                season_player.total_wins = 0
-                season_player.total_kills = 0
-                season_player.total_rounds = 0
-                season_player.AK = 0
-                season_player.KPR = 0
-                season_player.A_ADR = 0
-                season_player.winrate = 0
+            # A single game has no spread, as when the season row was first filled in
+            if season_player.played < 2:
                 season_player.inconsistency = 0
-                season_player.team_balance = 0
-                season_player.JLTV = 0
-                season_player.individual = 0
-                season_player.MLTV = 0
 
-        all_season_players = SeasonPlayer.query.all()
+        else:
+            season_player.total_wins = 0
+            season_player.total_kills = 0
+            season_player.total_rounds = 0
+            season_player.AK = 0
+            season_player.KPR = 0
+            season_player.A_ADR = 0
+            season_player.winrate = 0
+            season_player.inconsistency = 0
+            season_player.team_balance = 0
+            season_player.JLTV = 0
+            season_player.individual = 0
+            season_player.MLTV = 0
+            season_player.sum_adr = 0
+            season_player.sum_jltv = 0
+            season_player.sum_mltv = 0
+            season_player.jltv_mean = 0
+            season_player.jltv_m2 = 0
+
+    current_season.player_count = sum(1 for season_player in roster.values() if season_player.played > 0)
+    # The players' new Individual and winrate move the team averages of their other games; replay just those
+    recompute_season(current_season.season_id, affected_games)
+    refreeze_season(current_season.season_id)
+
+    bump_data_version()
+    db.session.commit()
+
+    return redirect(url_for('games'))
+
+
+def start_season():
+    # Add new Season, carrying every player of the previous one over with their last Individual
+    new_season = Season(
+        games_played=0,
+        player_count=0
+    )
 
-        no_of_players = 0
-        for player in all_season_players:
-            if player.played > 0:
-                no_of_players += 1
+    db.session.add(new_season)
+    db.session.flush()
 
-        current_season = Season.query.order_by(Season.season_id.desc()).first()
-        current_season.player_count = no_of_players
+    current_season_id = new_season.season_id
+    past_season_id = int(current_season_id) - 1
 
-        season_id = current_season.season_id
+    # The previous season is closed now; freeze it for the lifetime roll-ups
+    refreeze_season(past_season_id)
+
+    season_players = SeasonPlayer.query.filter_by(season_id=past_season_id).all()
+
+    for season_player in season_players:
+        new_player = SeasonPlayer(
+            player_id=season_player.player_id,
+            name=season_player.name,
+            played=0,
+            total_wins=0,
+            total_kills=0,
+            total_rounds=0,
+            AK=0,
+            KPR=0,
+            A_ADR=0,
+            winrate=0,
+            inconsistency=0,
+            team_balance=0,
+            JLTV=0,
+            individual=season_player.individual,
+            MLTV=0,
+            season_id=current_season_id,
+        )
 
-        # Query game_id from first game of the season
-        first_game_of_szn = PlayerGameStats.query.filter_by(
-            season_id=season_id).order_by(
-            PlayerGameStats.game_id).first().game_id
+        db.session.add(new_player)
 
-        # Query game_id from the latest game of the season
-        latest_game = PlayerGameStats.query.order_by(PlayerGameStats.game_id.desc()).first().game_id
+    return new_season
 
-        # Recalculate every past game's JLTV and overall statistic: Inconsistency, Team Balance, MLTV and JLTV
-        for x in range(first_game_of_szn, latest_game + 1):
-            # Query 10 player stats for each game of the current season
-            player_games = PlayerGameStats.query.filter_by(game_id=x).filter_by(season_id=season_id).all()
 
-            team_1 = 0
-            team_2 = 0
+def ingest_game(map_name, rounds, lines):
+    """Add one game to the latest season, rolling over to a new season after 30 games.
 
-            # Recalculate Individual average
-            for player_game in player_games:
-                if player_game.win == 1:
-                    team_1 += SeasonPlayer.query.filter_by(
-                        season_id=season_id).filter_by(
-                        player_id=player_game.player_id).first().individual
+    ``lines`` are ten ``(player_id, kills, damage, win)`` tuples. Updates the season counters of the ten players
+    and stores their per-game stats; the season replay (``adjust_season``) fills in the final JLTV values.
+    Nothing is committed. Returns the game's season id.
+    """
+    # Add new Season if 30 games have already been played or there is not a 1st Season
+    current_season = Season.query.order_by(Season.season_id.desc()).first()
 
-                else:
-                    team_2 += SeasonPlayer.query.filter_by(
-                        season_id=season_id).filter_by(
-                        player_id=player_game.player_id).first().individual
+    if current_season.games_played == 30:
+        current_season = start_season()
 
-            team_1_avg = round(team_1 / 5, 1)
-            team_2_avg = round(team_2 / 5, 1)
+    # Add new Game to database
+    season_id = current_season.season_id
 
-            # Recalculate every game's jltv
-            for player_game in player_games:
-                game = Game.query.filter_by(game_id=player_game.game_id).first()
-                rounds = game.rounds
+    new_game = Game(
+        map_name=map_name,
+        rounds=rounds,
+        season_id=season_id
+    )
 
-                player = SeasonPlayer.query.filter_by(
-                    season_id=season_id).filter_by(
-                    player_id=player_game.player_id).first()
+    db.session.add(new_game)
+    db.session.flush()
 
-                kpr = player_game.KPR
-                adr = player_game.ADR
+    # Find amount of games played in current season and update value
+    current_season.games_played = db.session.query(db.func.count(Game.game_id)).filter_by(season_id=season_id).scalar()
 
-                if player_game.win == 1:
-                    jltv = round((((((kpr * 27) ** 0.8) *
-                                    ((player.winrate + 7) ** 0.1877) *
-                                    ((adr / 20) ** 0.1)) ** 0.8) * 1.39) * (team_2_avg / team_1_avg), 1)
+    all_player_stats = [[player_id, kills, round(damage / rounds, 0), win] for player_id, kills, damage, win in lines]
 
-                else:
-                    jltv = round((((((kpr * 27) ** 0.8) *
-                                    ((player.winrate + 7) ** 0.1877) *
-                                    ((adr / 20) ** 0.1)) ** 0.8) * 1.39) * (team_1_avg / team_2_avg), 1)
+    # Every SeasonPlayer of the current season, keyed by player_id
+    roster = season_roster(season_id)
 
-                player_game.JLTV = jltv
+    # Get winning and losing team average individual
+    team_1 = 0
+    team_2 = 0
 
-                seasons_games = PlayerGameStats.query.filter_by(
-                    season_id=season_id).filter_by(
-                    player_id=player_game.player_id).all()
+    # Sum up teams individual stats
+    for stat in all_player_stats:
+        if stat[3]:
+            team_1 += roster[stat[0]].individual
 
-                sum_jltv = 0
-                sum_mltv = 0
-                jltv_list = []
+        else:
+            team_2 += roster[stat[0]].individual
 
-                # Sum stats for all player's games
-                for each_player_game in seasons_games:
-                    sum_jltv += each_player_game.JLTV
-                    sum_mltv += each_player_game.MLTV
-                    jltv_list.append(each_player_game.JLTV)
+    # Teams average individual
+    team_1_avg = round(team_1 / 5, 1)
+    team_2_avg = round(team_2 / 5, 1)
 
-                # Calculate standard deviation from individual performance of every game in current season
-                if player.played >= 2:
-                    player.inconsistency = round(statistics.stdev(jltv_list), 1)
+    game_id = new_game.game_id
+    map_lines = []
 
-                player.MLTV = round(sum_jltv / len(seasons_games), 1)
+    # Calculate KPR, ADR for Individual Stat
+    for stat in all_player_stats:
+        kpr = round(stat[1] / rounds, 2)
+        adr = int(stat[2])
 
-                player.team_balance = round((((((((player.KPR * 27) ** 0.8) * ((player.winrate + 7) ** 0.1877) *
-                                                 ((player.A_ADR / 20) ** 0.1)) ** 0.8) * 1.379)
-                                              - player.MLTV) / player.MLTV) * 100, 0)
+        player = roster[stat[0]]
 
-                player.JLTV = round(9.4 + (player.MLTV / 2) + sum_mltv, 2)
+        win = 0
 
-    current_season = Season.query.order_by(Season.season_id.desc()).first()
+        # Calculate specific PlayerGame JLTV & MLTV depending on win
+        if stat[3]:
+            mltv = ratings.game_mltv(kpr, True)
+            jltv = ratings.game_jltv(kpr, player.winrate, adr, team_1_avg, team_2_avg)
 
-    if current_season.games_played == 29:
-        if current_season.season_id == 1:
-            overall_player = Player.query.all()
-            for player in overall_player:
-
-                player.played = 0
-                player.total_wins = 0
-                player.total_kills = 0
-                player.total_rounds = 0
-                player.AK = 0
-                player.KPR = 0
-                player.A_ADR = 0
-                player.winrate = 0
-                player.individual = 0
-                player.MLTV = 0
-                player.team_balance = 0
-                player.inconsistency = 0
-                player.JLTV = 0
+            win = 1
+            player.total_wins += 1
 
         else:
-            for player_stat in players_game:
-                season_player = SeasonPlayer.query.filter_by(
-                    season_id=player_stat.season_id).filter_by(
-                    player_id=player_stat.player_id
-                ).first()
+            mltv = ratings.game_mltv(kpr, False)
+            jltv = ratings.game_jltv(kpr, player.winrate, adr, team_2_avg, team_1_avg)
+
+        # Input calculated stats into PlayerGameStats table
+        new_player_stat = PlayerGameStats(
+            kills=stat[1],
+            KPR=kpr,
+            ADR=adr,
+            win=win,
+            JLTV=jltv,
+            MLTV=mltv,
+            player_id=stat[0],
+            game_id=game_id,
+            season_id=season_id
+        )
+
+        db.session.add(new_player_stat)
+        map_lines.append(map_stats.MapLine(stat[0], win, stat[1], rounds, adr, jltv))
 
-                overall_player = Player.query.filter_by(player_id=player_stat.player_id).first()
+        # Update running sums and JLTV variance state instead of rescanning the season's games
+        _, player.jltv_mean, player.jltv_m2 = aggregates.push(player.jltv_state, jltv)
+        player.sum_adr += adr
+        player.sum_jltv += jltv
+        player.sum_mltv += mltv
 
-                if overall_player.played > 0:
-                    overall_player.played -= season_player.played
-                    overall_player.total_wins -= season_player.total_wins
-                    overall_player.total_kills -= season_player.total_kills
-                    overall_player.total_rounds -= season_player.total_rounds
+        # Update overall Player stats
+        player.played += 1
+        player.total_rounds += rounds
+        player.total_kills += stat[1]
 
-                    all_players_season = SeasonPlayer.query.filter_by(player_id=player_stat.player_id).all()
+        player.KPR = round(player.total_kills / player.total_rounds, 3)
 
-                    overall_adr = 0
-                    overall_mltv = 0
-                    for players_season in all_players_season:
-                        overall_adr += players_season.A_ADR
-                        overall_mltv += players_season.MLTV
+        # Calculate average ADR for all games played in current season
+        player.A_ADR = round(player.sum_adr / player.played, 0)
+        player.winrate = round((player.total_wins / player.played) * 100, 0)
+        player.AK = round(player.total_kills / player.played, 2)
 
-                    played_seasons = len(SeasonPlayer.query.filter_by(player_id=player_stat.player_id).all())
+        # Calculate JLTV, MLTV, Individual
+        player.individual = ratings.individual(player.KPR, player.A_ADR)
 
-                    overall_player.AK = round(overall_player.total_kills / overall_player.played, 2)
-                    overall_player.KPR = round(overall_player.total_kills / overall_player.total_rounds, 3)
-                    overall_player.A_ADR = round(overall_adr / played_seasons, 0)
-                    overall_player.winrate = round((overall_player.total_wins / overall_player.played) * 100, 0)
+    no_of_players = 0
 
-                    overall_player.individual = round(
-                        ((((overall_player.KPR * 27) ** 0.8) * ((50 + 7) ** 0.1877) *
-                          (overall_player.A_ADR / 20) ** 0.1) ** 0.8) * 1.379, 1)
+    for player in roster.values():
+        if player.played > 0:
+            no_of_players += 1
 
-                    overall_player.MLTV = round(overall_mltv / played_seasons, 1)
+    current_season.player_count = no_of_players
 
-                    overall_player.team_balance = round((((((((overall_player.KPR * 27) ** 0.8) *
-                                                             ((overall_player.winrate + 7) ** 0.1877) *
-                                                             ((overall_player.A_ADR / 20) ** 0.1)) ** 0.8) * 1.379)
-                                                          - overall_player.MLTV) / overall_player.MLTV) * 100, 0)
+    connection = db.session.connection().connection.driver_connection
+    pairs.apply(connection, [(player_id, win) for player_id, _, _, win in lines])
+    map_stats.apply(connection, season_id, map_name, map_lines)
 
-                    player_stats = PlayerGameStats.query.filter_by(player_id=player_stat.player_id).all()
+    return season_id
 
-                    sum_mltv = 0
-                    jltv_list = []
-                    for players_stat in player_stats:
-                        sum_mltv += players_stat.MLTV
-                        jltv_list.append(players_stat.JLTV)
 
-                    if len(player_stats) >= 2:
-                        overall_player.inconsistency = round(statistics.stdev(jltv_list), 1)
+def backup_dir():
+    return app.config['BACKUP_DIR'] or os.path.join(app.instance_path, 'backups')
 
-                    overall_player.JLTV = round(9.4 + (overall_player.MLTV / 2) + sum_mltv, 2)
 
-    db.session.commit()
+def rollover_snapshot(season_id):
+    # A failed snapshot is logged, never a reason to turn the game away
+    try:
+        directory = backup_dir()
+        info = backups.snapshot(db.engine.url.database, directory, backups.rollover_name(directory, season_id))
+        app.logger.info('Snapshot %s taken (%d bytes)', info.name, info.bytes)
 
-    return redirect(url_for('adjust_jltv'))
+    except (OSError, sqlite3.Error, backups.InvalidSnapshot):
+        app.logger.exception('Snapshot of season %d failed', season_id)
 
 
 @app.route('/add-game', methods=['GET', 'POST'])
@@ -747,198 +1306,99 @@ def add_game():
     form.player10.choices = all_players
 
     if form.validate_on_submit():
-        # Add new Season if 30 games have already been played or there is not a 1st Season
-        current_season = Season.query.order_by(Season.season_id.desc()).first()
-
-        if current_season.games_played == 30:
-            new_season = Season(
-                games_played=0,
-                player_count=0
-            )
-
-            db.session.add(new_season)
-            db.session.commit()
-
-            current_season_id = Season.query.order_by(Season.season_id.desc()).first().season_id
-            past_season_id = int(current_season_id) - 1
-
-            season_players = SeasonPlayer.query.filter_by(season_id=past_season_id).all()
-
-            for season_player in season_players:
-                new_player = SeasonPlayer(
-                    player_id=season_player.player_id,
-                    name=season_player.name,
-                    played=0,
-                    total_wins=0,
-                    total_kills=0,
-                    total_rounds=0,
-                    AK=0,
-                    KPR=0,
-                    A_ADR=0,
-                    winrate=0,
-                    inconsistency=0,
-                    team_balance=0,
-                    JLTV=0,
-                    individual=season_player.individual,
-                    MLTV=0,
-                    season_id=current_season_id,
-                )
-
-                db.session.add(new_player)
-
-            db.session.commit()
-
-        # Add new Game to database
-        season_id = Season.query.order_by(Season.season_id.desc()).first().season_id
+        # This game starts a new season; keep the finished one first, while nothing is written yet
+        latest = Season.query.order_by(Season.season_id.desc()).first()
+        if latest.games_played == 30 and app.config['BACKUP_ON_ROLLOVER']:
+            rollover_snapshot(latest.season_id)
 
-        new_game = Game(
-            map_name=request.form.get('map_name'),
-            rounds=request.form.get('rounds'),
-            season_id=season_id
-        )
+        # Get all Player entries
+        data = request.form
 
-        db.session.add(new_game)
+        lines = [(int(data.get(f'player{i}')), int(data.get(f'kills{i}')), int(data.get(f'damage{i}')),
+                  data.get(f'win{i}') == 'y') for i in range(1, 11)]
 
-        # Find amount of games played in current season and update value
-        games_played = len(Game.query.filter_by(season_id=season_id).all())
-        current_season = Season.query.order_by(Season.season_id.desc()).first()
-        current_season.games_played = games_played
+        season_id = ingest_game(data.get('map_name'), int(data.get('rounds')), lines)
 
-        # Get all Player entries
-        data = request.form
+        # The data version moves once the replay has committed, so cached pages never show the game half rated
+        db.session.commit()
 
-        rounds_played = int(data.get('rounds'))
-
-        all_player_stats = [
-            [data.get('player1'), data.get('kills1'),
-             round(int(data.get('damage1')) / rounds_played, 0), data.get('win1')],
-            [data.get('player2'), data.get('kills2'),
-             round(int(data.get('damage2')) / rounds_played, 0), data.get('win2')],
-            [data.get('player3'), data.get('kills3'),
-             round(int(data.get('damage3')) / rounds_played, 0), data.get('win3')],
-            [data.get('player4'), data.get('kills4'),
-             round(int(data.get('damage4')) / rounds_played, 0), data.get('win4')],
-            [data.get('player5'), data.get('kills5'),
-             round(int(data.get('damage5')) / rounds_played, 0), data.get('win5')],
-            [data.get('player6'), data.get('kills6'),
-             round(int(data.get('damage6')) / rounds_played, 0), data.get('win6')],
-            [data.get('player7'), data.get('kills7'),
-             round(int(data.get('damage7')) / rounds_played, 0), data.get('win7')],
-            [data.get('player8'), data.get('kills8'),
-             round(int(data.get('damage8')) / rounds_played, 0), data.get('win8')],
-            [data.get('player9'), data.get('kills9'),
-             round(int(data.get('damage9')) / rounds_played, 0), data.get('win9')],
-            [data.get('player10'), data.get('kills10'),
-             round(int(data.get('damage10')) / rounds_played, 0), data.get('win10')],
-        ]
-
-        # Get winning and losing team average individual
-        team_1 = 0
-        team_2 = 0
-
-        # Sum up teams individual stats
-        for stat in all_player_stats:
-            if stat[3] == 'y':
-                team_1 += SeasonPlayer.query.filter_by(
-                    season_id=season_id).filter_by(
-                    player_id=int(stat[0])).first().individual
-
-            else:
-                team_2 += SeasonPlayer.query.filter_by(
-                    season_id=season_id).filter_by(
-                    player_id=int(stat[0])).first().individual
-
-        # Teams average individual
-        team_1_avg = round(team_1 / 5, 1)
-        team_2_avg = round(team_2 / 5, 1)
-
-        # Get amount of rounds from most recent game
-        game = Game.query.order_by(Game.game_id.desc()).first()
-
-        rounds = int(game.rounds)
-        game_id = game.game_id
-
-        # Calculate KPR, ADR for Individual Stat
-        for stat in all_player_stats:
-            kpr = round(int(stat[1]) / rounds, 2)
-            adr = int(stat[2])
-
-            player = SeasonPlayer.query.filter_by(season_id=season_id).filter_by(player_id=int(stat[0])).first()
-
-            win = 0
-
-            # Calculate specific PlayerGame JLTV & MLTV depending on win
-            if stat[3] == 'y':
-                mltv = kpr * 0.8 * 0.8 / (100 / 55)
-
-                jltv = round((((((kpr * 27) ** 0.8) *
-                                ((player.winrate + 7) ** 0.1877) *
-                                ((adr / 20) ** 0.1)) ** 0.8) * 1.39) * (team_2_avg / team_1_avg), 1)
-
-                win = 1
-                player.total_wins += 1
-
-            else:
-                mltv = -(29 * 0.8 * 0.8 / 140) / kpr
-
-                jltv = round((((((kpr * 27) ** 0.8) *
-                                ((player.winrate + 7) ** 0.1877) *
-                                ((adr / 20) ** 0.1)) ** 0.8) * 1.39) * (team_1_avg / team_2_avg), 1)
-
-            # Input calculated stats into PlayerGameStats table
-            new_player_stat = PlayerGameStats(
-                kills=int(stat[1]),
-                KPR=kpr,
-                ADR=adr,
-                win=win,
-                JLTV=jltv,
-                MLTV=mltv,
-                player_id=int(stat[0]),
-                game_id=game_id,
-                season_id=season_id
-            )
-
-            db.session.add(new_player_stat)
-
-            # Update overall Player stats
-            player.played += 1
-            player.total_rounds += rounds
-            player.total_kills += int(stat[1])
-
-            player.KPR = round(player.total_kills / player.total_rounds, 3)
-
-            # Get all player's games for current season
-            player_games = PlayerGameStats.query.filter_by(season_id=season_id).filter_by(player_id=int(stat[0])).all()
-
-            sum_adr = 0
-
-            # Sum stats for all player's games
-            for player_game in player_games:
-                sum_adr += player_game.ADR
+        job_id = recompute_worker.enqueue(season_id)
 
-            # Calculate average ADR for all games played in current season
-            player.A_ADR = round(sum_adr / len(player_games), 0)
-            player.winrate = round((player.total_wins / player.played) * 100, 0)
-            player.AK = round(player.total_kills / player.played, 2)
+        return redirect(url_for('job_status', job_id=job_id))
+
+    return render_template('add_game.html', form=form)
+
+
+def import_records(records):
+    """Add validated ``importer.GameRecord``s in order and replay each season they touch; the caller commits.
+
+    Each season is replayed once, when the import moves past it or at the end, since the next season starts
+    from the finished one's ratings. Returns the season ids touched; pass them to ``import_snapshot`` once
+    the import has committed.
+    """
+    seasons = []
+
+    # The import starts a new season; keep the finished one first, while nothing is written yet, as add_game does
+    latest = Season.query.order_by(Season.season_id.desc()).first()
+    if records and latest.games_played == 30 and app.config['BACKUP_ON_ROLLOVER']:
+        rollover_snapshot(latest.season_id)
+
+    for record in records:
+        latest = Season.query.order_by(Season.season_id.desc()).first()
+
+        if latest.games_played == 30 and not latest.rolled_up:
+            settle_season(latest.season_id)
+
+        season_id = ingest_game(record.map_name, record.rounds, record.lines)
 
-            # Calculate JLTV, MLTV, Individual
-            player.individual = round(((((player.KPR * 27) ** 0.8) * ((50 + 7) ** 0.1877) *
-                                        (player.A_ADR / 20) ** 0.1) ** 0.8) * 1.379, 1)
+        if season_id not in seasons:
+            seasons.append(season_id)
 
-        all_players = SeasonPlayer.query.filter_by(season_id=season_id).all()
-        no_of_players = 0
+    if seasons:
+        settle_season(seasons[-1])
+        bump_data_version()
 
-        for player in all_players:
-            if player.played > 0:
-                no_of_players += 1
+    return seasons
 
-        current_season.player_count = no_of_players
 
+def import_snapshot(seasons):
+    # Snapshots copy the database file, so seasons finished by an import are kept only after it has committed;
+    # an import is never committed part way, so one snapshot covers every season it finished
+    if len(seasons) > 1 and app.config['BACKUP_ON_ROLLOVER']:
+        rollover_snapshot(seasons[-2])
+
+
+@app.route('/import-games', methods=['GET', 'POST'])
+@login_required
+@admin_only
+def import_games():
+    form = ImportForm()
+
+    if form.validate_on_submit():
+        upload = form.games_file.data
+
+        try:
+            text = upload.read().decode('utf-8-sig')
+            records = importer.validate(importer.read(upload.filename, text),
+                                        dict(db.session.execute(db.select(Player.player_id, Player.name)).all()))
+
+        except UnicodeDecodeError:
+            return render_template('import_games.html', form=form, errors=['The file must be UTF-8 text'])
+
+        except importer.InvalidImport as e:
+            return render_template('import_games.html', form=form, errors=e.errors)
+
+        start = time.perf_counter()
+        seasons = import_records(records)
         db.session.commit()
+        import_snapshot(seasons)
 
-        return redirect(url_for('adjust_jltv'))
+        flash(f'Imported {len(records)} games into season(s) {", ".join(map(str, seasons))} '
+              f'in {time.perf_counter() - start:.2f}s', 'success')
 
-    return render_template('add_game.html', form=form)
+        return redirect(url_for('import_games'))
+
+    return render_template('import_games.html', form=form, errors=[])
 
 
 @app.route('/add-player', methods=['GET', 'POST'])
@@ -997,6 +1457,7 @@ def add_player():
         )
 
         db.session.add(new_season_player)
+        bump_data_version()
         db.session.commit()
 
         return redirect(url_for('add_game'))
@@ -1004,6 +1465,102 @@ def add_player():
     return render_template('add_player.html', form=form)
 
 
+def rated_players(player_ids, rating_source):
+    if rating_source == 'season':
+        # Current season ratings, still a single IN lookup
+        current_season_id = db.session.query(db.func.max(Season.season_id)).scalar_subquery()
+
+        return SeasonPlayer.query.filter(
+            SeasonPlayer.season_id == current_season_id).filter(
+            SeasonPlayer.player_id.in_(player_ids)).all()
+
+    return Player.query.filter(Player.player_id.in_(player_ids)).all()
+
+
+def describe_split(players, split):
+    difference, team1, team2 = split
+
+    avg1 = sum(players[i].JLTV for i in team1) / 5
+    avg2 = sum(players[i].JLTV for i in team2) / 5
+
+    return {
+        'team1': [players[i].name for i in team1],
+        'team2': [players[i].name for i in team2],
+        'difference': f"{difference:.2f}",
+        'avg_rating1': f"{avg1:.2f}",
+        'avg_rating2': f"{avg2:.2f}"
+    }
+
+
+# Fitted win models by (rating, data version); refitted the first time they're needed after a change
+win_models = {}
+
+
+def win_model(rating):
+    version = data_version()
+    model = win_models.get((rating, version))
+
+    if model is None:
+        games = kernel.load_history(db.session.connection().connection.driver_connection)
+        model = prediction.fit(games, rating)
+
+        # Models of older versions are stale
+        for key in [key for key in win_models if key[1] != version]:
+            del win_models[key]
+
+        win_models[(rating, version)] = model
+
+    return model
+
+
+@app.route('/predict')
+@sqlite_mode.read_only
+def predict():
+    # /predict?team1=1,2,3,4,5&team2=6,7,8,9,10[&rating=individual|jltv][&rating_source=season|lifetime]
+    rating = request.args.get('rating', 'individual')
+    rating_source = request.args.get('rating_source', 'season')
+
+    try:
+        teams = [[int(player_id) for player_id in request.args.get(team, '').split(',') if player_id]
+                 for team in ('team1', 'team2')]
+
+    except ValueError:
+        return jsonify(error='team1 and team2 must be comma-separated player ids'), 400
+
+    player_ids = teams[0] + teams[1]
+
+    if rating not in kernel.PREDICTORS:
+        return jsonify(error=f'rating must be one of {", ".join(sorted(kernel.PREDICTORS))}'), 400
+
+    if rating_source not in ('season', 'lifetime'):
+        return jsonify(error='rating_source must be season or lifetime'), 400
+
+    # The models are fitted on the season JLTV players had going into each game; lifetime JLTV also carries
+    # every season's MLTV, so it sits on a different scale and the fitted odds wouldn't hold for it
+    if rating == 'jltv' and rating_source == 'lifetime':
+        return jsonify(error='rating=jltv can only be scored with rating_source=season'), 400
+
+    if len(teams[0]) != 5 or len(teams[1]) != 5 or len(set(player_ids)) != 10:
+        return jsonify(error='Each team needs five different players'), 400
+
+    players = {player.player_id: player for player in rated_players(player_ids, rating_source)}
+
+    if len(players) != 10:
+        return jsonify(error='Could not find all selected players'), 404
+
+    column = 'JLTV' if rating == 'jltv' else 'individual'
+    values = [[getattr(players[player_id], column) for player_id in team] for team in teams]
+
+    model = win_model(rating)
+    chance = prediction.probability(model, *values)
+
+    return jsonify(rating=rating, rating_source=rating_source, scale=model.scale, games=model.games,
+                   team1={'players': [players[player_id].name for player_id in teams[0]],
+                          'average': round(sum(values[0]) / 5, 2), 'win_probability': round(chance, 4)},
+                   team2={'players': [players[player_id].name for player_id in teams[1]],
+                          'average': round(sum(values[1]) / 5, 2), 'win_probability': round(1 - chance, 4)})
+
+
 @app.route('/create-teams', methods=['GET', 'POST'])
 def create_teams():
     form = TeamsForm()
@@ -1030,7 +1587,7 @@ def create_teams():
             return redirect(url_for('create_teams'))  # Redirect back to form
 
         try:
-            players = Player.query.filter(Player.player_id.in_(player_ids)).all()
+            players = rated_players(player_ids, request.form.get('rating_source'))
 
             if len(players) != 10:
                 flash('Error: Could not find all selected players!', 'error')
@@ -1038,28 +1595,11 @@ def create_teams():
 
             players_sorted = sorted(players, key=lambda p: p.JLTV, reverse=True)
 
-            # Split top 4 players evenly
-            team1 = [players_sorted[0], players_sorted[3]]
-            team2 = [players_sorted[1], players_sorted[2]]
-
-            # Distribute remaining players
-            for i in range(4, len(players_sorted)):
-                if i % 2 == 0:
-                    team1.append(players_sorted[i])
-                else:
-                    team2.append(players_sorted[i])
-
-            # Calculate averages and prepare response
-            avg1 = sum(p.JLTV for p in team1) / 5
-            avg2 = sum(p.JLTV for p in team2) / 5
-
-            team_data = {
-                'team1': [p.name for p in team1],
-                'team2': [p.name for p in team2],
-                'difference': f"{abs(avg1 - avg2):.2f}",
-                'avg_rating1': f"{avg1:.2f}",
-                'avg_rating2': f"{avg2:.2f}"
-            }
+            # Score every possible 5v5 split and keep the closest few
+            best, alternatives = best_split([p.JLTV for p in players_sorted], alternatives=3)
+
+            team_data = describe_split(players_sorted, best)
+            team_data['alternatives'] = [describe_split(players_sorted, split) for split in alternatives]
 
             return render_template('display_teams.html', team=team_data)
 
@@ -1070,6 +1610,47 @@ def create_teams():
     return render_template('create_teams.html', form=form)
 
 
+@app.route('/matchmaking', methods=['GET', 'POST'])
+def matchmaking():
+    form = QueueForm()
+    form.queue.choices = [(player.player_id, player.name) for player in Player.query.order_by(Player.name).all()]
+
+    if form.validate_on_submit():
+        # Queue order is kept, so whoever is listed last sits out when the queue isn't a multiple of ten
+        player_ids = list(dict.fromkeys(int(player_id) for player_id in request.form.getlist('queue')))
+
+        if len(player_ids) < 10:
+            flash('Error: Matchmaking needs at least 10 players!', 'error')
+            return redirect(url_for('matchmaking'))
+
+        rating_source = request.form.get('rating_source')
+        by_id = {p.player_id: p for p in rated_players(player_ids, rating_source)}
+        queue = [by_id[player_id] for player_id in player_ids if player_id in by_id]
+
+        # Players without a row for the chosen ratings (e.g. no games this season) can't be balanced
+        names = dict(form.queue.choices)
+        unrated = [names[player_id] for player_id in player_ids if player_id not in by_id]
+
+        if unrated:
+            flash(f'No {"season" if rating_source == "season" else "lifetime"} rating for {", ".join(unrated)}, '
+                  f'so they were left out of the queue.', 'warning')
+
+        if len(queue) < 10:
+            flash('Error: Matchmaking needs at least 10 rated players!', 'error')
+            return redirect(url_for('matchmaking'))
+
+        lobbies, bench = make_lobbies([p.JLTV for p in queue],
+                                      time_budget=float(os.getenv('MATCHMAKING_TIME_BUDGET', 0.5)),
+                                      workers=int(os.getenv('MATCHMAKING_WORKERS', 0)))
+
+        lobby_data = [describe_split(queue, lobby) for lobby in lobbies]
+        bench_names = [queue[i].name for i in bench]
+
+        return render_template('matchmaking.html', lobbies=lobby_data, bench=bench_names)
+
+    return render_template('matchmaking.html', form=form)
+
+
 # TODO: Pull data from forms ✔
 
 # TODO: Do calculations ✔
@@ -1113,8 +1694,8 @@ def create_teams():
 
 # TODO: Ideas for customised Performance page
 
-# Who you win/lose with the most
-# Best/Worst map for each player
+# Who you win/lose with the most ✔
+# Best/Worst map for each player ✔
 # Which player has the most Kills/Deaths/ADR/Games Played/Wins
 
 # TODO: Add 'Login' page ✔
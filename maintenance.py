@@ -0,0 +1,179 @@
+"""Set-based maintenance updates.
+
+Each operation is a single ``UPDATE`` over the whole table (or one season) so repairs run inside SQLite instead
+of loading every row into the ORM. The rating formulas are registered as SQL functions so the stored values
+match what the routes compute in Python, rounding included. Operations only touch rows whose value changes and
+report how many that was.
+
+    python maintenance.py [instance/JLTV.db] [operation ...]
+"""
+from collections import namedtuple
+import time
+
+import archives
+import history
+import map_stats
+import pairs
+import ratings
+
+Result = namedtuple('Result', 'operation rows seconds')
+
+SEASON_FILTER = '(:season_id IS NULL OR {table}.season_id = :season_id)'
+
+
+def register_functions(dbapi_connection):
+    # SQLite's ROUND rounds halves away from zero; Python rounds the binary value, so use Python's
+    dbapi_connection.create_function('py_round', 2, round, deterministic=True)
+    dbapi_connection.create_function('game_mltv', 2, ratings.game_mltv, deterministic=True)
+    dbapi_connection.create_function('jltv_individual', 2, ratings.individual, deterministic=True)
+
+
+def recompute_kpr(connection, season_id=None):
+    return connection.exec_driver_sql(
+        'UPDATE player_stats SET "KPR" = py_round(player_stats.kills * 1.0 / games.rounds, 2) FROM games '
+        'WHERE games.game_id = player_stats.game_id '
+        'AND player_stats."KPR" IS NOT py_round(player_stats.kills * 1.0 / games.rounds, 2) '
+        f'AND {SEASON_FILTER.format(table="player_stats")}',
+        {'season_id': season_id}).rowcount
+
+
+def recompute_mltv(connection, season_id=None):
+    return connection.exec_driver_sql(
+        'UPDATE player_stats SET "MLTV" = game_mltv("KPR", win) '
+        'WHERE "MLTV" IS NOT game_mltv("KPR", win) '
+        f'AND {SEASON_FILTER.format(table="player_stats")}',
+        {'season_id': season_id}).rowcount
+
+
+def normalize_adr(connection, season_id=None):
+    # ADR is stored as a whole number; older imports left floats behind
+    return connection.exec_driver_sql(
+        'UPDATE player_stats SET "ADR" = CAST(py_round("ADR", 0) AS INTEGER) '
+        'WHERE typeof("ADR") <> \'integer\' '
+        f'AND {SEASON_FILTER.format(table="player_stats")}',
+        {'season_id': season_id}).rowcount
+
+
+def rebuild_season_counters(connection, season_id=None):
+    """Rebuild the per-season counters and the ratios derived from them from player_stats.
+
+    Covers played, wins, kills, rounds and ADR sums, then KPR, A_ADR, winrate, AK and individual the way
+    add_game computes them, and finally each season's games_played and player_count.
+    """
+    params = {'season_id': season_id}
+
+    rows = connection.exec_driver_sql(
+        'UPDATE season_players SET played = totals.played, total_wins = totals.wins, total_kills = totals.kills, '
+        'total_rounds = totals.rounds, sum_adr = totals.sum_adr, "KPR" = totals.kpr, "A_ADR" = totals.a_adr, '
+        'winrate = totals.winrate, "AK" = totals.ak, individual = jltv_individual(totals.kpr, totals.a_adr) '
+        'FROM (SELECT season_id, player_id, played, wins, kills, rounds, sum_adr, '
+        '      py_round(kills * 1.0 / rounds, 3) AS kpr, py_round(sum_adr * 1.0 / played, 0) AS a_adr, '
+        '      py_round((wins * 1.0 / played) * 100, 0) AS winrate, py_round(kills * 1.0 / played, 2) AS ak '
+        '      FROM (SELECT player_stats.season_id, player_stats.player_id, COUNT(*) AS played, '
+        '            SUM(player_stats.win) AS wins, SUM(player_stats.kills) AS kills, '
+        '            SUM(games.rounds) AS rounds, SUM(player_stats."ADR") AS sum_adr '
+        '            FROM player_stats JOIN games ON games.game_id = player_stats.game_id '
+        f'            WHERE {SEASON_FILTER.format(table="player_stats")} '
+        '            GROUP BY player_stats.season_id, player_stats.player_id)) AS totals '
+        'WHERE season_players.season_id = totals.season_id AND season_players.player_id = totals.player_id '
+        'AND (season_players.played, season_players.total_wins, season_players.total_kills, '
+        '     season_players.total_rounds, season_players.sum_adr, season_players."KPR", season_players."A_ADR", '
+        '     season_players.winrate, season_players."AK", season_players.individual) '
+        '    IS NOT (totals.played, totals.wins, totals.kills, totals.rounds, totals.sum_adr, totals.kpr, '
+        '            totals.a_adr, totals.winrate, totals.ak, jltv_individual(totals.kpr, totals.a_adr))',
+        params).rowcount
+
+    # Rows with no games left go back to a fresh row, keeping the individual they were seeded with
+    rows += connection.exec_driver_sql(
+        'UPDATE season_players SET played = 0, total_wins = 0, total_kills = 0, total_rounds = 0, sum_adr = 0, '
+        '"KPR" = 0, "A_ADR" = 0, winrate = 0, "AK" = 0 '
+        'WHERE (played, total_wins, total_kills, total_rounds, sum_adr, "KPR", "A_ADR", winrate, "AK") '
+        '      IS NOT (0, 0, 0, 0, 0, 0, 0, 0, 0) '
+        'AND NOT EXISTS (SELECT 1 FROM player_stats WHERE player_stats.season_id = season_players.season_id '
+        '                AND player_stats.player_id = season_players.player_id) '
+        f'AND {SEASON_FILTER.format(table="season_players")}',
+        params).rowcount
+
+    rows += connection.exec_driver_sql(
+        'UPDATE seasons SET '
+        'games_played = (SELECT COUNT(*) FROM games WHERE games.season_id = seasons.season_id), '
+        'player_count = (SELECT COUNT(*) FROM season_players WHERE season_players.season_id = seasons.season_id '
+        '                AND season_players.played > 0) '
+        'WHERE (games_played, player_count) IS NOT '
+        '      ((SELECT COUNT(*) FROM games WHERE games.season_id = seasons.season_id), '
+        '       (SELECT COUNT(*) FROM season_players WHERE season_players.season_id = seasons.season_id '
+        '        AND season_players.played > 0)) '
+        f'AND {SEASON_FILTER.format(table="seasons")}',
+        params).rowcount
+
+    return rows
+
+
+def rebuild_pairs(connection, season_id=None):
+    # Pairs are counted over every season, so this always covers the whole history
+    return pairs.rebuild(connection.connection.driver_connection)
+
+
+def rebuild_map_stats(connection, season_id=None):
+    return map_stats.rebuild(connection.connection.driver_connection, season_id)
+
+
+def rebuild_history(connection, season_id=None):
+    return history.rebuild(connection.connection.driver_connection, season_id)
+
+
+def freeze_archives(connection, season_id=None):
+    # Last, so the archives pick up whatever the repairs above changed in the season rows
+    return archives.freeze(connection.connection.driver_connection, season_id)
+
+
+# In dependency order: MLTV is derived from KPR, the season sums from ADR
+OPERATIONS = {
+    'kpr': recompute_kpr,
+    'adr': normalize_adr,
+    'mltv': recompute_mltv,
+    'season-counters': rebuild_season_counters,
+    'pairs': rebuild_pairs,
+    'maps': rebuild_map_stats,
+    'history': rebuild_history,
+    'archives': freeze_archives,
+}
+
+
+def run(connection, operations, season_id=None):
+    """Run ``operations`` (names from OPERATIONS) in order on ``connection`` and return a Result for each.
+
+    Nothing is committed here; the caller's transaction covers every operation.
+    """
+    register_functions(connection.connection.driver_connection)
+
+    results = []
+    for name in operations:
+        start = time.perf_counter()
+        rows = OPERATIONS[name](connection, season_id)
+        results.append(Result(name, rows, time.perf_counter() - start))
+
+    return results
+
+
+def report(results):
+    return '\n'.join(f'{result.operation}: {result.rows} row(s) in {result.seconds * 1000:.1f} ms'
+                     for result in results)
+
+
+if __name__ == '__main__':
+    import sys
+
+    from sqlalchemy import create_engine
+
+    import migrate
+
+    # python maintenance.py [path/to/JLTV.db] [kpr mltv adr season-counters pairs maps history archives]
+    path = sys.argv[1] if len(sys.argv) > 1 else 'instance/JLTV.db'
+    names = sys.argv[2:] or list(OPERATIONS)
+
+    engine = create_engine(f'sqlite:///{path}')
+    migrate.upgrade(engine)
+
+    with engine.begin() as connection:
+        print(report(run(connection, names)))
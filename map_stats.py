@@ -0,0 +1,111 @@
+"""Per-(player, season, map) totals behind the map leaderboards and player map profiles.
+
+``player_maps`` holds games, wins, kills, rounds and the ADR and JLTV sums of every player on every map they
+have played in a season. ingest_game and delete_game apply each game's ten rows as deltas, and the season
+replay applies the change in each game JLTV it rewrites, so the table always matches ``player_stats``
+without joining it to ``games``. ``rebuild`` recounts the table (or one season) from the games.
+
+Functions take a DB-API (sqlite3) connection and never commit.
+"""
+from collections import defaultdict, namedtuple
+
+MapLine = namedtuple('MapLine', 'player_id win kills rounds adr jltv')
+MapTotals = namedtuple('MapTotals', 'map_name games wins kills rounds adr_sum jltv_sum')
+
+APPLY_SQL = (
+    'INSERT INTO player_maps (player_id, season_id, map_name, games, wins, kills, rounds, adr_sum, jltv_sum) '
+    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+    'ON CONFLICT (player_id, season_id, map_name) DO UPDATE SET '
+    'games = games + excluded.games, wins = wins + excluded.wins, kills = kills + excluded.kills, '
+    'rounds = rounds + excluded.rounds, adr_sum = adr_sum + excluded.adr_sum, '
+    'jltv_sum = jltv_sum + excluded.jltv_sum')
+
+SEASON_FILTER = '(:season_id IS NULL OR {table}.season_id = :season_id)'
+
+TOTALS_SQL = (
+    'SELECT player_stats.player_id AS player_id, player_stats.season_id AS season_id, games.map_name AS map_name, '
+    'COUNT(*) AS games, SUM(player_stats.win) AS wins, SUM(player_stats.kills) AS kills, '
+    'SUM(games.rounds) AS rounds, SUM(player_stats."ADR") AS adr_sum, SUM(player_stats."JLTV") AS jltv_sum '
+    'FROM player_stats JOIN games ON games.game_id = player_stats.game_id '
+    f'WHERE {SEASON_FILTER.format(table="player_stats")} '
+    'GROUP BY player_stats.player_id, player_stats.season_id, games.map_name')
+
+
+def apply(connection, season_id, map_name, lines, sign=1):
+    """Add (or with ``sign`` -1 take back) one game's MapLines."""
+    connection.executemany(APPLY_SQL, [(line.player_id, season_id, map_name, sign, sign * bool(line.win),
+                                        sign * line.kills, sign * line.rounds, sign * line.adr, sign * line.jltv)
+                                       for line in lines])
+
+    if sign < 0:
+        connection.execute('DELETE FROM player_maps WHERE season_id = ? AND map_name = ? AND games <= 0',
+                           (season_id, map_name))
+
+
+def apply_jltv(connection, season_id, changes):
+    """Move the JLTV sums by ``(player_id, map_name, old_jltv, new_jltv)`` changes from a season replay."""
+    deltas = defaultdict(float)
+
+    for player_id, map_name, old, new in changes:
+        deltas[(player_id, map_name)] += new - old
+
+    connection.executemany('UPDATE player_maps SET jltv_sum = jltv_sum + ? '
+                           'WHERE player_id = ? AND season_id = ? AND map_name = ?',
+                           [(delta, player_id, season_id, map_name)
+                            for (player_id, map_name), delta in deltas.items() if delta])
+
+
+def rebuild(connection, season_id=None):
+    """Recount player_maps from player_stats; returns how many rows were added, changed or removed."""
+    params = {'season_id': season_id}
+
+    connection.execute('DROP TABLE IF EXISTS temp.map_totals')
+    connection.execute(f'CREATE TEMP TABLE map_totals AS {TOTALS_SQL}', params)
+    connection.execute('CREATE UNIQUE INDEX temp.ix_map_totals ON map_totals (player_id, season_id, map_name)')
+
+    rows = connection.execute(
+        'DELETE FROM player_maps WHERE NOT EXISTS (SELECT 1 FROM temp.map_totals AS totals '
+        'WHERE totals.player_id = player_maps.player_id AND totals.season_id = player_maps.season_id '
+        'AND totals.map_name = player_maps.map_name) '
+        f'AND {SEASON_FILTER.format(table="player_maps")}', params).rowcount
+
+    # Sums of floats are compared with a little slack; the incremental sums add in a different order
+    rows += connection.execute(
+        'INSERT OR REPLACE INTO player_maps (player_id, season_id, map_name, games, wins, kills, rounds, adr_sum, '
+        'jltv_sum) SELECT * FROM temp.map_totals AS totals WHERE NOT EXISTS (SELECT 1 FROM player_maps '
+        'WHERE player_maps.player_id = totals.player_id AND player_maps.season_id = totals.season_id '
+        'AND player_maps.map_name = totals.map_name '
+        'AND (player_maps.games, player_maps.wins, player_maps.kills, player_maps.rounds, player_maps.adr_sum) '
+        'IS (totals.games, totals.wins, totals.kills, totals.rounds, totals.adr_sum) '
+        'AND abs(player_maps.jltv_sum - totals.jltv_sum) < 1e-6)').rowcount
+
+    connection.execute('DROP TABLE temp.map_totals')
+
+    return rows
+
+
+def profile(connection, player_id, season_id=None):
+    """A player's totals per map, over every season or just ``season_id``; one primary-key range read."""
+    rows = connection.execute(
+        'SELECT map_name, SUM(games), SUM(wins), SUM(kills), SUM(rounds), SUM(adr_sum), SUM(jltv_sum) '
+        'FROM player_maps WHERE player_id = :player_id AND ' + SEASON_FILTER.format(table='player_maps') +
+        ' GROUP BY map_name ORDER BY map_name', {'player_id': player_id, 'season_id': season_id})
+
+    return [MapTotals(*row) for row in rows]
+
+
+def leaderboard(connection, map_name, season_id=None):
+    """(player_id, totals) for everyone who has played ``map_name``, over every season or just ``season_id``."""
+    rows = connection.execute(
+        'SELECT player_id, map_name, SUM(games), SUM(wins), SUM(kills), SUM(rounds), SUM(adr_sum), SUM(jltv_sum) '
+        'FROM player_maps WHERE map_name = :map_name AND ' + SEASON_FILTER.format(table='player_maps') +
+        ' GROUP BY player_id', {'map_name': map_name, 'season_id': season_id})
+
+    return [(row[0], MapTotals(*row[1:])) for row in rows]
+
+
+def summary(totals):
+    # Per-game averages the pages show, rounded like the season tables
+    return {'map_name': totals.map_name, 'games': totals.games, 'wins': totals.wins,
+            'winrate': round(totals.wins / totals.games * 100), 'KPR': round(totals.kills / totals.rounds, 3),
+            'ADR': round(totals.adr_sum / totals.games), 'JLTV': round(totals.jltv_sum / totals.games, 1)}
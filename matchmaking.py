@@ -0,0 +1,134 @@
+"""Split a large queue into balanced 10-man lobbies.
+
+Players are dealt into lobbies in a snake order by rating, then a local search swaps players between lobbies
+to shrink two things at once: the best 5v5 gap inside each lobby and the spread of lobby averages. Independent
+searches with different seeds can run on a process pool; every search stops at the same deadline.
+"""
+from concurrent.futures import ProcessPoolExecutor, wait
+import math
+import random
+import time
+
+from teams import LOBBY_SIZE, best_difference, best_split
+
+# How much one point of spread between lobby averages costs relative to one point of in-lobby gap
+SPREAD_WEIGHT = 2.0
+
+START_TEMPERATURE = 0.05
+
+
+def snake_deal(order, lobby_count):
+    lobbies = [[] for _ in range(lobby_count)]
+
+    for position, player in enumerate(order):
+        lap, offset = divmod(position, lobby_count)
+        lobbies[offset if lap % 2 == 0 else lobby_count - 1 - offset].append(player)
+
+    return lobbies
+
+
+def cost(gaps, averages):
+    return sum(gaps) + SPREAD_WEIGHT * (max(averages) - min(averages))
+
+
+def search(ratings, lobbies, seed, deadline):
+    """Anneal on player swaps between two lobbies until the deadline, returns ``(cost, lobbies)``."""
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    span = max(deadline - started, 1e-9)
+    lobbies = [list(lobby) for lobby in lobbies]
+
+    def evaluate(lobby):
+        values = [ratings[player] for player in lobby]
+        return best_difference(values), sum(values) / LOBBY_SIZE
+
+    gaps, averages = map(list, zip(*(evaluate(lobby) for lobby in lobbies)))
+    current = cost(gaps, averages)
+
+    best = (current, [list(lobby) for lobby in lobbies])
+
+    while True:
+        now = time.perf_counter()
+
+        if now >= deadline:
+            break
+
+        # Accept some worse swaps early on to escape local minima, cooling towards a pure hill-climb
+        temperature = START_TEMPERATURE * (1 - (now - started) / span) + 1e-6
+
+        # Half the moves target the strongest and weakest lobbies to pull the averages together
+        if rng.random() < 0.5:
+            a = max(range(len(lobbies)), key=averages.__getitem__)
+            b = min(range(len(lobbies)), key=averages.__getitem__)
+
+        else:
+            a, b = rng.sample(range(len(lobbies)), 2)
+
+        i, j = rng.randrange(LOBBY_SIZE), rng.randrange(LOBBY_SIZE)
+
+        lobbies[a][i], lobbies[b][j] = lobbies[b][j], lobbies[a][i]
+        old = gaps[a], averages[a], gaps[b], averages[b]
+        (gaps[a], averages[a]), (gaps[b], averages[b]) = evaluate(lobbies[a]), evaluate(lobbies[b])
+
+        candidate = cost(gaps, averages)
+
+        if candidate <= current or rng.random() < math.exp((current - candidate) / temperature):
+            current = candidate
+
+            if current < best[0]:
+                best = (current, [list(lobby) for lobby in lobbies])
+
+        else:
+            lobbies[a][i], lobbies[b][j] = lobbies[b][j], lobbies[a][i]
+            gaps[a], averages[a], gaps[b], averages[b] = old
+
+    return best
+
+
+def make_lobbies(ratings, time_budget=0.5, workers=0, seed=0):
+    """Deal ``ratings`` into balanced lobbies within ``time_budget`` seconds.
+
+    Players are indexes into ``ratings`` in queue order; anyone past the last full lobby sits out. Returns
+    ``(lobbies, bench)`` where each lobby is ``(difference, team_1, team_2)`` of player indexes. With
+    ``workers`` > 1 that many searches with different seeds run on a process pool and the best one finished by
+    the deadline wins; if none has, the snake deal is used.
+    """
+    lobby_count = len(ratings) // LOBBY_SIZE
+    playing = lobby_count * LOBBY_SIZE
+    bench = list(range(playing, len(ratings)))
+
+    if lobby_count == 0:
+        return [], bench
+
+    order = sorted(range(playing), key=lambda player: ratings[player], reverse=True)
+    start = snake_deal(order, lobby_count)
+    deadline = time.perf_counter() + time_budget
+
+    if lobby_count == 1:
+        best = (0, start)
+
+    elif workers > 1:
+        # perf_counter is not shared between processes, so each search gets its own deadline from the budget
+        pool = ProcessPoolExecutor(max_workers=workers)
+        futures = [pool.submit(_search_for, ratings, start, seed + n, time_budget * 0.9) for n in range(workers)]
+        done, _ = wait(futures, timeout=max(deadline - time.perf_counter(), 0))
+
+        # Searches still starting up or running past the budget are abandoned rather than waited for
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        results = [future.result() for future in done]
+        best = min(results) if results else (0, start)
+
+    else:
+        best = search(ratings, start, seed, deadline)
+
+    lobbies = []
+    for lobby in best[1]:
+        (difference, team_1, team_2), _ = best_split([ratings[player] for player in lobby])
+        lobbies.append((difference, [lobby[i] for i in team_1], [lobby[i] for i in team_2]))
+
+    return lobbies, bench
+
+
+def _search_for(ratings, lobbies, seed, budget):
+    return search(ratings, lobbies, seed, time.perf_counter() + budget)
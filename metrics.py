@@ -0,0 +1,149 @@
+"""Per-request timing and SQL instrumentation, exposed in the Prometheus text format.
+
+Every request records its wall time, the number of statements it ran and the time spent in them; totals are kept
+per endpoint along with the slowest statements seen. Counters are per process, so with several gunicorn workers
+each one reports its own share.
+
+With ``METRICS_ENABLED`` off nothing is registered at all: no engine events, no request hooks. ``METRICS_HEADER``
+(off by default) adds ``X-Query-Count`` and ``Server-Timing`` headers to every response.
+"""
+from collections import defaultdict
+import heapq
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SLOWEST_KEPT = 10
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestMetrics:
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.header = False
+
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)
+        self._seconds = defaultdict(float)
+        self._queries = defaultdict(int)
+        self._db_seconds = defaultdict(float)
+        self._slowest = []
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = bool(app.config.get('METRICS_ENABLED', True))
+        self.header = bool(app.config.get('METRICS_HEADER', False))
+
+        app.extensions['metrics'] = self
+
+        if not self.enabled:
+            return
+
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(Engine, 'handle_error', self._handle_error)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+
+        if has_request_context() and 'metrics' in g:
+            g.metrics['queries'] += 1
+            g.metrics['db_seconds'] += elapsed
+            g.metrics['statements'].append((elapsed, statement))
+
+    def _handle_error(self, context):
+        # A failed statement never reaches after_cursor_execute; drop its start time so the next one pairs up
+        if context.connection is not None and context.execution_context is not None:
+            starts = context.connection.info.get('query_start')
+
+            if starts:
+                starts.pop()
+
+    def _before_request(self):
+        g.metrics = {'start': time.perf_counter(), 'queries': 0, 'db_seconds': 0.0, 'statements': []}
+
+    def _after_request(self, response):
+        metrics = g.pop('metrics', None)
+        if metrics is None:
+            return response
+
+        elapsed = time.perf_counter() - metrics['start']
+        endpoint = request.endpoint or 'unmatched'
+
+        with self._lock:
+            self._requests[(endpoint, request.method, response.status_code)] += 1
+            self._seconds[endpoint] += elapsed
+            self._queries[endpoint] += metrics['queries']
+            self._db_seconds[endpoint] += metrics['db_seconds']
+
+            for seconds, statement in metrics['statements']:
+                entry = (seconds, endpoint, ' '.join(statement.split())[:200])
+
+                if len(self._slowest) < SLOWEST_KEPT:
+                    heapq.heappush(self._slowest, entry)
+
+                elif seconds > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, entry)
+
+        if self.header:
+            response.headers['X-Query-Count'] = str(metrics['queries'])
+            response.headers['Server-Timing'] = (f'db;dur={metrics["db_seconds"] * 1000:.1f};'
+                                                 f'desc="{metrics["queries"]} queries", '
+                                                 f'app;dur={elapsed * 1000:.1f}')
+
+        self.app.logger.info('%s %s ran %d queries in %.1f ms (%.1f ms total)', request.method, request.path,
+                             metrics['queries'], metrics['db_seconds'] * 1000, elapsed * 1000)
+
+        return response
+
+    def render(self):
+        with self._lock:
+            lines = ['# HELP jltv_http_requests_total Requests handled, by endpoint, method and status.',
+                     '# TYPE jltv_http_requests_total counter']
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'jltv_http_requests_total{{endpoint="{escape(endpoint)}",method="{method}",'
+                             f'status="{status}"}} {count}')
+
+            request_counts = defaultdict(int)
+            for (endpoint, _, _), count in self._requests.items():
+                request_counts[endpoint] += count
+
+            lines += ['# HELP jltv_http_request_duration_seconds Wall time spent handling requests.',
+                      '# TYPE jltv_http_request_duration_seconds summary']
+            for endpoint, seconds in sorted(self._seconds.items()):
+                lines.append(f'jltv_http_request_duration_seconds_sum{{endpoint="{escape(endpoint)}"}} {seconds:.6f}')
+                lines.append(f'jltv_http_request_duration_seconds_count{{endpoint="{escape(endpoint)}"}} '
+                             f'{request_counts[endpoint]}')
+
+            lines += ['# HELP jltv_db_queries_total SQL statements run while handling requests.',
+                      '# TYPE jltv_db_queries_total counter']
+            for endpoint, count in sorted(self._queries.items()):
+                lines.append(f'jltv_db_queries_total{{endpoint="{escape(endpoint)}"}} {count}')
+
+            lines += ['# HELP jltv_db_duration_seconds_total Time spent in SQL statements while handling requests.',
+                      '# TYPE jltv_db_duration_seconds_total counter']
+            for endpoint, seconds in sorted(self._db_seconds.items()):
+                lines.append(f'jltv_db_duration_seconds_total{{endpoint="{escape(endpoint)}"}} {seconds:.6f}')
+
+            lines += ['# HELP jltv_db_slowest_statement_seconds The slowest statements seen by this process.',
+                      '# TYPE jltv_db_slowest_statement_seconds gauge']
+            for seconds, endpoint, statement in sorted(self._slowest, reverse=True):
+                lines.append(f'jltv_db_slowest_statement_seconds{{endpoint="{escape(endpoint)}",'
+                             f'statement="{escape(statement)}"}} {seconds:.6f}')
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,193 @@
+"""Upgrades databases created by an older version of main.py.
+
+``db.create_all()`` only creates missing tables, so columns and indexes added to existing models are added
+here, and new columns are backfilled from the stored games. Every step is idempotent and runs at start-up.
+"""
+from collections import defaultdict
+
+from sqlalchemy import inspect, text
+
+import aggregates
+import archives
+import history
+import map_stats
+import pairs
+
+NEW_COLUMNS = {
+    'data_version': [
+        ('updated_at', 'FLOAT NOT NULL DEFAULT 0'),
+    ],
+    'seasons': [
+        ('rolled_up', 'BOOLEAN NOT NULL DEFAULT 0'),
+    ],
+    'season_players': [
+        ('sum_adr', 'INTEGER NOT NULL DEFAULT 0'),
+        ('sum_jltv', 'FLOAT NOT NULL DEFAULT 0'),
+        ('sum_mltv', 'FLOAT NOT NULL DEFAULT 0'),
+        ('jltv_mean', 'FLOAT NOT NULL DEFAULT 0'),
+        ('jltv_m2', 'FLOAT NOT NULL DEFAULT 0'),
+    ],
+    'players': [
+        ('sum_mltv', 'FLOAT NOT NULL DEFAULT 0'),
+        ('jltv_count', 'INTEGER NOT NULL DEFAULT 0'),
+        ('jltv_mean', 'FLOAT NOT NULL DEFAULT 0'),
+        ('jltv_m2', 'FLOAT NOT NULL DEFAULT 0'),
+    ],
+}
+
+
+# Tables that older databases lack, for upgrades run without main.py's db.create_all()
+NEW_TABLES = {
+    'player_pairs': 'CREATE TABLE player_pairs (player_id INTEGER NOT NULL, partner_id INTEGER NOT NULL, '
+                    'together INTEGER NOT NULL, wins_together INTEGER NOT NULL, against INTEGER NOT NULL, '
+                    'wins_against INTEGER NOT NULL, PRIMARY KEY (player_id, partner_id))',
+    'player_maps': 'CREATE TABLE player_maps (player_id INTEGER NOT NULL, season_id INTEGER NOT NULL, '
+                   'map_name VARCHAR(50) NOT NULL, games INTEGER NOT NULL, wins INTEGER NOT NULL, '
+                   'kills INTEGER NOT NULL, rounds INTEGER NOT NULL, adr_sum INTEGER NOT NULL, '
+                   'jltv_sum FLOAT NOT NULL, PRIMARY KEY (player_id, season_id, map_name))',
+    'rating_history': 'CREATE TABLE rating_history (player_id INTEGER NOT NULL, season_id INTEGER NOT NULL, '
+                      'points BLOB NOT NULL, PRIMARY KEY (player_id, season_id))',
+    'season_archives': 'CREATE TABLE season_archives (season_id INTEGER NOT NULL, player_id INTEGER NOT NULL, '
+                       'played INTEGER NOT NULL, total_wins INTEGER NOT NULL, total_kills INTEGER NOT NULL, '
+                       'total_rounds INTEGER NOT NULL, "A_ADR" INTEGER NOT NULL, "MLTV" FLOAT NOT NULL, '
+                       'sum_mltv FLOAT NOT NULL, jltv_mean FLOAT NOT NULL, jltv_m2 FLOAT NOT NULL, '
+                       'PRIMARY KEY (season_id, player_id))',
+}
+
+# Mirrors the __table_args__ of the models in main.py
+INDEXES = [
+    ('ix_games_season_id', 'games', ('season_id',)),
+    ('ix_season_players_season_id_player_id', 'season_players', ('season_id', 'player_id')),
+    ('ix_season_players_player_id', 'season_players', ('player_id',)),
+    ('ix_player_stats_season_id_player_id', 'player_stats', ('season_id', 'player_id')),
+    ('ix_player_stats_game_id', 'player_stats', ('game_id',)),
+    ('ix_player_pairs_partner_id', 'player_pairs', ('partner_id',)),
+    ('ix_player_maps_map_name_season_id', 'player_maps', ('map_name', 'season_id')),
+    ('ix_season_archives_player_id', 'season_archives', ('player_id',)),
+]
+
+
+def upgrade(engine):
+    with engine.begin() as connection:
+        add_missing_tables(connection)
+        added = add_missing_columns(connection)
+
+        if any(table in ('season_players', 'players') for table, _ in added):
+            backfill_running_state(connection)
+
+        if ('seasons', 'rolled_up') in added:
+            # Every completed season was rolled up by adjust_jltv when its 30th game went in
+            connection.execute(text('UPDATE seasons SET rolled_up = 1 WHERE games_played = 30'))
+
+        if ('data_version', 'updated_at') in added:
+            # Unknown until the next write; start from now so Last-Modified never goes backwards
+            connection.execute(text("UPDATE data_version SET updated_at = strftime('%s', 'now')"))
+
+        add_missing_indexes(connection)
+
+        # These are all derived from the games, so an empty one next to stored games has never been filled in
+        for table, rebuild in (('player_pairs', pairs.rebuild), ('player_maps', map_stats.rebuild),
+                               ('rating_history', history.rebuild), ('season_archives', archives.freeze)):
+            if connection.execute(text(f'SELECT NOT EXISTS (SELECT 1 FROM {table}) '
+                                       'AND EXISTS (SELECT 1 FROM player_stats)')).scalar():
+                rebuild(connection.connection.driver_connection)
+
+
+def add_missing_tables(connection):
+    existing = set(inspect(connection).get_table_names())
+
+    for table, ddl in NEW_TABLES.items():
+        if table not in existing:
+            connection.execute(text(ddl))
+
+
+def add_missing_columns(connection):
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    added = []
+
+    for table, columns in NEW_COLUMNS.items():
+        # Tables the app creates on startup come with every column
+        if table not in tables:
+            continue
+
+        existing = {column['name'] for column in inspector.get_columns(table)}
+
+        for name, ddl in columns:
+            if name not in existing:
+                connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+                added.append((table, name))
+
+    return added
+
+
+def add_missing_indexes(connection):
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    added = []
+
+    for name, table, columns in INDEXES:
+        # As with the columns, create_all builds these tables with their indexes
+        if table not in tables:
+            continue
+
+        existing = {index['name'] for index in inspector.get_indexes(table)}
+
+        if name not in existing:
+            connection.execute(text(f'CREATE INDEX {name} ON {table} ({", ".join(columns)})'))
+            added.append(name)
+
+    return added
+
+
+def backfill_running_state(connection):
+    # Season running state from each player's games, oldest first
+    season_state = defaultdict(lambda: {'sum_adr': 0, 'sum_jltv': 0, 'sum_mltv': 0, 'jltv': aggregates.EMPTY})
+
+    rows = connection.execute(text(
+        'SELECT season_id, player_id, "ADR", "JLTV", "MLTV" FROM player_stats ORDER BY id'))
+
+    for season_id, player_id, adr, jltv, mltv in rows:
+        state = season_state[(season_id, player_id)]
+        state['sum_adr'] += adr
+        state['sum_jltv'] += jltv
+        state['sum_mltv'] += mltv
+        state['jltv'] = aggregates.push(state['jltv'], jltv)
+
+    for (season_id, player_id), state in season_state.items():
+        connection.execute(text(
+            'UPDATE season_players SET sum_adr = :sum_adr, sum_jltv = :sum_jltv, sum_mltv = :sum_mltv, '
+            'jltv_mean = :jltv_mean, jltv_m2 = :jltv_m2 WHERE season_id = :season_id AND player_id = :player_id'),
+            {'sum_adr': state['sum_adr'], 'sum_jltv': state['sum_jltv'], 'sum_mltv': state['sum_mltv'],
+             'jltv_mean': state['jltv'][1], 'jltv_m2': state['jltv'][2],
+             'season_id': season_id, 'player_id': player_id})
+
+    # Lifetime state covers the seasons that have been rolled up into Player, i.e. the completed ones
+    completed = {season_id for season_id, in connection.execute(
+        text('SELECT season_id FROM seasons WHERE games_played = 30'))}
+
+    lifetime_state = defaultdict(lambda: {'sum_mltv': 0, 'jltv': aggregates.EMPTY})
+
+    for (season_id, player_id), state in season_state.items():
+        if season_id in completed:
+            lifetime = lifetime_state[player_id]
+            lifetime['sum_mltv'] += state['sum_mltv']
+            lifetime['jltv'] = aggregates.merge(lifetime['jltv'], state['jltv'])
+
+    for player_id, state in lifetime_state.items():
+        connection.execute(text(
+            'UPDATE players SET sum_mltv = :sum_mltv, jltv_count = :jltv_count, jltv_mean = :jltv_mean, '
+            'jltv_m2 = :jltv_m2 WHERE player_id = :player_id'),
+            {'sum_mltv': state['sum_mltv'], 'jltv_count': state['jltv'][0], 'jltv_mean': state['jltv'][1],
+             'jltv_m2': state['jltv'][2], 'player_id': player_id})
+
+
+if __name__ == '__main__':
+    import sys
+
+    from sqlalchemy import create_engine
+
+    # python migrate.py [path/to/JLTV.db]
+    path = sys.argv[1] if len(sys.argv) > 1 else 'instance/JLTV.db'
+    upgrade(create_engine(f'sqlite:///{path}'))
+    print(f'{path} is up to date')
@@ -0,0 +1,91 @@
+"""Teammate and opponent counts for every pair of players who have shared a game.
+
+``player_pairs`` holds one row per pair that has met, lower player id first: games on the same team, wins on
+the same team, games on opposite teams and how many of those the lower id won. add_game and delete_game apply
+each game's 45 pairs as deltas, so the performance page reads a player's partners with two index lookups
+instead of self-joining ``player_stats``. ``rebuild`` recounts the whole table from the games.
+
+Functions take a DB-API (sqlite3) connection and never commit.
+"""
+from collections import namedtuple
+from itertools import combinations
+
+# One player's view of a pair; both win counts are that player's wins
+Partner = namedtuple('Partner', 'player_id together wins_together against wins_against')
+
+APPLY_SQL = (
+    'INSERT INTO player_pairs (player_id, partner_id, together, wins_together, against, wins_against) '
+    'VALUES (?, ?, ?, ?, ?, ?) '
+    'ON CONFLICT (player_id, partner_id) DO UPDATE SET '
+    'together = together + excluded.together, wins_together = wins_together + excluded.wins_together, '
+    'against = against + excluded.against, wins_against = wins_against + excluded.wins_against')
+
+PAIR_TOTALS_SQL = (
+    'SELECT low.player_id AS player_id, high.player_id AS partner_id, SUM(low.win = high.win) AS together, '
+    'SUM(low.win = 1 AND high.win = 1) AS wins_together, SUM(low.win <> high.win) AS against, '
+    'SUM(low.win = 1 AND high.win = 0) AS wins_against '
+    'FROM player_stats AS low JOIN player_stats AS high '
+    'ON high.game_id = low.game_id AND high.player_id > low.player_id '
+    'GROUP BY low.player_id, high.player_id')
+
+
+def game_pairs(lines, sign=1):
+    """Rows to apply for one game; ``lines`` are its ``(player_id, win)`` pairs, ``sign`` -1 takes it back out."""
+    rows = []
+
+    for (first, first_win), (second, second_win) in combinations(sorted(lines), 2):
+        together = first_win == second_win
+        rows.append((first, second, sign * together, sign * (together and first_win),
+                     sign * (not together), sign * (not together and first_win)))
+
+    return rows
+
+
+def apply(connection, lines, sign=1):
+    connection.executemany(APPLY_SQL, game_pairs([(player_id, bool(win)) for player_id, win in lines], sign))
+
+    if sign < 0:
+        # A pair whose only games were taken back is dropped rather than left as zeros
+        connection.execute('DELETE FROM player_pairs WHERE together = 0 AND against = 0')
+
+
+def rebuild(connection):
+    """Recount every pair from player_stats; returns how many rows were added, changed or removed."""
+    connection.execute('DROP TABLE IF EXISTS temp.pair_totals')
+    connection.execute(f'CREATE TEMP TABLE pair_totals AS {PAIR_TOTALS_SQL}')
+
+    rows = connection.execute(
+        'DELETE FROM player_pairs WHERE NOT EXISTS (SELECT 1 FROM temp.pair_totals AS totals '
+        'WHERE totals.player_id = player_pairs.player_id AND totals.partner_id = player_pairs.partner_id)').rowcount
+
+    rows += connection.execute(
+        'INSERT OR REPLACE INTO player_pairs (player_id, partner_id, together, wins_together, against, wins_against) '
+        'SELECT player_id, partner_id, together, wins_together, against, wins_against FROM temp.pair_totals AS totals '
+        'WHERE NOT EXISTS (SELECT 1 FROM player_pairs WHERE player_pairs.player_id = totals.player_id '
+        'AND player_pairs.partner_id = totals.partner_id '
+        'AND (player_pairs.together, player_pairs.wins_together, player_pairs.against, player_pairs.wins_against) '
+        'IS (totals.together, totals.wins_together, totals.against, totals.wins_against))').rowcount
+
+    connection.execute('DROP TABLE temp.pair_totals')
+
+    return rows
+
+
+def partners(connection, player_id):
+    """Every player ``player_id`` has shared a game with, from ``player_id``'s side."""
+    rows = connection.execute(
+        'SELECT partner_id, together, wins_together, against, wins_against FROM player_pairs WHERE player_id = ? '
+        'UNION ALL '
+        'SELECT player_id, together, wins_together, against, against - wins_against FROM player_pairs '
+        'WHERE partner_id = ?', (player_id, player_id))
+
+    return [Partner(*row) for row in rows]
+
+
+def top_duos(connection, min_games, limit):
+    # Best win rate together among pairs with enough games, ties broken by games played
+    rows = connection.execute(
+        'SELECT player_id, partner_id, together, wins_together FROM player_pairs WHERE together >= ? '
+        'ORDER BY wins_together * 1.0 / together DESC, together DESC LIMIT ?', (min_games, limit))
+
+    return rows.fetchall()
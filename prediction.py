@@ -0,0 +1,112 @@
+"""Win probability of a 5v5 lineup from the two teams' average rating.
+
+    p(team 1 wins) = 1 / (1 + exp(-scale * (team 1 average - team 2 average)))
+
+``scale`` is fitted on every stored game, using the ratings each player went into that game with (see
+``kernel.load_history``). ``rating`` is ``individual`` or ``jltv``, the same values ``add_game`` averages per
+team. The backtest replays the history in order and, season by season, only uses a scale fitted on the seasons
+before it, so its numbers are out of sample.
+
+    python prediction.py [instance/JLTV.db] [--rating individual|jltv] [--scale 0.2]
+"""
+from collections import namedtuple
+import math
+
+import numpy as np
+
+import kernel
+
+Model = namedtuple('Model', 'rating scale games')
+Backtest = namedtuple('Backtest', 'games accuracy log_loss brier calibration')
+
+# Favourite's predicted chance, in bands of 10 points from a coin flip up
+CALIBRATION_EDGES = (0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+
+def rating_gaps(history, rating):
+    # Winners' minus losers' pre-game team average for every stored game, in game order
+    winners, losers = kernel.team_averages(history, kernel.PREDICTORS[rating](history))
+
+    return winners - losers
+
+
+def fit(history, rating='individual'):
+    gaps = rating_gaps(history, rating)
+    scale, _ = kernel.fit_scale(gaps)
+
+    # A negative fit would mean the ratings pick the loser; call that no information rather than invert them
+    return Model(rating, max(scale, 0.0), len(gaps))
+
+
+def probability(model, team1, team2):
+    """Chance that ``team1`` beats ``team2``, given each team's five ratings."""
+    gap = sum(team1) / len(team1) - sum(team2) / len(team2)
+
+    return 1 / (1 + math.exp(-model.scale * gap))
+
+
+def calibration(favourite, favourite_won):
+    bands = []
+
+    for low, high in zip(CALIBRATION_EDGES, CALIBRATION_EDGES[1:]):
+        selected = (favourite >= low) & ((favourite < high) | (high == CALIBRATION_EDGES[-1]))
+
+        if selected.any():
+            bands.append((low, high, int(selected.sum()), float(favourite[selected].mean()),
+                          float(favourite_won[selected].mean())))
+
+    return bands
+
+
+def backtest(history, rating='individual', scale=None):
+    """Predict every stored game in order; without ``scale`` each season uses the fit on the seasons before it."""
+    gaps = rating_gaps(history, rating)
+    first_row = np.unique(history.game_index, return_index=True)[1]
+    seasons = history.season_id[first_row]
+
+    scales = np.full(len(gaps), scale if scale is not None else 0.0)
+    if scale is None:
+        for season in np.unique(seasons)[1:]:
+            earlier = seasons < season
+            scales[seasons == season] = max(kernel.fit_scale(gaps[earlier])[0], 0.0)
+
+    # Probability the actual winner was given
+    winner = 1 / (1 + np.exp(-scales * gaps))
+    favourite = np.maximum(winner, 1 - winner)
+    favourite_won = np.where(winner > 0.5, 1.0, np.where(winner < 0.5, 0.0, 0.5))
+
+    accuracy = float(np.mean(gaps > 0) + 0.5 * np.mean(gaps == 0))
+    log_loss = float(np.mean(np.logaddexp(0, -scales * gaps)))
+    brier = float(np.mean((1 - winner) ** 2))
+
+    return Backtest(len(gaps), accuracy, log_loss, brier, calibration(favourite, favourite_won))
+
+
+if __name__ == '__main__':
+    import argparse
+    import sqlite3
+    import time
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('database', nargs='?', default='instance/JLTV.db')
+    parser.add_argument('--rating', choices=sorted(kernel.PREDICTORS), default='individual')
+    parser.add_argument('--scale', type=float, help='fixed scale instead of the season-by-season fit')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    connection = sqlite3.connect(f'file:{args.database}?mode=ro', uri=True)
+    history = kernel.load_history(connection)
+    connection.close()
+
+    result = backtest(history, args.rating, args.scale)
+    model = fit(history, args.rating)
+    elapsed = time.perf_counter() - start
+
+    print(f'{result.games} games backtested on {args.rating} in {elapsed:.2f}s')
+    print(f'accuracy {result.accuracy:.3f}  log-loss {result.log_loss:.4f}  brier {result.brier:.4f}  '
+          f'(a coin flip scores log-loss {math.log(2):.4f}, brier 0.2500)')
+    print(f'scale fitted on every game: {model.scale:.4f}\n')
+
+    print(f'{"favourite":<12} {"games":>6} {"predicted":>10} {"won":>6}')
+    for low, high, games, predicted, won in result.calibration:
+        print(f'{f"{low:.0%}-{high:.0%}":<12} {games:>6} {predicted:>10.3f} {won:>6.3f}')
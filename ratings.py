@@ -0,0 +1,52 @@
+"""JLTV rating formulas shared by the routes and the recompute engine.
+
+The constants are the single source for the formulas; ``kernel.py`` evaluates the same formulas over NumPy
+arrays with any set of them swapped out, which is what ``sweep.py`` tunes.
+"""
+
+KPR_SCALE = 27
+RATING_EXPONENT = 0.8
+WINRATE_OFFSET = 7
+WINRATE_EXPONENT = 0.1877
+NEUTRAL_WINRATE = 50
+ADR_SCALE = 20
+ADR_EXPONENT = 0.1
+GAME_SCALE = 1.39
+INDIVIDUAL_SCALE = 1.379
+JLTV_BASE = 9.4
+
+# Per-game MLTV: a win is worth KPR * 0.8 * 0.8 / (100 / 55), a loss -(29 * 0.8 * 0.8 / 140) / KPR
+MLTV_FACTOR = 0.8
+MLTV_WIN_DIVISOR = 100 / 55
+MLTV_LOSS_KILLS = 29
+MLTV_LOSS_DIVISOR = 140
+
+
+def game_mltv(kpr, win):
+    # Per-game MLTV depends only on the game's KPR and the result
+    if win:
+        return kpr * MLTV_FACTOR * MLTV_FACTOR / MLTV_WIN_DIVISOR
+
+    return -(MLTV_LOSS_KILLS * MLTV_FACTOR * MLTV_FACTOR / MLTV_LOSS_DIVISOR) / kpr
+
+
+def game_jltv(kpr, winrate, adr, own_avg, opp_avg):
+    # Per-game JLTV, scaled by the opposing team's average individual over your own
+    return round((((((kpr * KPR_SCALE) ** RATING_EXPONENT) *
+                    ((winrate + WINRATE_OFFSET) ** WINRATE_EXPONENT) *
+                    ((adr / ADR_SCALE) ** ADR_EXPONENT)) ** RATING_EXPONENT) * GAME_SCALE) * (opp_avg / own_avg), 1)
+
+
+def individual(kpr, a_adr):
+    return round(((((kpr * KPR_SCALE) ** RATING_EXPONENT) * ((NEUTRAL_WINRATE + WINRATE_OFFSET) ** WINRATE_EXPONENT) *
+                   (a_adr / ADR_SCALE) ** ADR_EXPONENT) ** RATING_EXPONENT) * INDIVIDUAL_SCALE, 1)
+
+
+def team_balance(kpr, winrate, a_adr, mltv):
+    return round((((((((kpr * KPR_SCALE) ** RATING_EXPONENT) * ((winrate + WINRATE_OFFSET) ** WINRATE_EXPONENT) *
+                      ((a_adr / ADR_SCALE) ** ADR_EXPONENT)) ** RATING_EXPONENT) * INDIVIDUAL_SCALE)
+                   - mltv) / mltv) * 100, 0)
+
+
+def overall_jltv(mltv, sum_mltv):
+    return round(JLTV_BASE + (mltv / 2) + sum_mltv, 2)
@@ -0,0 +1,118 @@
+"""In-memory season replay.
+
+The engine works on plain rows so it can be fed from the ORM or straight from sqlite3. It reproduces the
+game-by-game replay that used to run through the ORM: every game of the season gets its JLTV recalculated
+from the current team averages, then each player's Inconsistency, MLTV, Team Balance and JLTV are rebuilt
+from those games, along with the running sums and variance state stored next to them.
+"""
+from collections import namedtuple, OrderedDict
+import statistics
+
+import aggregates
+import ratings
+
+StatRow = namedtuple('StatRow', 'id game_id player_id win KPR ADR JLTV MLTV')
+RosterRow = namedtuple('RosterRow', 'id player_id played KPR A_ADR winrate individual '
+                                    'inconsistency team_balance MLTV JLTV sum_jltv sum_mltv jltv_mean jltv_m2')
+
+ROSTER_FIELDS = ('inconsistency', 'team_balance', 'MLTV', 'JLTV', 'sum_jltv', 'sum_mltv', 'jltv_mean', 'jltv_m2')
+
+
+def replay_season(stats, roster, game_ids=None):
+    """Replay a season's games and return the rows that changed.
+
+    ``stats`` are the season's PlayerGameStats rows and ``roster`` its SeasonPlayer rows. Returns two lists of
+    dicts keyed by primary key, ready for a bulk UPDATE.
+
+    With ``game_ids`` only those games are recalculated and only the players in them get their season row
+    rebuilt; every other game keeps its stored JLTV. That is exact when no one in the other games has had their
+    Individual or winrate changed since the last replay.
+    """
+    roster = {row.player_id: row for row in roster}
+
+    # Group each game's rows in insertion order, games in ascending order
+    games = OrderedDict()
+    for stat in sorted(stats, key=lambda s: (s.game_id, s.id)):
+        games.setdefault(stat.game_id, []).append(stat)
+
+    new_jltv = {}
+    replayed_players = set()
+    for game_id, player_games in games.items():
+        if game_ids is not None and game_id not in game_ids:
+            for player_game in player_games:
+                new_jltv[player_game.id] = player_game.JLTV
+
+            continue
+
+        replayed_players.update(player_game.player_id for player_game in player_games)
+
+        team_1 = 0
+        team_2 = 0
+
+        for player_game in player_games:
+            if player_game.win == 1:
+                team_1 += roster[player_game.player_id].individual
+
+            else:
+                team_2 += roster[player_game.player_id].individual
+
+        team_1_avg = round(team_1 / 5, 1)
+        team_2_avg = round(team_2 / 5, 1)
+
+        for player_game in player_games:
+            player = roster[player_game.player_id]
+
+            if player_game.win == 1:
+                jltv = ratings.game_jltv(player_game.KPR, player.winrate, player_game.ADR, team_1_avg, team_2_avg)
+
+            else:
+                jltv = ratings.game_jltv(player_game.KPR, player.winrate, player_game.ADR, team_2_avg, team_1_avg)
+
+            new_jltv[player_game.id] = jltv
+
+    # Each player's season aggregates are rebuilt from all of their games, oldest first
+    player_games = OrderedDict()
+    for stat in sorted(stats, key=lambda s: s.id):
+        player_games.setdefault(stat.player_id, []).append(stat)
+
+    stat_updates = []
+    for stat in sorted(stats, key=lambda s: s.id):
+        if new_jltv[stat.id] != stat.JLTV:
+            stat_updates.append({'id': stat.id, 'JLTV': new_jltv[stat.id]})
+
+    roster_updates = []
+    for player_id, games_played in player_games.items():
+        if game_ids is not None and player_id not in replayed_players:
+            continue
+
+        player = roster[player_id]
+        jltv_list = [new_jltv[stat.id] for stat in games_played]
+
+        sum_jltv = 0
+        sum_mltv = 0
+        for stat in games_played:
+            sum_jltv += new_jltv[stat.id]
+            sum_mltv += stat.MLTV
+
+        inconsistency = player.inconsistency
+        if player.played >= 2:
+            inconsistency = round(statistics.stdev(jltv_list), 1)
+
+        mltv = round(sum_jltv / len(games_played), 1)
+        _, jltv_mean, jltv_m2 = aggregates.from_values(jltv_list)
+
+        values = {
+            'inconsistency': inconsistency,
+            'team_balance': ratings.team_balance(player.KPR, player.winrate, player.A_ADR, mltv),
+            'MLTV': mltv,
+            'JLTV': ratings.overall_jltv(mltv, sum_mltv),
+            'sum_jltv': sum_jltv,
+            'sum_mltv': sum_mltv,
+            'jltv_mean': jltv_mean,
+            'jltv_m2': jltv_m2,
+        }
+
+        if any(values[field] != getattr(player, field) for field in ROSTER_FIELDS):
+            roster_updates.append(dict(id=player.id, **values))
+
+    return stat_updates, roster_updates
@@ -0,0 +1,311 @@
+"""Offline rebuild of every season and lifetime aggregate from the stored games.
+
+The live database is copied to a scratch file, the raw ``player_stats``/``games`` rows are streamed season by
+season in game order, and every derived column (per-game KPR, MLTV and JLTV, all ``season_players`` and
+``players`` aggregates, the season counters) is rebuilt in one pass and written to the scratch copy. Only one
+season of games is held in memory at a time. The scratch copy is then diffed against the live tables.
+
+    python replay_history.py [instance/JLTV.db] [--scratch instance/JLTV-replay.db] [--limit 20]
+
+The live database is only read. Once the diff looks right the scratch file can replace it.
+"""
+import argparse
+from contextlib import closing
+import itertools
+import math
+import os
+import sqlite3
+import time
+
+from sqlalchemy import create_engine
+
+import aggregates
+import archives
+import history
+import map_stats
+import migrate
+import ratings
+from recompute import StatRow, RosterRow, replay_season
+
+SEASON_LENGTH = 30
+
+# The replay reads and rebuilds these; databases from before season_players have nothing to compare against
+REQUIRED_TABLES = ('seasons', 'games', 'player_stats', 'season_players', 'players')
+
+# (table, primary key, columns) compared by the diff
+DIFF_COLUMNS = [
+    ('seasons', 'season_id', ('games_played', 'player_count', 'rolled_up')),
+    ('player_stats', 'id', ('KPR', 'MLTV', 'JLTV')),
+    ('season_players', 'id', ('played', 'total_wins', 'total_kills', 'total_rounds', 'AK', 'KPR', 'A_ADR',
+                              'winrate', 'inconsistency', 'team_balance', 'JLTV', 'individual', 'MLTV', 'sum_adr',
+                              'sum_jltv', 'sum_mltv', 'jltv_mean', 'jltv_m2')),
+    ('players', 'player_id', ('played', 'total_wins', 'total_kills', 'total_rounds', 'AK', 'KPR', 'A_ADR',
+                              'winrate', 'inconsistency', 'team_balance', 'JLTV', 'individual', 'MLTV', 'sum_mltv',
+                              'jltv_count', 'jltv_mean', 'jltv_m2')),
+]
+
+
+def copy_database(source, target):
+    if os.path.exists(target):
+        os.remove(target)
+
+    with closing(sqlite3.connect(source)) as live, closing(sqlite3.connect(target)) as scratch:
+        live.backup(scratch)
+
+    # Older databases get the running-state columns before they are written
+    engine = create_engine(f'sqlite:///{target}')
+    migrate.upgrade(engine)
+    engine.dispose()
+
+
+def season_stats(connection):
+    # Streams (season_id, rows) with each season's stats in game order
+    rows = connection.execute(
+        'SELECT player_stats.season_id, player_stats.id, player_stats.game_id, player_stats.player_id, '
+        'player_stats.win, player_stats.kills, player_stats."ADR", games.rounds '
+        'FROM player_stats JOIN games ON games.game_id = player_stats.game_id '
+        'ORDER BY player_stats.season_id, player_stats.game_id, player_stats.id')
+
+    return itertools.groupby(rows, key=lambda row: row[0])
+
+
+def rebuild_season(stats, season_rows):
+    """Rebuild one season's ``season_players`` rows and per-game stats.
+
+    ``season_rows`` maps player_id to the season's stored row (only ``id`` and ``individual`` are read). Returns
+    ``(stat_values, roster)`` where roster maps player_id to a dict of the rebuilt columns.
+    """
+    roster = {}
+    for player_id, (row_id, individual) in season_rows.items():
+        roster[player_id] = {'id': row_id, 'player_id': player_id, 'played': 0, 'total_wins': 0, 'total_kills': 0,
+                             'total_rounds': 0, 'AK': 0, 'KPR': 0, 'A_ADR': 0, 'winrate': 0, 'inconsistency': 0,
+                             'team_balance': 0, 'JLTV': 0, 'individual': individual, 'MLTV': 0, 'sum_adr': 0,
+                             'sum_jltv': 0, 'sum_mltv': 0, 'jltv_mean': 0, 'jltv_m2': 0}
+
+    stat_values = {}
+    for _, stat_id, game_id, player_id, win, kills, adr, rounds in stats:
+        kpr = round(kills / rounds, 2)
+        mltv = ratings.game_mltv(kpr, win)
+        stat_values[stat_id] = StatRow(stat_id, game_id, player_id, win, kpr, adr, 0, mltv)
+
+        player = roster[player_id]
+        player['played'] += 1
+        player['total_wins'] += win
+        player['total_kills'] += kills
+        player['total_rounds'] += rounds
+        player['sum_adr'] += adr
+
+    for player in roster.values():
+        if player['played'] > 0:
+            player['KPR'] = round(player['total_kills'] / player['total_rounds'], 3)
+            player['A_ADR'] = round(player['sum_adr'] / player['played'], 0)
+            player['winrate'] = round((player['total_wins'] / player['played']) * 100, 0)
+            player['AK'] = round(player['total_kills'] / player['played'], 2)
+            player['individual'] = ratings.individual(player['KPR'], player['A_ADR'])
+
+    stat_updates, roster_updates = replay_season(
+        stat_values.values(),
+        [RosterRow(*(player[field] for field in RosterRow._fields)) for player in roster.values()])
+
+    # The engine only returns values that differ from its input, which here is all zeros
+    jltv = {update['id']: update['JLTV'] for update in stat_updates}
+    stat_values = [{'id': stat.id, 'KPR': stat.KPR, 'MLTV': stat.MLTV, 'JLTV': jltv.get(stat.id, 0)}
+                   for stat in stat_values.values()]
+
+    by_row = {player['id']: player for player in roster.values()}
+    for update in roster_updates:
+        by_row[update['id']].update(update)
+
+    return stat_values, roster
+
+
+class Lifetime:
+    """Running lifetime totals for one player, rolled up the way adjust_jltv does at the end of a season."""
+
+    def __init__(self):
+        self.played = self.total_wins = self.total_kills = self.total_rounds = 0
+        self.sum_mltv = 0
+        self.jltv = aggregates.EMPTY
+
+        # Averages run over every season row the player has, including seasons they sat out
+        self.seasons = 0
+        self.sum_a_adr = 0
+        self.sum_season_mltv = 0
+
+        self.values = None
+
+    def add_season(self, row, completed):
+        self.seasons += 1
+        self.sum_a_adr += row['A_ADR']
+        self.sum_season_mltv += row['MLTV']
+
+        if not completed or row['played'] == 0:
+            return
+
+        self.played += row['played']
+        self.total_wins += row['total_wins']
+        self.total_kills += row['total_kills']
+        self.total_rounds += row['total_rounds']
+        self.sum_mltv += row['sum_mltv']
+        self.jltv = aggregates.merge(self.jltv, (row['played'], row['jltv_mean'], row['jltv_m2']))
+
+        values = {'AK': round(self.total_kills / self.played, 2),
+                  'KPR': round(self.total_kills / self.total_rounds, 3),
+                  'A_ADR': round(self.sum_a_adr / self.seasons, 0),
+                  'winrate': round((self.total_wins / self.played) * 100, 0),
+                  'MLTV': round(self.sum_season_mltv / self.seasons, 1)}
+
+        values['individual'] = ratings.individual(values['KPR'], values['A_ADR'])
+
+        if values['MLTV']:
+            values['team_balance'] = ratings.team_balance(values['KPR'], values['winrate'], values['A_ADR'],
+                                                          values['MLTV'])
+
+        if self.jltv[0] >= 2:
+            values['inconsistency'] = round(aggregates.stdev(self.jltv), 1)
+
+        values['JLTV'] = ratings.overall_jltv(values['MLTV'], self.sum_mltv)
+
+        if self.values is not None:
+            self.values.update(values)
+
+        else:
+            self.values = values
+
+    def row(self, player_id):
+        row = {'player_id': player_id, 'played': self.played, 'total_wins': self.total_wins,
+               'total_kills': self.total_kills, 'total_rounds': self.total_rounds, 'sum_mltv': self.sum_mltv,
+               'jltv_count': self.jltv[0], 'jltv_mean': self.jltv[1], 'jltv_m2': self.jltv[2]}
+
+        row.update(self.values or {})
+
+        return row
+
+
+def update_rows(connection, table, key, rows):
+    # One executemany per distinct set of columns, since rows may leave some columns as they are
+    by_columns = {}
+    for row in rows:
+        by_columns.setdefault(tuple(column for column in row if column != key), []).append(row)
+
+    for columns, grouped in by_columns.items():
+        assignments = ', '.join(f'"{column}" = :{column}' for column in columns)
+        connection.executemany(f'UPDATE {table} SET {assignments} WHERE {key} = :{key}', grouped)
+
+
+def replay(live_path, scratch_path):
+    copy_database(live_path, scratch_path)
+
+    live = sqlite3.connect(f'file:{live_path}?mode=ro', uri=True)
+    scratch = sqlite3.connect(scratch_path)
+
+    seasons = dict(live.execute('SELECT seasons.season_id, COUNT(games.game_id) FROM seasons '
+                                'LEFT JOIN games ON games.season_id = seasons.season_id '
+                                'GROUP BY seasons.season_id'))
+    lifetimes = {}
+    streamed = season_stats(live)
+    pending = next(streamed, None)
+
+    for season_id in sorted(seasons):
+        season_rows = {player_id: (row_id, individual) for row_id, player_id, individual in live.execute(
+            'SELECT id, player_id, individual FROM season_players WHERE season_id = ? ORDER BY id', (season_id,))}
+
+        stats = ()
+        if pending is not None and pending[0] == season_id:
+            stats = list(pending[1])
+            pending = next(streamed, None)
+
+        stat_values, roster = rebuild_season(stats, season_rows)
+
+        update_rows(scratch, 'player_stats', 'id', stat_values)
+        update_rows(scratch, 'season_players', 'id',
+                    ({key: value for key, value in player.items() if key != 'player_id'}
+                     for player in roster.values()))
+
+        player_count = sum(1 for player in roster.values() if player['played'] > 0)
+        completed = seasons[season_id] == SEASON_LENGTH
+        scratch.execute('UPDATE seasons SET games_played = ?, player_count = ?, rolled_up = ? WHERE season_id = ?',
+                        (seasons[season_id], player_count, completed, season_id))
+
+        for player_id, player in roster.items():
+            lifetimes.setdefault(player_id, Lifetime()).add_season(player, completed)
+
+    player_ids = [player_id for player_id, in live.execute('SELECT player_id FROM players')]
+    update_rows(scratch, 'players', 'player_id',
+                (lifetimes.get(player_id, Lifetime()).row(player_id) for player_id in player_ids))
+
+    # The map totals and rating history include the rebuilt game JLTV, the archives the rebuilt season rows
+    map_stats.rebuild(scratch)
+    history.rebuild(scratch)
+    archives.freeze(scratch)
+
+    scratch.commit()
+    scratch.close()
+    live.close()
+
+
+def differs(live, rebuilt, tolerance):
+    if isinstance(live, float) or isinstance(rebuilt, float):
+        return live is None or rebuilt is None or not math.isclose(live, rebuilt, abs_tol=tolerance)
+
+    return live != rebuilt
+
+
+def diff(live_path, scratch_path, limit=20, tolerance=1e-9):
+    connection = sqlite3.connect(scratch_path)
+    connection.execute('ATTACH DATABASE ? AS live', (f'file:{live_path}?mode=ro',))
+    live_columns = {}
+    total = 0
+
+    for table, key, columns in DIFF_COLUMNS:
+        existing = {row[1] for row in connection.execute(f'PRAGMA live.table_info({table})')}
+        columns = [column for column in columns if column in existing]
+        live_columns[table] = columns
+
+        selected = ', '.join(f'live.{table}."{column}", main.{table}."{column}"' for column in columns)
+        rows = connection.execute(f'SELECT main.{table}.{key}, {selected} FROM main.{table} '
+                                  f'JOIN live.{table} ON live.{table}.{key} = main.{table}.{key} '
+                                  f'ORDER BY main.{table}.{key}')
+
+        changed_rows = 0
+        for row in rows:
+            changes = [(column, row[1 + 2 * index], row[2 + 2 * index]) for index, column in enumerate(columns)
+                       if differs(row[1 + 2 * index], row[2 + 2 * index], tolerance)]
+
+            if changes:
+                changed_rows += 1
+
+                if changed_rows <= limit:
+                    print(f'  {table} {key}={row[0]}: ' +
+                          ', '.join(f'{column} {live} -> {rebuilt}' for column, live, rebuilt in changes))
+
+        print(f'{table}: {changed_rows} row(s) differ')
+        total += changed_rows
+
+    connection.close()
+
+    return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild every aggregate from the stored games into a scratch '
+                                                 'database and diff it against the live one.')
+    parser.add_argument('database', nargs='?', default='instance/JLTV.db')
+    parser.add_argument('--scratch', default='instance/JLTV-replay.db')
+    parser.add_argument('--limit', type=int, default=20, help='differences printed per table')
+    parser.add_argument('--tolerance', type=float, default=1e-9, help='absolute tolerance for float columns')
+    args = parser.parse_args()
+
+    with closing(sqlite3.connect(f'file:{args.database}?mode=ro', uri=True)) as database:
+        tables = {row[0] for row in database.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+    missing = [table for table in REQUIRED_TABLES if table not in tables]
+    if missing:
+        parser.exit(1, f'{args.database} has no {", ".join(missing)} table(s) to replay\n')
+
+    start = time.perf_counter()
+    replay(args.database, args.scratch)
+    print(f'Rebuilt {args.scratch} in {time.perf_counter() - start:.2f}s')
+
+    changed = diff(args.database, args.scratch, args.limit, args.tolerance)
+    print(f'{changed} row(s) differ from {args.database}')
@@ -0,0 +1,101 @@
+"""Score combinations of the rating-formula constants against every stored game.
+
+    python sweep.py [instance/JLTV.db] [--vary rating_exponent=0.6:1.0:9 ...] [--predictor individual|jltv]
+                    [--top 10]
+
+The history is loaded once (see ``kernel.load_history``); each combination is then scored by how well the
+pre-game team averages it produces pick the winner of every game: accuracy, and the log-loss of a one-parameter
+logistic fit on the rating gap. Lower log-loss is better. Without ``--vary`` the predictor's default grid around
+the current constants is swept.
+"""
+import argparse
+import itertools
+import sqlite3
+import time
+
+import numpy as np
+
+import kernel
+
+# Only constants that can reorder the predictor's ratings. The Individual uses the neutral win rate, so
+# kpr_scale and winrate_exponent only multiply it, and the fitted k absorbs that; in the JLTV they also change
+# how the game values weigh against the summed MLTV
+DEFAULT_GRIDS = {
+    'individual': {
+        'rating_exponent': (0.5, 1.2, 15),
+        'adr_exponent': (0.0, 0.5, 21),
+    },
+    'jltv': {
+        'kpr_scale': (21, 33, 7),
+        'rating_exponent': (0.6, 1.0, 9),
+        'winrate_exponent': (0.0, 0.3, 7),
+        'adr_exponent': (0.0, 0.3, 7),
+    },
+}
+
+
+def parse_range(text):
+    name, _, values = text.partition('=')
+
+    if name not in kernel.Constants._fields:
+        raise argparse.ArgumentTypeError(f'unknown constant {name!r}; one of {", ".join(kernel.Constants._fields)}')
+
+    try:
+        start, stop, steps = values.split(':')
+        return name, (float(start), float(stop), int(steps))
+
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected {name}=start:stop:steps, got {text!r}')
+
+
+def combinations(grid):
+    names = list(grid)
+    axes = [np.linspace(*grid[name]) for name in names]
+
+    for values in itertools.product(*axes):
+        yield kernel.DEFAULTS._replace(**dict(zip(names, values)))
+
+
+def sweep(history, grid, predictor):
+    results = []
+
+    for constants in combinations(grid):
+        results.append((kernel.evaluate(history, constants, predictor), constants))
+
+    results.sort(key=lambda result: result[0].log_loss)
+
+    return results
+
+
+def describe(score, constants, names):
+    values = ' '.join(f'{name}={getattr(constants, name):.4g}' for name in names)
+    return f'log-loss {score.log_loss:.4f}  accuracy {score.accuracy:.3f}  k {score.scale:+.3f}  {values}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('database', nargs='?', default='instance/JLTV.db')
+    parser.add_argument('--vary', type=parse_range, action='append', metavar='NAME=START:STOP:STEPS',
+                        help='constant to sweep; repeat for a grid over several')
+    parser.add_argument('--predictor', choices=sorted(kernel.PREDICTORS), default='individual')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    grid = dict(args.vary) if args.vary else DEFAULT_GRIDS[args.predictor]
+
+    start = time.perf_counter()
+    connection = sqlite3.connect(f'file:{args.database}?mode=ro', uri=True)
+    history = kernel.load_history(connection)
+    connection.close()
+    loaded = time.perf_counter() - start
+
+    print(f'{len(history.games)} games, {len(history.win)} rows loaded in {loaded:.2f}s')
+    print(f'current   {describe(kernel.evaluate(history, predictor=args.predictor), kernel.DEFAULTS, grid)}')
+
+    start = time.perf_counter()
+    results = sweep(history, grid, args.predictor)
+    elapsed = time.perf_counter() - start
+
+    print(f'{len(results)} combinations in {elapsed:.2f}s\n')
+    for rank, (score, constants) in enumerate(results[:args.top], 1):
+        print(f'{rank:>7}.  {describe(score, constants, grid)}')
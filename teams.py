@@ -0,0 +1,50 @@
+"""Exhaustive team balancing for a 10-man lobby.
+
+With the first player pinned to team 1 there are only C(9, 4) = 126 distinct 5v5 splits, so every one of them
+is scored and the closest are returned.
+"""
+from itertools import combinations
+
+TEAM_SIZE = 5
+LOBBY_SIZE = TEAM_SIZE * 2
+
+# Team 1 of every distinct split as a bitmask and as indexes; player 0 is pinned so mirrored splits don't repeat
+SPLITS = [(0,) + rest for rest in combinations(range(1, LOBBY_SIZE), TEAM_SIZE - 1)]
+SPLIT_MASKS = [sum(1 << i for i in team) for team in SPLITS]
+
+
+def teams_of(mask):
+    return ([i for i in range(LOBBY_SIZE) if mask >> i & 1],
+            [i for i in range(LOBBY_SIZE) if not mask >> i & 1])
+
+
+def rank_splits(ratings):
+    """Score all 126 splits of ten ratings, closest first.
+
+    Returns ``(difference, mask)`` pairs, where the difference is between the two team averages and the mask
+    marks team 1's indexes into ``ratings``.
+    """
+    if len(ratings) != LOBBY_SIZE:
+        raise ValueError(f'Need exactly {LOBBY_SIZE} ratings, got {len(ratings)}')
+
+    rating = ratings.__getitem__
+    total = sum(ratings)
+
+    return sorted((abs(2 * sum(map(rating, team)) - total) / TEAM_SIZE, mask)
+                  for team, mask in zip(SPLITS, SPLIT_MASKS))
+
+
+def best_difference(ratings):
+    # Smallest achievable gap between team averages, without ranking the splits
+    rating = ratings.__getitem__
+    total = sum(ratings)
+
+    return min(abs(2 * sum(map(rating, team)) - total) for team in SPLITS) / TEAM_SIZE
+
+
+def best_split(ratings, alternatives=0):
+    """The most balanced split plus the next ``alternatives``, each as ``(difference, team_1, team_2)``."""
+    ranked = rank_splits(ratings)[:alternatives + 1]
+    splits = [(difference, *teams_of(mask)) for difference, mask in ranked]
+
+    return splits[0], splits[1:]
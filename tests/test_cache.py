@@ -0,0 +1,93 @@
+"""The rendered-page cache: pure-read hits, eviction, and one cached variant per kind of viewer."""
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+from flask import Flask
+
+from cache import PageCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def page_cache(tmp_path, size=32):
+    app = Flask(__name__)
+    app.config.update(PAGE_CACHE_PATH=str(tmp_path / 'page_cache.db'), PAGE_CACHE_SIZE=size)
+
+    return PageCache(app)
+
+
+def changes(cache):
+    connection = sqlite3.connect(cache.path)
+    data_version = connection.execute('PRAGMA data_version').fetchone()[0]
+
+    return connection, data_version
+
+
+def test_hit_only_reads(tmp_path):
+    cache = page_cache(tmp_path)
+    cache.set('home:guest', 1, 'page')
+
+    # PRAGMA data_version moves when another connection commits to the file
+    connection, before = changes(cache)
+    assert cache.get('home:guest', 1) == 'page'
+    assert connection.execute('PRAGMA data_version').fetchone()[0] == before
+    connection.close()
+
+    assert cache.get('home:guest', 2) is None
+    assert cache.get('lifetime:guest', 1) is None
+
+
+def test_oldest_evicted_first(tmp_path):
+    cache = page_cache(tmp_path, size=2)
+    cache.set('a', 1, 'a')
+    cache.set('b', 1, 'b')
+    cache.get('a', 1)
+    cache.set('c', 1, 'c')
+
+    assert [cache.get(key, 1) for key in 'abc'] == [None, 'b', 'c']
+
+
+def test_new_version_drops_older_pages(tmp_path):
+    cache = page_cache(tmp_path)
+    cache.set('a', 1, 'a')
+    cache.set('b', 2, 'b')
+
+    assert cache.get('a', 1) is None
+    assert cache.get('b', 2) == 'b'
+
+
+def home_pages():
+    # The admin loads the page first; a second user and a guest must not be served the admin's navigation bar
+    import main
+
+    with main.app.app_context():
+        main.db.session.add_all([main.User(id=1, username='admin', password='-'),
+                                 main.User(id=2, username='user', password='-')])
+        main.db.session.commit()
+
+    pages = {}
+    for viewer, user_id in (('admin', 1), ('user', 2), ('guest', None)):
+        client = main.app.test_client()
+
+        if user_id is not None:
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+
+        pages[viewer] = [('Import Games' in page, 'Log Out' in page)
+                         for page in (client.get('/').get_data(as_text=True) for _ in range(2))]
+
+    print(json.dumps(pages))
+
+
+def test_cached_navigation_per_viewer(tmp_path):
+    env = dict(os.environ, DATA_URI=f'sqlite:///{tmp_path / "JLTV.db"}', SECRET_KEY='test',
+               PAGE_CACHE_PATH=str(tmp_path / 'page_cache.db'), RECOMPUTE_JOBS_PATH=str(tmp_path / 'jobs.db'))
+    output = subprocess.run([sys.executable, '-c', 'from tests.test_cache import home_pages; home_pages()'],
+                            cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+
+    assert output.returncode == 0, output.stderr
+    assert json.loads(output.stdout.splitlines()[-1]) == {
+        'admin': [[True, True]] * 2, 'user': [[False, True]] * 2, 'guest': [[False, False]] * 2}
@@ -0,0 +1,83 @@
+"""Read-only views while another connection holds the write lock, with and without SQLITE_CONCURRENT.
+
+main.py reads its configuration on import, so each mode runs in its own interpreter (``views_while_locked``).
+"""
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATHS = ['/', '/lifetime-rankings', '/api/season', '/api/lifetime']
+
+# How long the lock is held before the views have to have answered
+HOLD = 1.0
+
+
+def views_while_locked(path):
+    """Request every path while a second connection holds an exclusive write transaction, then release it.
+
+    Prints what each request returned while the lock was held (``"blocked"`` if it was still waiting) and once
+    the lock was released.
+    """
+    import main
+
+    main.page_cache.enabled = False
+    client = main.app.test_client()
+    statuses = {}
+
+    # A long replay holds the lock like this once its changes no longer fit in memory, or while it commits
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute('BEGIN EXCLUSIVE')
+    writer.execute('UPDATE data_version SET version = version + 1')
+
+    def get(page):
+        statuses[page] = client.get(page).status_code
+
+    threads = [threading.Thread(target=get, args=(page,)) for page in PATHS]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(HOLD)
+    held = {page: statuses.get(page, 'blocked') for page in PATHS}
+
+    writer.execute('ROLLBACK')
+    for thread in threads:
+        thread.join()
+
+    print(json.dumps({'held': held, 'released': statuses}))
+
+
+def run(tmp_path, concurrent):
+    path = str(tmp_path / 'JLTV.db')
+    env = dict(os.environ, DATA_URI=f'sqlite:///{path}', SECRET_KEY='test', SQLITE_CONCURRENT=concurrent,
+               PAGE_CACHE_PATH=str(tmp_path / 'page_cache.db'), RECOMPUTE_JOBS_PATH=str(tmp_path / 'jobs.db'))
+    output = subprocess.run(
+        [sys.executable, '-c', f'from tests.test_concurrency import views_while_locked; '
+                               f'views_while_locked({path!r})'],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+
+    assert output.returncode == 0, output.stderr
+
+    return json.loads(output.stdout.splitlines()[-1])
+
+
+@pytest.mark.parametrize('concurrent', ['0', '1'])
+def test_read_only_views_during_a_write(tmp_path, concurrent):
+    result = run(tmp_path, concurrent)
+
+    if concurrent == '1':
+        # WAL readers carry on against the last committed data
+        assert result['held'] == {page: 200 for page in PATHS}
+
+    else:
+        # With the rollback journal every read waits for the writer
+        assert result['held'] == {page: 'blocked' for page in PATHS}
+
+    assert result['released'] == {page: 200 for page in PATHS}
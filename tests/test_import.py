@@ -0,0 +1,97 @@
+"""main.import_records across a season rollover: all or nothing, with the rollover snapshots.
+
+main.py reads its configuration on import, so each case runs in its own interpreter (``import_games``).
+"""
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEASONS = 'SELECT season_id, games_played, rolled_up FROM seasons ORDER BY season_id'
+
+
+def import_games(path, count, fail_at):
+    """Import ``count`` copies of the populated season's games, failing on game ``fail_at`` (0 never fails)."""
+    import importer
+    import main
+    from benchmarks.synthetic import populate
+
+    populate(path, players=12, seasons=1)
+
+    connection = sqlite3.connect(path)
+    games = connection.execute('SELECT game_id, map_name, rounds FROM games ORDER BY game_id').fetchall()
+    records = [importer.GameRecord(map_name, rounds, [
+        importer.Line(player_id, kills, adr * rounds, bool(win)) for player_id, kills, adr, win in connection.execute(
+            'SELECT player_id, kills, ADR, win FROM player_stats WHERE game_id = ? ORDER BY id', (game_id,))])
+        for game_id, map_name, rounds in (games * 2)[:count]]
+    connection.close()
+
+    ingest_game = main.ingest_game
+    calls = []
+
+    def failing_ingest(*args):
+        calls.append(args)
+        if len(calls) == fail_at:
+            raise RuntimeError('import failed')
+
+        return ingest_game(*args)
+
+    main.ingest_game = failing_ingest
+
+    with main.app.app_context():
+        try:
+            seasons = main.import_records(records)
+            main.db.session.commit()
+            main.import_snapshot(seasons)
+
+        except RuntimeError:
+            main.db.session.rollback()
+            seasons = None
+
+    print(json.dumps(seasons))
+
+
+def run(tmp_path, count, fail_at=0):
+    path = str(tmp_path / 'JLTV.db')
+    env = dict(os.environ, DATA_URI=f'sqlite:///{path}', SECRET_KEY='test', BACKUP_DIR=str(tmp_path / 'backups'),
+               BACKUP_ON_ROLLOVER='1', PAGE_CACHE_PATH=str(tmp_path / 'page_cache.db'),
+               RECOMPUTE_JOBS_PATH=str(tmp_path / 'jobs.db'))
+    output = subprocess.run(
+        [sys.executable, '-c', f'from tests.test_import import import_games; '
+                               f'import_games({path!r}, {count}, {fail_at})'],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+
+    assert output.returncode == 0, output.stderr
+
+    return path, json.loads(output.stdout.splitlines()[-1])
+
+
+def seasons(path):
+    connection = sqlite3.connect(path)
+    rows = connection.execute(SEASONS).fetchall()
+    connection.close()
+
+    return rows
+
+
+def test_import_across_a_rollover(tmp_path):
+    path, touched = run(tmp_path, 35)
+
+    assert touched == [2, 3]
+    assert seasons(path) == [(1, 30, 1), (2, 30, 1), (3, 5, 0)]
+
+    # One snapshot before the import, of the season it was already past, and one of the season it finished
+    backups = tmp_path / 'backups'
+    assert seasons(str(backups / 'season-1-complete.db')) == [(1, 30, 1)]
+    assert seasons(str(backups / 'season-2-complete.db'))[:2] == [(1, 30, 1), (2, 30, 1)]
+
+
+def test_failed_import_commits_nothing(tmp_path):
+    path, touched = run(tmp_path, 35, fail_at=33)
+
+    assert touched is None
+    assert seasons(path) == [(1, 30, 1)]
+    assert not (tmp_path / 'backups' / 'season-2-complete.db').exists()
@@ -0,0 +1,73 @@
+"""logparser against the console log and match dump in tests/fixtures."""
+import os
+
+import pytest
+
+import importer
+import logparser
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+PLAYERS = {1: 'Shaz', 2: 'Jonno', 3: 'Mags', 4: 'Tiggs', 5: 'Kez',
+           6: 'Rhys', 7: 'Dev', 8: 'Olly', 9: 'Benj', 10: 'Pez'}
+
+
+def fixture(name):
+    return os.path.join(FIXTURES, name)
+
+
+def stats(match):
+    return {player.name: (player.kills, player.damage, player.team) for player in match.players}
+
+
+def test_log_match():
+    [match] = logparser.read_matches(fixture('mirage.log'))
+
+    assert match.map_name == 'Mirage'
+    assert match.rounds == 25
+    assert match.winner == 'CT'
+
+    # Warm-up kills, the team kill, team damage and the spectating bot are all left out
+    assert stats(match) == {
+        'Shaz': (3, 300, 'CT'), 'Jonno': (1, 100, 'CT'), 'Mags': (1, 100, 'CT'), 'Tiggsy': (1, 100, 'CT'),
+        'Kez': (2, 200, 'CT'), 'Rhys': (2, 200, 'T'), 'dev': (1, 100, 'T'), 'Olly': (1, 100, 'T'),
+        'Benj': (1, 100, 'T'), 'xX_Pez_Xx': (0, 45, 'T'),
+    }
+
+
+def test_dump_matches():
+    first, second = logparser.read_matches(fixture('matches.ndjson'))
+
+    assert (first.map_name, first.rounds, first.winner) == ('Nuke', 22, 'T')
+    assert (second.map_name, second.rounds, second.winner) == ('Vertigo', 19, 'CT')
+    assert stats(first)['Rhys'] == (24, 2633, 'T')
+    assert stats(second)['xX_Pez_Xx'] == (0, 212, 'T')
+
+
+def test_steam_names_map_onto_players():
+    aliases = logparser.read_aliases(fixture('aliases.csv'))
+    match = next(logparser.read_matches(fixture('matches.ndjson')))
+
+    [record] = importer.validate([logparser.to_game(match, PLAYERS, aliases)], PLAYERS)
+
+    # By SteamID (Pez), by Steam name (Tiggs) and case-insensitively by name (Dev)
+    assert record.map_name == 'Nuke'
+    assert record.rounds == 22
+    assert {line.player_id: (line.kills, line.damage, line.win) for line in record.lines} == {
+        1: (21, 2410, False), 2: (14, 1630, False), 3: (12, 1288, False), 4: (9, 1102, False),
+        5: (7, 845, False), 6: (24, 2633, True), 7: (17, 1904, True), 8: (13, 1377, True),
+        9: (11, 1190, True), 10: (6, 702, True),
+    }
+
+
+@pytest.mark.parametrize('name', ['mirage.log', 'matches.ndjson'])
+def test_zero_kill_loser_is_reported(name):
+    aliases = logparser.read_aliases(fixture('aliases.csv'))
+    games = [logparser.to_game(match, PLAYERS, aliases) for match in logparser.read_matches(fixture(name))]
+
+    with pytest.raises(importer.InvalidImport) as raised:
+        importer.validate(games, PLAYERS)
+
+    # Only Pez's line is a problem; everyone else was found
+    [error] = raised.value.errors
+    assert error == f'Game {len(games)}: 10 needs whole kills and damage of at least 1'
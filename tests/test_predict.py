@@ -0,0 +1,56 @@
+"""/predict: which rating and rating source combinations it scores.
+
+main.py reads its configuration on import, so the requests run in their own interpreter (``predictions``).
+"""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUERIES = {
+    'season individual': 'rating=individual&rating_source=season',
+    'season jltv': 'rating=jltv&rating_source=season',
+    'lifetime individual': 'rating=individual&rating_source=lifetime',
+    'lifetime jltv': 'rating=jltv&rating_source=lifetime',
+    'unknown source': 'rating=individual&rating_source=career',
+}
+
+
+def predictions(path):
+    import main
+    from benchmarks.synthetic import populate
+
+    populate(path, players=12, seasons=2)
+
+    client = main.app.test_client()
+    results = {}
+    for name, query in QUERIES.items():
+        response = client.get(f'/predict?team1=1,2,3,4,5&team2=6,7,8,9,10&{query}')
+        results[name] = [response.status_code, response.get_json()]
+
+    print(json.dumps(results))
+
+
+def test_predict(tmp_path):
+    path = str(tmp_path / 'JLTV.db')
+    env = dict(os.environ, DATA_URI=f'sqlite:///{path}', SECRET_KEY='test',
+               PAGE_CACHE_PATH=str(tmp_path / 'page_cache.db'), RECOMPUTE_JOBS_PATH=str(tmp_path / 'jobs.db'))
+    output = subprocess.run(
+        [sys.executable, '-c', f'from tests.test_predict import predictions; predictions({path!r})'],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+
+    assert output.returncode == 0, output.stderr
+    results = json.loads(output.stdout.splitlines()[-1])
+
+    for name in ('season individual', 'season jltv', 'lifetime individual'):
+        status, body = results[name]
+
+        assert status == 200, body
+        assert body['games'] == 60
+        assert round(body['team1']['win_probability'] + body['team2']['win_probability'], 4) == 1
+
+    # Lifetime JLTV isn't on the scale the JLTV model was fitted on
+    assert results['lifetime jltv'] == [400, {'error': 'rating=jltv can only be scored with rating_source=season'}]
+    assert results['unknown source'][0] == 400
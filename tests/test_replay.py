@@ -0,0 +1,122 @@
+"""The incremental add and delete paths against full replays of the stored games.
+
+A season of synthetic history is extended through the add game and delete game routes, across a season
+rollover, and the result has to match what ``replay_history`` rebuilds from the games alone. A delete replays
+only the games that share a player with the deleted one; replaying the whole season afterwards must change
+nothing.
+
+main.py reads its configuration on import, so the sequence runs in its own interpreter (``add_and_delete``).
+"""
+from contextlib import closing
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+
+import replay_history
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# a: add a game, d: delete a game from the middle of the open season, l: delete its latest game
+PLAN = 'aaaaadaaaaaaaaaaaaaaaaaaaaaaaaaaaaaalaaadal'
+
+
+def add_and_delete(path, plan, partial_path):
+    """Run ``plan`` through the routes; after each middle delete, keep a copy and replay the season in full.
+
+    Prints, for each middle delete, how many games the delete replayed, how many games were left in the season
+    and how many rows the full replay then changed.
+    """
+    import main
+    from benchmarks.synthetic import populate
+
+    populate(path, players=24, seasons=1)
+
+    main.app.config['WTF_CSRF_ENABLED'] = False
+    with main.app.app_context():
+        main.db.session.add(main.User(id=1, username='admin', password='-'))
+        main.db.session.commit()
+
+    client = main.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+
+    rng = random.Random(1)
+    # Two groups that never play each other, so a delete leaves the other group's games alone
+    groups = [list(range(1, 13)), list(range(13, 25))]
+    full_replay_changes = []
+
+    for step in plan:
+        connection = sqlite3.connect(path)
+        season_id, = connection.execute('SELECT MAX(season_id) FROM seasons').fetchone()
+        game_ids = [game_id for game_id, in connection.execute(
+            'SELECT game_id FROM games WHERE season_id = ? ORDER BY game_id', (season_id,))]
+        connection.close()
+
+        if step == 'a':
+            rounds = rng.randint(16, 30)
+            data = {'map_name': rng.choice(['Dust II', 'Mirage', 'Nuke']), 'rounds': rounds}
+            for position, player_id in enumerate(rng.sample(rng.choice(groups), 10), 1):
+                data.update({f'player{position}': player_id, f'kills{position}': rng.randint(8, 35),
+                             f'damage{position}': rng.randint(900, 3500)})
+                if position <= 5:
+                    data[f'win{position}'] = 'y'
+
+            assert client.post('/add-game', data=data).status_code == 302
+            assert main.recompute_worker.drain(timeout=30)
+            continue
+
+        game_id = game_ids[-1] if step == 'l' else game_ids[len(game_ids) // 2]
+
+        connection = sqlite3.connect(path)
+        sharing = connection.execute(
+            'SELECT COUNT(DISTINCT game_id) FROM player_stats WHERE season_id = ? AND game_id != ? AND player_id IN '
+            '(SELECT player_id FROM player_stats WHERE game_id = ?)', (season_id, game_id, game_id)).fetchone()[0]
+        connection.close()
+
+        assert client.get(f'/delete-game/{game_id}').status_code == 302
+
+        if step == 'd':
+            with closing(sqlite3.connect(path)) as live, closing(sqlite3.connect(partial_path)) as partial:
+                live.backup(partial)
+
+            with main.app.app_context():
+                main.recompute_season(season_id)
+                main.refreeze_season(season_id)
+                main.db.session.commit()
+
+            full_replay_changes.append([sharing, len(game_ids) - 1, replay_history.diff(partial_path, path)])
+
+    print(json.dumps(full_replay_changes))
+
+
+def test_add_and_delete_match_full_replays(tmp_path):
+    path = str(tmp_path / 'JLTV.db')
+    env = dict(os.environ, DATA_URI=f'sqlite:///{path}', SECRET_KEY='test', RECOMPUTE_DELAY='0',
+               BACKUP_DIR=str(tmp_path / 'backups'), PAGE_CACHE_PATH=str(tmp_path / 'page_cache.db'),
+               RECOMPUTE_JOBS_PATH=str(tmp_path / 'jobs.db'))
+    output = subprocess.run(
+        [sys.executable, '-c', f'from tests.test_replay import add_and_delete; '
+                               f'add_and_delete({path!r}, {PLAN!r}, {str(tmp_path / "partial.db")!r})'],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=300)
+
+    assert output.returncode == 0, output.stderr
+
+    # Deleting a game replayed only part of its season; the full replay after each one changed nothing
+    deletes = json.loads(output.stdout.splitlines()[-1])
+    assert len(deletes) == 2
+    for replayed, remaining, changed in deletes:
+        assert 0 < replayed < remaining
+        assert changed == 0
+
+    connection = sqlite3.connect(path)
+    assert connection.execute('SELECT season_id, games_played, rolled_up FROM seasons').fetchall() == [
+        (1, 30, 1), (2, 30, 1), (3, 5, 0)]
+    connection.close()
+
+    # Every stored aggregate matches a rebuild from the games alone
+    scratch = str(tmp_path / 'replayed.db')
+    replay_history.replay(path, scratch)
+    assert replay_history.diff(path, scratch) == 0
@@ -0,0 +1,39 @@
+"""benchmarks.synthetic.populate against the database a freshly imported app has set up."""
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def populate_after_import(path):
+    # The way the benchmarks use it: import the app (creating the schema), then fill the database
+    import main
+    from benchmarks.synthetic import populate
+
+    populate(path, players=12, seasons=2)
+
+    main.page_cache.enabled = False
+    client = main.app.test_client()
+    print(json.dumps({page: client.get(page).status_code for page in ('/', '/lifetime-rankings', '/api/season')}))
+
+
+def test_populate_after_import(tmp_path):
+    path = str(tmp_path / 'JLTV.db')
+    env = dict(os.environ, DATA_URI=f'sqlite:///{path}', SECRET_KEY='test',
+               PAGE_CACHE_PATH=str(tmp_path / 'page_cache.db'), RECOMPUTE_JOBS_PATH=str(tmp_path / 'jobs.db'))
+    output = subprocess.run(
+        [sys.executable, '-c', f'from tests.test_synthetic import populate_after_import; '
+                               f'populate_after_import({path!r})'],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+
+    assert output.returncode == 0, output.stderr
+    assert json.loads(output.stdout.splitlines()[-1]) == {'/': 200, '/lifetime-rankings': 200, '/api/season': 200}
+
+    connection = sqlite3.connect(path)
+    assert connection.execute('SELECT season_id, games_played, rolled_up FROM seasons').fetchall() == [
+        (1, 30, 1), (2, 30, 1)]
+    assert connection.execute('SELECT count(*) FROM games').fetchone() == (60,)
+    connection.close()
@@ -0,0 +1,46 @@
+"""RecomputeWorker's job file: jobs run once per season trigger and no connection is left open."""
+import gc
+import os
+
+from flask import Flask
+
+from worker import RecomputeWorker
+
+
+def open_handles(path):
+    # File descriptors of this process on the job file (Linux only)
+    handles = 0
+    for fd in os.listdir('/proc/self/fd'):
+        try:
+            handles += os.readlink(f'/proc/self/fd/{fd}') == path
+
+        except OSError:
+            pass
+
+    return handles
+
+
+def test_jobs_run_and_close_their_connections(tmp_path):
+    app = Flask(__name__)
+    app.config.update(RECOMPUTE_JOBS_PATH=str(tmp_path / 'jobs.db'), RECOMPUTE_DELAY=0)
+    worker = RecomputeWorker(app)
+    seasons = []
+
+    @worker.task
+    def replay(season_id, progress):
+        progress('Replaying season')
+        seasons.append(season_id)
+
+    gc.disable()
+    try:
+        job_id = worker.enqueue(3)
+        assert worker.drain(timeout=10)
+
+        assert worker.job(job_id)['status'] == 'done'
+        assert worker.pending() == 0
+        assert open_handles(worker.path) == 0
+
+    finally:
+        gc.enable()
+
+    assert seasons == [3]
@@ -0,0 +1,185 @@
+"""In-process background worker for season recomputes.
+
+Write routes enqueue a job for the season they changed and return straight away; a daemon thread runs the
+registered task in an app context. Jobs live in a small SQLite file (next to the page cache) so every gunicorn
+worker sees the same queue and status, and only one job runs at a time across processes.
+
+A job waits ``RECOMPUTE_DELAY`` seconds after its last trigger before it starts, and triggers for a season that
+already has a queued job are folded into it, so a run of back-to-back game entries costs one replay.
+"""
+from contextlib import closing
+import os
+import sqlite3
+import threading
+import time
+
+# Other processes' jobs are picked up within this many seconds
+POLL_INTERVAL = 2.0
+
+# A job still marked running after this long belongs to a process that died
+STALE_AFTER = 600
+
+
+class RecomputeWorker:
+    def __init__(self, app=None):
+        self.app = None
+        self.path = None
+        self.delay = 1.0
+        self.function = None
+
+        self._thread = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._hurry = threading.Event()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.path = app.config.get('RECOMPUTE_JOBS_PATH') or os.path.join(app.instance_path, 'jobs.db')
+        self.delay = float(app.config.get('RECOMPUTE_DELAY', 1.0))
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with closing(self._connect()) as connection, connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS jobs ('
+                               'id INTEGER PRIMARY KEY AUTOINCREMENT, season_id INTEGER NOT NULL, '
+                               'status TEXT NOT NULL, progress TEXT, error TEXT, requests INTEGER NOT NULL, '
+                               'created REAL NOT NULL, requested REAL NOT NULL, started REAL, finished REAL)')
+
+        app.extensions['recompute_worker'] = self
+
+    def task(self, function):
+        # Registers ``function(season_id, progress)`` as the job body
+        self.function = function
+
+        return function
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def enqueue(self, season_id):
+        now = time.time()
+
+        with closing(self._connect()) as connection, connection:
+            # Hold the write lock so two processes can't both queue a job for the season
+            connection.execute('BEGIN IMMEDIATE')
+
+            row = connection.execute("SELECT id FROM jobs WHERE season_id = ? AND status = 'queued'",
+                                     (season_id,)).fetchone()
+
+            if row is not None:
+                job_id = row[0]
+                connection.execute('UPDATE jobs SET requests = requests + 1, requested = ? WHERE id = ?',
+                                   (now, job_id))
+
+            else:
+                job_id = connection.execute("INSERT INTO jobs (season_id, status, requests, created, requested) "
+                                            "VALUES (?, 'queued', 1, ?, ?)", (season_id, now, now)).lastrowid
+
+        self._start()
+        self._wake.set()
+
+        return job_id
+
+    def job(self, job_id):
+        with closing(self._connect()) as connection, connection:
+            connection.row_factory = sqlite3.Row
+            row = connection.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+        return dict(row) if row is not None else None
+
+    def pending(self):
+        with closing(self._connect()) as connection, connection:
+            return connection.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def drain(self, timeout=None):
+        # Run everything queued now, skipping the coalescing delay, and wait for it to finish
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        self._start()
+        self._hurry.set()
+        self._wake.set()
+
+        try:
+            while self.pending():
+                if deadline is not None and time.monotonic() > deadline:
+                    return False
+
+                time.sleep(0.01)
+
+        finally:
+            self._hurry.clear()
+
+        return True
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='recompute-worker', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+
+            while True:
+                job = self._next()
+
+                if job is None:
+                    break
+
+                job_id, requested = job
+
+                # Give back-to-back triggers time to fold into this job before it starts
+                remaining = requested + self.delay - time.time()
+                if remaining > 0 and not self._hurry.is_set():
+                    self._hurry.wait(remaining)
+                    continue
+
+                if not self._claim(job_id):
+                    # Another process is running a job; look again on the next poll
+                    break
+
+                self._execute(job_id)
+
+    def _next(self):
+        with closing(self._connect()) as connection, connection:
+            connection.execute("UPDATE jobs SET status = 'failed', error = 'worker stopped', finished = ? "
+                               "WHERE status = 'running' AND started < ?", (time.time(), time.time() - STALE_AFTER))
+
+            return connection.execute("SELECT id, requested FROM jobs WHERE status = 'queued' "
+                                      "ORDER BY id LIMIT 1").fetchone()
+
+    def _claim(self, job_id):
+        # Only one job runs at a time, whichever process picks it up
+        with closing(self._connect()) as connection, connection:
+            return connection.execute(
+                "UPDATE jobs SET status = 'running', started = ? WHERE id = ? AND status = 'queued' "
+                "AND NOT EXISTS (SELECT 1 FROM jobs WHERE status = 'running')", (time.time(), job_id)).rowcount == 1
+
+    def _update(self, job_id, **values):
+        assignments = ', '.join(f'{column} = ?' for column in values)
+
+        with closing(self._connect()) as connection, connection:
+            connection.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*values.values(), job_id))
+
+    def _execute(self, job_id):
+        season_id = self.job(job_id)['season_id']
+
+        def progress(message):
+            self._update(job_id, progress=message)
+
+        try:
+            with self.app.app_context():
+                self.function(season_id, progress)
+
+        except Exception as error:
+            self.app.logger.exception('Recompute job %d failed', job_id)
+            self._update(job_id, status='failed', error=repr(error), finished=time.time())
+
+        else:
+            self._update(job_id, status='done', progress=None, finished=time.time())